@@ -0,0 +1,52 @@
+'''
+Append benchmark: grow a matrix element by element like ``x(end+1) = v``.
+
+Usage: python bench/bench_append.py [N ...]
+
+Copyright (C) 2015, led02 <mlabpy@led-inc.eu>
+'''
+import sys
+import time
+
+import numpy
+
+from mlabpy.runtime.core import end, matrix, vector
+
+
+def append_matrix(n):
+    x = matrix([])
+    for i in range(n):
+        x[end] = i * 0.5
+    return x
+
+def append_vector(n):
+    x = vector([])
+    for i in range(n):
+        x[end] = i * 0.5
+    return x
+
+def append_concatenate(n):
+    # What matrix did before it had spare capacity
+    x = numpy.array([])
+    for i in range(n):
+        x = numpy.concatenate((x, [i * 0.5]))
+    return x
+
+def bench(func, n):
+    start = time.perf_counter()
+    result = func(n)
+    wall = time.perf_counter() - start
+    assert len(result) == n
+    print("{0:<20} {1:>10} {2:10.3f} s {3:10.1f} ns/append".format(
+        func.__name__, n, wall, wall / n * 1e9))
+
+def main():
+    sizes = [int(float(arg)) for arg in sys.argv[1:]] or [10**5, 10**6, 10**7]
+    for n in sizes:
+        bench(append_matrix, n)
+        bench(append_vector, n)
+        if n <= 10**5:
+            bench(append_concatenate, n)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,40 @@
+'''
+Formatted output benchmark: write a two column table with fprintf.
+
+Usage: python bench/bench_fprintf.py [ROWS]
+
+Copyright (C) 2015, led02 <mlabpy@led-inc.eu>
+'''
+import os
+import sys
+import tempfile
+import time
+
+import numpy
+
+from mlabpy.runtime.core import fclose, fopen, fprintf, transpose
+
+
+def main():
+    rows = int(float(sys.argv[1])) if len(sys.argv) > 1 else 10**6
+    table = numpy.random.RandomState(42).rand(rows, 2)
+    fd, filename = tempfile.mkstemp(suffix='.txt')
+    os.close(fd)
+    try:
+        fid = fopen(filename, 'w')
+        start = time.perf_counter()
+        fprintf(fid, '%f\t%f\n', transpose(table))
+        fclose(fid)
+        print("fprintf table     {0:10.3f} s".format(time.perf_counter() - start))
+
+        fid = fopen(filename, 'w')
+        start = time.perf_counter()
+        for row in table:
+            fprintf(fid, '%f\t%f\n', row[0], row[1])
+        fclose(fid)
+        print("fprintf per row   {0:10.3f} s".format(time.perf_counter() - start))
+    finally:
+        os.remove(filename)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+'''
+Binary I/O benchmark: write and read back big-endian int16 samples with
+fwrite/fread and memmapfile.
+
+Usage: python bench/bench_fread.py [SAMPLES]
+
+Copyright (C) 2015, led02 <mlabpy@led-inc.eu>
+'''
+import os
+import sys
+import tempfile
+import time
+
+import numpy
+
+from mlabpy.runtime.core import fclose, fopen, fread, fwrite, memmapfile
+
+
+def main():
+    samples = int(float(sys.argv[1])) if len(sys.argv) > 1 else 10**7
+    data = numpy.random.RandomState(42).randint(-2**15, 2**15, samples)
+    fd, filename = tempfile.mkstemp(suffix='.bin')
+    os.close(fd)
+    try:
+        fid = fopen(filename, 'w', 'ieee-be')
+        start = time.perf_counter()
+        fwrite(fid, data, 'int16')
+        fclose(fid)
+        print("fwrite int16        {0:10.3f} s".format(time.perf_counter() - start))
+
+        fid = fopen(filename, 'r', 'ieee-be')
+        start = time.perf_counter()
+        fread(fid, float('inf'), 'int16=>double')
+        fclose(fid)
+        print("fread int16=>double {0:10.3f} s".format(time.perf_counter() - start))
+
+        fid = fopen(filename, 'r', 'ieee-be')
+        start = time.perf_counter()
+        fread(fid, float('inf'), 'int16', 2)
+        fclose(fid)
+        print("fread with skip     {0:10.3f} s".format(time.perf_counter() - start))
+
+        start = time.perf_counter()
+        numpy.sum(memmapfile(filename, 'Format', 'uint16').Data)
+        print("memmapfile sum      {0:10.3f} s".format(time.perf_counter() - start))
+    finally:
+        os.remove(filename)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+'''
+Global lookup benchmark: a matlab loop calling builtin and search path
+functions, run with plain ``__builtins__`` (how modules are executed)
+and with a dict subclass as ``__builtins__`` (which takes CPython's global
+lookups off their fast path).
+
+Usage: python bench/bench_globals.py [N ...]
+
+Copyright (C) 2015, led02 <mlabpy@led-inc.eu>
+'''
+import builtins
+import os
+import sys
+import tempfile
+import time
+
+from mlabpy import conf, loader
+
+LOOP = """
+function s = loop(n)
+  s = 0;
+  for k = 1:n
+    a = abs(k);
+    b = max(a, k);
+    s = s + inc(b);
+  end
+end
+"""
+
+INC = """
+function y = inc(x)
+  y = x + 1;
+end
+"""
+
+class _FallbackBuiltins(dict):
+    # Builtins that fall back to other functions, like a lookup hook would
+    def __missing__(self, name):
+        raise KeyError(name)
+
+def run(modules, n, repeat=5):
+    # Alternate between the modules so that neither always runs first
+    best = [float('inf')] * len(modules)
+    for _ in range(repeat):
+        for i, module in enumerate(modules):
+            start = time.perf_counter()
+            module['loop'](n)
+            best[i] = min(best[i], time.perf_counter() - start)
+    return best
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [100000, 1000000]
+    tmpdir = tempfile.mkdtemp()
+    filepath = os.path.join(tmpdir, 'loop.m')
+    with open(filepath, 'w') as outfile:
+        outfile.write(LOOP)
+    with open(os.path.join(tmpdir, 'inc.m'), 'w') as outfile:
+        outfile.write(INC)
+    conf.MATLAB_PATH.insert(0, tmpdir)
+
+    code = loader.MatlabLoader(None, filepath).get_code()
+    plain = {'__file__': filepath, '__builtins__': builtins.__dict__}
+    exec(code, plain)
+    hooked = {'__file__': filepath, '__builtins__': _FallbackBuiltins(builtins.__dict__)}
+    exec(code, hooked)
+    # Resolve the search path function before timing
+    run([plain, hooked], 10, repeat=1)
+    for n in sizes:
+        fast, slow = run([plain, hooked], n)
+        print("n={0:<10} plain builtins {1:8.1f} ns/iteration   dict subclass {2:8.1f} ns/iteration   ({3:.2f}x)".format(
+            n, fast / n * 1e9, slow / n * 1e9, slow / fast))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+'''
+Interpolation benchmark: bulk queries and single lookups in a loop on the
+same tables, which reuse the cached interpolants.
+
+Usage: python bench/bench_interp.py [QUERIES]
+
+Copyright (C) 2015, led02 <mlabpy@led-inc.eu>
+'''
+import sys
+import time
+
+import numpy
+
+from mlabpy.runtime.scipy import interp1, interp2
+
+
+def main():
+    queries = int(float(sys.argv[1])) if len(sys.argv) > 1 else 10**6
+    x = numpy.linspace(0, 10, 10**5)
+    v = numpy.sin(x)
+    V = numpy.random.random_sample((500, 600))
+    xq = numpy.random.random_sample(queries) * 10
+    yq = numpy.random.random_sample(queries) * 499 + 1
+
+    for label, run in (
+        ('interp1 bulk', lambda: interp1(x, v, xq)),
+        ('interp1 spline bulk', lambda: interp1(x, v, xq, 'spline')),
+        ('interp2 bulk', lambda: interp2(V, xq * 59.9 + 1, yq)),
+    ):
+        start = time.perf_counter()
+        run()
+        print("{0:25s} {1:10.3f} s".format(label, time.perf_counter() - start))
+
+    loops = queries // 100
+    start = time.perf_counter()
+    for k in range(loops):
+        interp1(x, v, k * 1e-4)
+    print("{0:25s} {1:10.3f} s ({2} calls)".format('interp1 loop', time.perf_counter() - start, loops))
+
+    start = time.perf_counter()
+    for k in range(loops):
+        interp2(V, 1.5 + k * 1e-3, 2.5)
+    print("{0:25s} {1:10.3f} s ({2} calls)".format('interp2 loop', time.perf_counter() - start, loops))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+'''
+Lexer benchmark: tokenize a generated data-definition script.
+
+Usage: python bench/bench_lexer.py [LINES]
+
+Copyright (C) 2015, led02 <mlabpy@led-inc.eu>
+'''
+import random
+import sys
+import time
+
+from mlabpy import lexer
+
+
+def generate(lines):
+    rnd = random.Random(42)
+    buf = []
+    for i in range(lines):
+        kind = i % 4
+        if kind == 0:
+            buf.append("x{0} = {1:.6f};".format(i, rnd.uniform(-1e3, 1e3)))
+        elif kind == 1:
+            row = ' '.join(str(rnd.randint(0, 1000)) for _ in range(8))
+            buf.append("m{0} = [{1}; {1}];  % matrix".format(i, row))
+        elif kind == 2:
+            buf.append("s{0} = struct('name', 'item{0}', 'value', {1:.3e}, 'mask', 0x{2:X});".format(
+                i, rnd.random(), rnd.randint(0, 0xFFFF)))
+        else:
+            buf.append("z{0} = {1}i + x{2}(end) * 2.5;".format(i, rnd.randint(1, 9), i - 3))
+    return '\n'.join(buf) + '\n'
+
+def main():
+    lines = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    buf = generate(lines)
+
+    start = time.perf_counter()
+    lexer.new()
+    print("first lexer.new()     {0:8.3f} ms".format((time.perf_counter() - start) * 1e3))
+
+    start = time.perf_counter()
+    for _ in range(100):
+        lexer.new()
+    print("lexer.new() (cloned)  {0:8.3f} ms".format((time.perf_counter() - start) * 10))
+
+    start = time.perf_counter()
+    mlexer = lexer.new()
+    mlexer.input(buf)
+    count = sum(1 for _ in iter(mlexer.token, None))
+    elapsed = time.perf_counter() - start
+    print("{0} lines, {1} tokens {2:8.3f} s ({3:.0f} tokens/s)".format(
+        lines, count, elapsed, count / elapsed))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+'''
+Solver benchmark: ``A \ b`` through ``mldivide`` against ``inv(A) * b``.
+
+Usage: python bench/bench_mldivide.py [N ...]
+
+Copyright (C) 2015, led02 <mlabpy@led-inc.eu>
+'''
+import sys
+import time
+
+import numpy
+
+from mlabpy.runtime.core import mldivide, mtimes
+
+
+def systems(n):
+    rnd = numpy.random.RandomState(42)
+    general = rnd.rand(n, n) + n * numpy.identity(n)
+    yield 'general', general
+    yield 'spd', general.dot(general.T)
+    yield 'triangular', numpy.triu(general)
+
+def bench(label, func, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        x = func()
+    wall = (time.perf_counter() - start) / repeat
+    print("  {0:<22} {1:10.3f} ms".format(label, wall * 1e3))
+    return x
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [100, 500, 2000]
+    # Keep the SciPy import out of the timings
+    mldivide(numpy.identity(2), numpy.ones((2, 1)))
+    for n in sizes:
+        repeat = max(1, 200 // n)
+        b = numpy.random.RandomState(0).rand(n, 1)
+        for kind, a in systems(n):
+            print("{0} n={1}".format(kind, n))
+            x = bench('mldivide(A, b)', lambda: mldivide(a, b), repeat)
+            y = bench('inv(A) * b', lambda: mtimes(numpy.linalg.inv(a), b), repeat)
+            print("  residual mldivide {0:.2e}, inv {1:.2e}".format(
+                numpy.linalg.norm(a.dot(x) - b), numpy.linalg.norm(a.dot(y) - b)))
+
+if __name__ == '__main__':
+    main()
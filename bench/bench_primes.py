@@ -0,0 +1,33 @@
+'''
+Prime benchmark: primes() with growing bounds, isprime() and factor().
+
+Usage: python bench/bench_primes.py [N]
+
+Copyright (C) 2015, led02 <mlabpy@led-inc.eu>
+'''
+import sys
+import time
+
+import numpy
+
+from mlabpy.runtime.core import factor, isprime, primes
+
+
+def bench(label, func):
+    start = time.perf_counter()
+    result = func()
+    print("{0:<36} {1:10.3f} ms".format(label, (time.perf_counter() - start) * 1e3))
+    return result
+
+def main():
+    n = int(float(sys.argv[1])) if len(sys.argv) > 1 else 10**8
+    bench('primes({0}) cold'.format(n), lambda: primes(n))
+    bench('primes({0}) cached'.format(n), lambda: primes(n))
+    bench('primes(k) for k = 1e3 .. 1e6', lambda: [primes(k) for k in range(1000, 10**6, 1000)])
+    numbers = numpy.random.RandomState(42).randint(2, n, 10**6)
+    bench('isprime(1e6 numbers < {0})'.format(n), lambda: isprime(numbers))
+    bench('factor(k) for 1e4 k near 2^40', lambda: [factor(k) for k in range(2**40, 2**40 + 10**4)])
+    bench('primes({0}) segmented'.format(4 * n), lambda: primes(4 * n))
+
+if __name__ == '__main__':
+    main()
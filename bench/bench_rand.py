@@ -0,0 +1,51 @@
+'''
+Random number benchmark: scalar draws, bulk draws into new and into
+preallocated matrices, and independent streams in several threads.
+
+Usage: python bench/bench_rand.py [SIZE] [THREADS]
+
+Copyright (C) 2015, led02 <mlabpy@led-inc.eu>
+'''
+import sys
+import threading
+import time
+
+from mlabpy.runtime.core import rand, randn, rng, zeros
+
+
+def main():
+    size = int(float(sys.argv[1])) if len(sys.argv) > 1 else 10**6
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    rng(0)
+
+    start = time.perf_counter()
+    for _ in range(size // 10):
+        rand()
+    print("{0:20s} {1:10.3f} s ({2} draws)".format('rand()', time.perf_counter() - start, size // 10))
+
+    start = time.perf_counter()
+    for _ in range(100):
+        randn(1, size)
+    print("{0:20s} {1:10.3f} s".format('randn(1, n)', time.perf_counter() - start))
+
+    A = zeros(1, size)
+    start = time.perf_counter()
+    for _ in range(100):
+        randn('out', A)
+    print("{0:20s} {1:10.3f} s".format("randn('out', A)", time.perf_counter() - start))
+
+    def work():
+        out = zeros(1, size)
+        for _ in range(100 // threads):
+            randn('out', out)
+
+    workers = [threading.Thread(target=work) for _ in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    print("{0:20s} {1:10.3f} s ({2} threads)".format("randn('out', A)", time.perf_counter() - start, threads))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+'''
+Data file benchmark: save a large matrix and load it again, memory-mapped
+and compressed.
+
+Usage: python bench/bench_save.py [MEGABYTES]
+
+Copyright (C) 2015, led02 <mlabpy@led-inc.eu>
+'''
+import os
+import sys
+import tempfile
+import time
+
+import numpy
+
+from mlabpy.runtime.core import load, matrix, save
+
+
+def main():
+    megabytes = int(float(sys.argv[1])) if len(sys.argv) > 1 else 128
+    data = matrix._wrap(numpy.random.RandomState(42).rand(megabytes * 2**17 // 1024, 1024))
+    tmpdir = tempfile.mkdtemp()
+    filename = os.path.join(tmpdir, 'checkpoint.mlabpy')
+    try:
+        start = time.perf_counter()
+        save(filename, 'data')
+        print("save               {0:10.3f} s".format(time.perf_counter() - start))
+
+        start = time.perf_counter()
+        loaded = load(filename)
+        print("load (mapped)      {0:10.3f} s".format(time.perf_counter() - start))
+
+        start = time.perf_counter()
+        numpy.sum(loaded.data)
+        print("sum of mapped data {0:10.3f} s".format(time.perf_counter() - start))
+        del loaded
+
+        start = time.perf_counter()
+        save(filename, 'data', '-compress')
+        print("save -compress     {0:10.3f} s".format(time.perf_counter() - start))
+
+        start = time.perf_counter()
+        load(filename)
+        print("load -compress     {0:10.3f} s".format(time.perf_counter() - start))
+    finally:
+        os.remove(filename)
+        os.rmdir(tmpdir)
+
+if __name__ == '__main__':
+    main()
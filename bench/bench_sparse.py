@@ -0,0 +1,39 @@
+'''
+Sparse benchmark: assemble a 1-D finite element stiffness matrix from
+triplets with duplicates, then solve a system with it.
+
+Usage: python bench/bench_sparse.py [ELEMENTS]
+
+Copyright (C) 2015, led02 <mlabpy@led-inc.eu>
+'''
+import sys
+import time
+
+import numpy
+
+from mlabpy.runtime.core import mldivide, nnz
+from mlabpy.runtime.scipy import sparse
+
+
+def main():
+    elements = int(float(sys.argv[1])) if len(sys.argv) > 1 else 10**6
+    nodes = elements + 1
+    first = numpy.arange(1, nodes)
+    # Element matrices [1 -1; -1 1], neighbouring elements share a node
+    i = numpy.concatenate((first, first, first + 1, first + 1))
+    j = numpy.concatenate((first, first + 1, first, first + 1))
+    ones = numpy.ones(elements)
+    v = numpy.concatenate((ones, -ones, -ones, ones))
+    # Fix the first node, otherwise K is singular
+    i, j, v = numpy.append(i, 1), numpy.append(j, 1), numpy.append(v, 1.0)
+
+    start = time.perf_counter()
+    K = sparse(i, j, v, nodes, nodes)
+    print("sparse(i, j, v)   {0:10.3f} s ({1} non-zeros)".format(time.perf_counter() - start, nnz(K)))
+
+    start = time.perf_counter()
+    mldivide(K, numpy.ones(nodes))
+    print("K \\ f             {0:10.3f} s".format(time.perf_counter() - start))
+
+if __name__ == '__main__':
+    main()
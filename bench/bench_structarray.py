@@ -0,0 +1,41 @@
+'''
+Struct array benchmark: build a struct array of records, update a field of
+every element and sum a column.
+
+Usage: python bench/bench_structarray.py [RECORDS]
+
+Copyright (C) 2015, led02 <mlabpy@led-inc.eu>
+'''
+import sys
+import time
+
+import numpy
+
+from mlabpy.runtime.core import blkcat, end, struct, vector
+
+
+def main():
+    records = int(float(sys.argv[1])) if len(sys.argv) > 1 else 10**5
+
+    start = time.perf_counter()
+    s = struct('id', vector(list(range(records))), 'value', 0.0, 'name', 'record')
+    print("struct with cells   {0:10.3f} s".format(time.perf_counter() - start))
+
+    start = time.perf_counter()
+    t = struct('id', vector([]))
+    for i in range(records):
+        t[end + 1 - 1].id = i
+    print("s(end+1).id = i     {0:10.3f} s".format(time.perf_counter() - start))
+
+    start = time.perf_counter()
+    for i in range(records):
+        s[i].value = i * 0.5
+    print("s(i).value = v      {0:10.3f} s".format(time.perf_counter() - start))
+
+    start = time.perf_counter()
+    total = numpy.sum(blkcat([[s.value]]))
+    print("sum([s.value])      {0:10.3f} s".format(time.perf_counter() - start))
+    assert total == 0.5 * records * (records - 1) / 2
+
+if __name__ == '__main__':
+    main()
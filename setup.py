@@ -22,14 +22,16 @@ setup(
         'Intended Audience :: Developers',
         'Indended Audience :: Scientists',
         'License :: OSI Approved :: MIT License',
-        'Programming Language :: Python :: 3.4',
+        'Programming Language :: Python :: 3',
+        'Programming Language :: Python :: 3.9',
         'Programming Language :: MatLAB',
     ],
 
     # Dependencies
+    python_requires='>=3.9',
     install_requires=[
         'setuptools',
-        'numpy>=1.9',
+        'numpy>=1.17',
         'ply>=3.4',
     ],
     extras_require={
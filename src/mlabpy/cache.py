@@ -0,0 +1,127 @@
+'''
+MlabPy on-disk cache.
+
+Generated artifacts (parse tables, ...) are stored in a per-version directory
+below the cache root. The root is taken from ``conf.CACHE_DIR``, the
+environment variable ``MLABPY_CACHE_DIR`` or defaults to ``~/.cache/mlabpy``
+(respecting ``XDG_CACHE_HOME``).
+
+Compiled matlab modules are cached like Python byte code: in a ``__pycache__``
+directory next to the .m file or, if ``conf.LOADER_CACHE_DIR`` is set, in a
+mirrored directory tree below that root.
+
+Copyright (C) 2015, led02 <mlabpy@led-inc.eu>
+'''
+import hashlib
+import importlib.util
+import marshal
+import os
+import sys
+import threading
+
+import mlabpy
+from mlabpy import conf
+
+
+def get_cache_root():
+    """
+    Return the cache root directory (without version component).
+    """
+    root = conf.CACHE_DIR or os.getenv("MLABPY_CACHE_DIR")
+    if not root:
+        base = os.getenv("XDG_CACHE_HOME") \
+            or os.path.join(os.path.expanduser('~'), '.cache')
+        root = os.path.join(base, 'mlabpy')
+    return root
+
+def get_cache_dir(*parts):
+    """
+    Return (and create) the versioned cache directory, optionally extended by
+    ``parts``. Returns ``None`` if the directory cannot be created.
+    """
+    path = os.path.join(get_cache_root(), mlabpy.VERSION + mlabpy.VERSION_EXTRA, *parts)
+    try:
+        os.makedirs(path, exist_ok=True)
+    except OSError:
+        return None
+    return path
+
+def hash_key(*parts):
+    """
+    Build a stable hex digest over ``parts`` (using their ``repr``).
+    """
+    digest = hashlib.sha1()
+    for part in parts:
+        digest.update(repr(part).encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+def temp_name(path):
+    """
+    Name of a private temporary file that can be atomically moved to ``path``
+    using ``os.replace``. Unique per process and thread.
+    """
+    return '{0}.{1}-{2}.tmp'.format(path, os.getpid(), threading.get_ident())
+
+def commit(tmppath, path):
+    """
+    Atomically move ``tmppath`` to ``path``. Concurrent writers simply
+    overwrite each others results. Returns ``False`` if that failed.
+    """
+    try:
+        os.replace(tmppath, path)
+        return True
+    except OSError:
+        try:
+            os.unlink(tmppath)
+        except OSError:
+            pass
+        return False
+
+def code_cache_path(filepath):
+    """
+    Location of the cached code object for the .m file ``filepath``.
+    """
+    dirname, basename = os.path.split(os.path.abspath(filepath))
+    if conf.LOADER_CACHE_DIR:
+        _, dirname = os.path.splitdrive(dirname)
+        dirname = os.path.join(conf.LOADER_CACHE_DIR, dirname.lstrip(os.sep))
+    else:
+        dirname = os.path.join(dirname, '__pycache__')
+    return os.path.join(dirname, '{0}.{1}.pyc'.format(basename, sys.implementation.cache_tag))
+
+def code_header(key):
+    """
+    Header written in front of cached code. ``key`` is a digest over anything
+    that invalidates the cached code besides the Python version.
+    """
+    return importlib.util.MAGIC_NUMBER + key.encode('ascii')
+
+def read_code(path, key):
+    """
+    Load a code object from ``path`` if its header matches ``key``. Returns
+    ``None`` if the file is missing, stale or broken.
+    """
+    header = code_header(key)
+    try:
+        with open(path, 'rb') as cachefile:
+            if cachefile.read(len(header)) != header:
+                return None
+            return marshal.load(cachefile)
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+
+def write_code(path, key, code):
+    """
+    Store ``code`` at ``path``. Failures are silently ignored, the cache is
+    just an optimization.
+    """
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmppath = temp_name(path)
+        with open(tmppath, 'wb') as cachefile:
+            cachefile.write(code_header(key))
+            marshal.dump(code, cachefile)
+    except OSError:
+        return False
+    return commit(tmppath, path)
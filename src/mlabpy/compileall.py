@@ -0,0 +1,129 @@
+'''
+MlabPy ahead-of-time compiler.
+
+Compiles whole directory trees of matlab files into the code cache (see
+``mlabpy.cache``) or into Python modules, so that later imports do not need to
+load the parser at all. Files are compiled in parallel by a process pool and
+a failing file does not stop the batch.
+
+Usage: ``mlabpy compile [-j JOBS] [-p] PATH ...``
+
+Copyright (C) 2015, led02 <mlabpy@led-inc.eu>
+'''
+import argparse
+import ast
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import mlabpy
+from mlabpy import conf, loader
+
+argp = argparse.ArgumentParser(
+    prog="mlabpy compile",
+    description="Compile matlab files ahead of time.",
+    epilog="Directories are searched recursively for .m files.",
+)
+argp.add_argument(
+    '-j', '--jobs', type=int, default=None,
+    help="Number of worker processes. (default: number of CPUs)",
+)
+argp.add_argument(
+    '-p', '--python', action='store_true',
+    help="Write a Python module next to each .m file instead of cached code.",
+)
+argp.add_argument(
+    '-a', '--autoload', action='append',
+    help="Auto load given Python modules. Must match the runtime configuration.",
+)
+argp.add_argument(
+    '-q', '--quiet', action='store_true',
+    help="Only report failures.",
+)
+argp.add_argument(
+    'paths', nargs='+', metavar="PATH",
+    help="Files or directories to be compiled.",
+)
+
+def find_files(paths):
+    """
+    Yield all .m files from ``paths``, descending into directories.
+    """
+    for path in paths:
+        if not os.path.isdir(path):
+            yield path
+            continue
+
+        for dirname, dirnames, filenames in os.walk(path):
+            dirnames[:] = sorted(name for name in dirnames if name != '__pycache__')
+            for filename in sorted(filenames):
+                if filename.endswith('.m'):
+                    yield os.path.join(dirname, filename)
+
+def compile_file(filepath, python=False):
+    """
+    Compile a single file. Returns a tuple ``(filepath, error)`` where
+    ``error`` is ``None`` on success.
+    """
+    try:
+        mloader = loader.MatlabLoader(None, filepath)
+        if python:
+            source = ast.unparse(ast.fix_missing_locations(mloader.get_tree()))
+            with open(os.path.splitext(filepath)[0] + '.py', 'w') as outfile:
+                outfile.write(source + '\n')
+        else:
+            mloader.get_code()
+        return filepath, None
+    except Exception as e:
+        return filepath, "{0}: {1}".format(e.__class__.__name__, e)
+
+def _init_worker(autoload, cache_dir, loader_cache_dir):
+    """
+    Hand the configuration of the main process to the workers.
+    """
+    mlabpy.autoload[:] = autoload
+    conf.CACHE_DIR = cache_dir
+    conf.LOADER_CACHE = True
+    conf.LOADER_CACHE_DIR = loader_cache_dir
+
+def _compile_python(filepath):
+    return compile_file(filepath, python=True)
+
+def compile_all(filepaths, jobs=None, python=False):
+    """
+    Compile ``filepaths`` using a pool of ``jobs`` processes. Yields the
+    results of ``compile_file`` in order.
+    """
+    worker = _compile_python if python else compile_file
+    initargs = list(mlabpy.autoload), conf.CACHE_DIR, conf.LOADER_CACHE_DIR
+    if jobs == 1:
+        _init_worker(*initargs)
+        for filepath in filepaths:
+            yield worker(filepath)
+        return
+
+    # Make sure the parse tables are cached before the workers need them
+    from mlabpy import parser
+    parser.new()
+
+    with ProcessPoolExecutor(jobs, initializer=_init_worker, initargs=initargs) as pool:
+        for result in pool.map(worker, filepaths, chunksize=4):
+            yield result
+
+def main(argv=None):
+    args = argp.parse_args(argv)
+
+    for autoload_arg in (args.autoload or []):
+        mlabpy.autoload.extend(autoload_arg.split(','))
+
+    filepaths = list(find_files(args.paths))
+    failed = 0
+    for filepath, error in compile_all(filepaths, args.jobs, args.python):
+        if error is None:
+            if not args.quiet:
+                print("ok      {0}".format(filepath))
+        else:
+            failed += 1
+            print("FAILED  {0}: {1}".format(filepath, error))
+
+    print("{0} compiled, {1} failed.".format(len(filepaths) - failed, failed))
+    return 1 if failed else 0
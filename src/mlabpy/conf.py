@@ -3,7 +3,41 @@ MlabPy configuration.
 
 - ``DEBUG`` : Print debug output. (default: False)
 - ``LOADER_DUMP_TREE`` : Write AST to ``.ast`` file after parsing. (default: False)
+- ``CACHE_DIR`` : Root directory for cached parse tables. Falls back to
+  ``MLABPY_CACHE_DIR`` or ``~/.cache/mlabpy``. (default: None)
+- ``LOADER_CACHE`` : Cache compiled .m modules. (default: True)
+- ``LOADER_CACHE_DIR`` : Root directory for compiled .m modules. If unset,
+  a ``__pycache__`` directory next to the .m file is used. (default: None)
+- ``LOADER_LAZY_FUNCTIONS`` : Only install stubs for the functions of a .m
+  file, each function is parsed and compiled on its first call. (default: False)
+- ``LOADER_RESOLVE_FUNCTIONS`` : Resolve unknown names in matlab modules to
+  functions on the search path, see ``mlabpy.funcindex``. (default: True)
+- ``MATLAB_PATH`` : Additional directories searched for functions, extended
+  by ``MLABPY_PATH``. (default: [])
+- ``FILE_BUFFER_SIZE`` : Buffer size in bytes for files opened by
+  ``fopen``. (default: 65536)
+- ``SAVE_FORMAT`` : File format written by ``save`` to files not ending in
+  ``.mat``, either ``'mlabpy'`` (memory-mappable, see ``mlabpy.matfile``) or
+  ``'mat'``. (default: 'mlabpy')
+- ``INTERP_CACHE_SIZE`` : Number of interpolants kept by ``interp1``,
+  ``interp2`` and ``interpn`` for repeated lookups in the same table.
+  (default: 32)
+- ``PROFILE_PHASES`` : Record timings of the load and run phases, see
+  ``mlabpy.phases``. (default: False)
+- ``TIMERS_REPORT`` : Print the statistics of the named ``tic``/``toc``
+  timers at exit. (default: False)
 """
 
 DEBUG = False
 LOADER_DUMP_TREE = False
+CACHE_DIR = None
+LOADER_CACHE = True
+LOADER_CACHE_DIR = None
+LOADER_LAZY_FUNCTIONS = False
+LOADER_RESOLVE_FUNCTIONS = True
+MATLAB_PATH = []
+FILE_BUFFER_SIZE = 1 << 16
+SAVE_FORMAT = 'mlabpy'
+INTERP_CACHE_SIZE = 32
+PROFILE_PHASES = False
+TIMERS_REPORT = False
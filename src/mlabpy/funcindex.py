@@ -0,0 +1,227 @@
+'''
+MlabPy function index.
+
+MATLAB resolves unknown identifiers to function files anywhere on its search
+path. ``FunctionIndex`` maps function names to .m files over the search
+directories: the current directory, ``conf.MATLAB_PATH`` and the directories
+in the environment variable ``MLABPY_PATH``. Earlier directories shadow later
+ones.
+
+The directory listings are stored together with their modification times in
+the cache directory and only re-read for directories that changed. Lookups
+are plain dictionary lookups; a miss re-checks the directories at most once
+per ``REFRESH_INTERVAL`` seconds (or when ``rehash`` is called).
+
+Compiled matlab modules call ``bind`` with the names they read. Every name
+that is neither defined in the module nor a Python builtin is bound to a stub
+that loads the function from the index on its first call and then replaces
+itself. Globals and builtins stay plain dicts, so name lookups in compiled
+code keep CPython's fast path.
+
+Copyright (C) 2015, led02 <mlabpy@led-inc.eu>
+'''
+import builtins
+import json
+import os
+import time
+import weakref
+
+from mlabpy import cache, conf
+
+REFRESH_INTERVAL = 1.0
+
+def search_path():
+    """
+    Return the absolute search directories in lookup order.
+    """
+    dirs = ['.'] + list(conf.MATLAB_PATH)
+    env_path = os.getenv("MLABPY_PATH")
+    if env_path:
+        dirs.extend(filter(None, env_path.split(os.pathsep)))
+
+    result = []
+    for dirname in map(os.path.abspath, dirs):
+        if dirname not in result:
+            result.append(dirname)
+    return result
+
+class FunctionIndex(object):
+    """
+    Function name -> .m file index over ``dirs``.
+    """
+
+    def __init__(self, dirs):
+        self.dirs = list(dirs)
+        self._listings = {}
+        self._functions = {}
+        self._modules = {}
+        self._checked = 0.0
+
+        cachedir = cache.get_cache_dir('funcindex')
+        self._indexfile = cachedir and os.path.join(cachedir, cache.hash_key(self.dirs) + '.json')
+        self._load()
+        self.refresh()
+
+    def _load(self):
+        if not self._indexfile:
+            return
+        try:
+            with open(self._indexfile, 'r') as infile:
+                listings = json.load(infile)
+        except (OSError, ValueError):
+            return
+        for dirname, (mtime, names) in listings.items():
+            if dirname in self.dirs:
+                self._listings[dirname] = mtime, names
+
+    def _save(self):
+        if not self._indexfile:
+            return
+        tmpfile = cache.temp_name(self._indexfile)
+        try:
+            with open(tmpfile, 'w') as outfile:
+                json.dump(self._listings, outfile)
+        except OSError:
+            return
+        cache.commit(tmpfile, self._indexfile)
+
+    def refresh(self):
+        """
+        Re-read all directories whose modification time changed.
+        """
+        changed = False
+        for dirname in self.dirs:
+            try:
+                mtime = os.stat(dirname).st_mtime_ns
+            except OSError:
+                mtime = None
+
+            listing = self._listings.get(dirname)
+            if listing is None or listing[0] != mtime:
+                try:
+                    names = sorted(name[:-2] for name in os.listdir(dirname) if name.endswith('.m'))
+                except OSError:
+                    names = []
+                self._listings[dirname] = mtime, names
+                changed = True
+
+        if changed or not self._functions:
+            functions = {}
+            for dirname in reversed(self.dirs):
+                for name in self._listings[dirname][1]:
+                    functions[name] = os.path.join(dirname, name + '.m')
+            self._functions = functions
+        if changed:
+            self._save()
+        self._checked = time.monotonic()
+
+    def lookup(self, name):
+        """
+        Return the .m file defining ``name`` or ``None``.
+        """
+        filepath = self._functions.get(name)
+        if filepath is None and time.monotonic() - self._checked > REFRESH_INTERVAL:
+            self.refresh()
+            filepath = self._functions.get(name)
+        return filepath
+
+    def __contains__(self, name):
+        return self.lookup(name) is not None
+
+    def resolve(self, name):
+        """
+        Load the function ``name`` from its .m file. Returns ``None`` if there
+        is no such file or it does not define the function.
+        """
+        filepath = self.lookup(name)
+        if filepath is None:
+            return None
+
+        module = self._modules.get(filepath)
+        if module is None:
+            from mlabpy import loader
+            module = loader.load_file(filepath, name)
+            self._modules[filepath] = module
+        return getattr(module, name, None)
+
+_index = None
+_index_key = None
+
+def get_index():
+    """
+    Return the index for the current search path.
+    """
+    global _index, _index_key
+    key = os.getcwd(), tuple(conf.MATLAB_PATH), os.getenv("MLABPY_PATH")
+    if key != _index_key:
+        dirs = search_path()
+        if _index is None or _index.dirs != dirs:
+            _index = FunctionIndex(dirs)
+            forget_resolved()
+        _index_key = key
+    return _index
+
+def rehash():
+    """
+    Re-check all search directories for new or removed functions.
+    """
+    get_index().refresh()
+    forget_resolved()
+
+def forget_resolved():
+    """
+    Drop the functions resolved so far, they are looked up again on their
+    next use. Called whenever the search path changes.
+    """
+    for functions in list(_bound):
+        functions.forget()
+
+class _PathFunctions(object):
+    """
+    The search path functions of one module namespace: ``resolved`` maps
+    the names whose stubs were replaced to the loaded functions.
+    """
+    
+    def __init__(self, namespace):
+        self.namespace = namespace
+        self.resolved = {}
+    
+    def bind(self, names):
+        for name in names:
+            if not name.startswith('_') and name not in self.namespace and name not in builtins.__dict__:
+                self.namespace[name] = self._stub(name)
+    
+    def _stub(self, name):
+        def stub(*args):
+            func = get_index().resolve(name)
+            if func is None:
+                raise NameError("name '{0}' is not defined".format(name))
+            if self.namespace.get(name) is stub:
+                self.namespace[name] = self.resolved[name] = func
+            return func(*args)
+        
+        stub.__name__ = stub.__qualname__ = name
+        return stub
+    
+    def forget(self):
+        for name, func in self.resolved.items():
+            if self.namespace.get(name) is func:
+                self.namespace[name] = self._stub(name)
+        self.resolved.clear()
+
+# _PathFunctions of all live namespaces
+_bound = weakref.WeakSet()
+
+def bind(namespace, names):
+    """
+    Bind the ``names`` a module reads but does not define to stubs that load
+    the function of the same name from the search path on the first call.
+    Does nothing unless ``conf.LOADER_RESOLVE_FUNCTIONS`` is set.
+    """
+    if not conf.LOADER_RESOLVE_FUNCTIONS:
+        return
+    functions = namespace.get('__mlabpy_path__')
+    if functions is None:
+        functions = namespace['__mlabpy_path__'] = _PathFunctions(namespace)
+        _bound.add(functions)
+    functions.bind(names)
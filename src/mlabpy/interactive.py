@@ -7,12 +7,11 @@ Copyright (C) 2015, led02 <mlabpy@led-inc.eu>
 '''
 import ast
 import cmd
-import importlib
 import traceback
 import types
 
 import mlabpy
-from mlabpy import conf, lexer, loader, parser
+from mlabpy import conf, lexer, loader, parser, runtime
 
 class MlabInterpreter(cmd.Cmd):
     def __init__(self):
@@ -32,7 +31,7 @@ class MlabInterpreter(cmd.Cmd):
         self._mod.opt = self._opt
         
         for modname in mlabpy.autoload:
-            self._import_mod(importlib.import_module(modname))
+            runtime.bind(self._mod.__dict__, modname)
     
     def _import_mod(self, mod):
         for name, value in mod.__dict__.items():
@@ -5,10 +5,15 @@ Copyright (C) 2015, led02 <mlabpy@led-inc.eu>
 
 Heavy based on 'SMOP compiler'. Copyright 2011-2014 Victor Leikehman
 '''
+import importlib.util
+import os
 import re
+import threading
 from ply import lex
 from ply.lex import TOKEN
 
+from mlabpy import cache, phases
+
 class IllegalCharacterError(Exception):
     pass
 
@@ -46,7 +51,36 @@ reserved = {
 tokens += list(reserved.values())
 #literals = "="
 
-def new():
+def _number(text):
+    """
+    Convert the text of a NUMBER token (hex, integer, float or imaginary).
+    """
+    text = text.lower()
+    if text.startswith('0x'):
+        return int(text, 16)
+    elif text[-1] in 'ij':
+        return complex(0, float(text[:-1]))
+    elif '.' in text or 'e' in text:
+        return float(text)
+    else:
+        return int(text)
+
+def _read_lextab(path):
+    """
+    Load a table module written by ``Lexer.writetab``. Returns ``None`` if
+    there is no usable table.
+    """
+    if not os.path.exists(path):
+        return None
+    try:
+        spec = importlib.util.spec_from_file_location('mlab_lextab', path)
+        lextab = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(lextab)
+        return lextab
+    except Exception:
+        return None
+
+def _build():
     t_AND         = r"\&"
     t_ANDAND      = r"\&\&"
     t_ANDEQ       = r"\&="
@@ -90,8 +124,8 @@ def new():
     ws1 = ws+"+"
     ws0 = ws+"*"
     ms  = r"'([^']|(''))*'" 
-    os  = r'"([^"\a\b\f\r\t\0\v\n\\]|(\\[abfn0vtr\"\n\\])|(""))*"'
-    mos = "({0})|({1})".format(os,ms)
+    ds  = r'"([^"\a\b\f\r\t\0\v\n\\]|(\\[abfn0vtr\"\n\\])|(""))*"'
+    mos = "({0})|({1})".format(ds,ms)
     id  = r"[a-zA-Z_][a-zA-Z_0-9]*"
     
     def unescape(s):
@@ -220,9 +254,7 @@ def new():
 
     def t_NUMBER(t):
         r"(0x[0-9A-Fa-f]+)|((\d+(\.\d*)?|\.\d+)([eE][-+]?\d+)?[ij]?)"
-        if t.value[-1] == 'i':
-            t.value = t.value[:-1]+'j'
-        t.value = eval(t.value)
+        t.value = _number(t.value)
         return t
 
     def t_NEWLINE(t):
@@ -303,7 +335,42 @@ def new():
         column=t.lexer.lexpos - t.lexer.lexdata.rfind("\n",0,t.lexer.lexpos)
         raise IllegalCharacterError(t.lineno,column,t.value[0])
 
+    cachedir = cache.get_cache_dir('lexer')
+    if cachedir is None:
+        return lex.lex(reflags=re.I)
+    
+    with open(__file__, 'rb') as srcfile:
+        key = cache.hash_key(srcfile.read(), lex.__tabversion__)
+    tabfile = os.path.join(cachedir, 'mlab_lextab-{0}.py'.format(key))
+    lextab = _read_lextab(tabfile)
+    if lextab is not None:
+        try:
+            return lex.lex(reflags=re.I, optimize=1, lextab=lextab)
+        except Exception:
+            pass
+    
     lexer = lex.lex(reflags=re.I)
+    tmpname = 'mlab_lextab_{0}_{1}'.format(os.getpid(), threading.get_ident())
+    try:
+        lexer.writetab(tmpname, cachedir)
+        cache.commit(os.path.join(cachedir, tmpname + '.py'), tabfile)
+    except IOError:
+        pass
+    return lexer
+
+_lexer = None
+
+def new():
+    """
+    Return a lexer with fresh state. The master lexer is only built once,
+    callers get a clone with their own bracket, parenthesis and brace counters.
+    """
+    global _lexer
+    if _lexer is None:
+        with phases.phase('lexer'):
+            _lexer = _build()
+    
+    lexer = _lexer.clone()
     lexer.brackets = 0  # count open square brackets
     lexer.parens = 0    # count open parentheses
     lexer.braces = 0    # count open curly braces
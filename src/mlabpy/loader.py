@@ -4,45 +4,165 @@ MlabPy matlab module loader.
 This is the other magical piece that hooks into the Python runtime and enables
 automatic loading of matlab files as Python modules.
 
+If ``conf.LOADER_LAZY_FUNCTIONS`` is set, only the script part of a file is
+parsed on import. Every function gets a stub (see ``lazy_function``) that
+parses and compiles the function on its first call.
+
 Copyright (C) 2015, led02 <mlabpy@led-inc.eu>
 '''
 import ast
 import os
+import re
 import sys
-from importlib.abc import Finder, Loader
+import threading
+from importlib.abc import Loader, MetaPathFinder
+from importlib.util import module_from_spec, spec_from_file_location
 
 import mlabpy
-from mlabpy import conf, lexer, parser
+from mlabpy import cache, conf, funcindex, phases
+
+_FUNCTION_RE = re.compile(r'^[ \t]*function\b', re.M)
+_FUNCTION_NAME_RE = re.compile(r'function\s*(?:(?:\[[^\]]*\]|[A-Za-z_]\w*)\s*=\s*)?([A-Za-z_]\w*)')
+
+def split_functions(buf):
+    """
+    Split matlab source into the script part and a list of functions
+    ``(name, lineno, source)`` without parsing it. Returns ``None`` if the
+    functions cannot be identified.
+    """
+    starts = [match.start() for match in _FUNCTION_RE.finditer(buf)]
+    functions = []
+    for start, end in zip(starts, starts[1:] + [len(buf)]):
+        match = _FUNCTION_NAME_RE.match(buf, buf.index('function', start))
+        if match is None:
+            return None
+        functions.append((match.group(1), buf.count('\n', 0, start) + 1, buf[start:end]))
+    return buf[:starts[0]] if starts else buf, functions
+
+# ply parsers are not reentrant, all parsing goes through this lock
+_parse_lock = threading.RLock()
+
+_CODEGEN_MODULES = ('lexer.py', 'parser.py', 'loader.py')
+_codegen_key = None
 
+def codegen_key():
+    """
+    Digest of the sources of lexer, parser and loader. Code compiled by
+    another version of them is not reused. The modules are only read, not
+    imported, so cached code can still be loaded without the parser.
+    """
+    global _codegen_key
+    if _codegen_key is None:
+        sources = []
+        for name in _CODEGEN_MODULES:
+            with open(os.path.join(os.path.dirname(__file__), name), 'rb') as infile:
+                sources.append(infile.read())
+        _codegen_key = cache.hash_key(*sources)
+    return _codegen_key
 
-class MatLabFinder(Finder):
+def global_names(tree):
+    """
+    Sorted names read by the statements ``tree`` that are not defined as
+    functions by them. Assignments do not count, script variables may be
+    read before they are assigned.
+    """
+    defined = set(node.name for node in tree if isinstance(node, ast.FunctionDef))
+    names = set()
+    for statement in tree:
+        for node in ast.walk(statement):
+            if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Load):
+                names.add(node.id)
+    return sorted(names - defined)
+
+def lazy_function(namespace, name, filepath, lineno, source):
+    """
+    Create a stub for the function ``name`` defined by ``source`` (starting at
+    line ``lineno`` of ``filepath``). The first call compiles the function into
+    ``namespace``, replacing the stub.
+    """
+    def stub(*args):
+        func = namespace.get(name)
+        if func is stub:
+            from mlabpy import lexer, parser
+            with _parse_lock:
+                # Another thread may have compiled it in the meantime
+                if namespace.get(name) is stub:
+                    with phases.phase('function ' + name, filepath):
+                        mlexer = lexer.new()
+                        mlexer.lineno = lineno
+                        tree = parser.new().parse(source, lexer=mlexer)
+                        module = ast.fix_missing_locations(ast.Module(tree, []))
+                        exec(compile(module, filename=filepath, mode="exec"), namespace)
+                        funcindex.bind(namespace, global_names(tree))
+                    if namespace.get(name) is stub:
+                        # The stub would call itself forever
+                        raise ImportError("{0}, line {1}: function '{2}' not found in its source".format(
+                            filepath, lineno, name), name=name, path=filepath)
+            func = namespace[name]
+        return func(*args)
+    
+    stub.__name__ = stub.__qualname__ = name
+    return stub
+
+
+class MatLabFinder(MetaPathFinder):
     """
     Implements ``finder`` protocol to be added to ``sys.meta_path``.
+    
+    The .m files of every directory are listed once and cached until the
+    modification time of the directory changes (like ``FileFinder`` does).
     """
     
     def __init__(self):
-        self._parser = parser.new()
+        self._listings = {}
     
-    def find_module(self, fullname, path=None):
+    def _get_modules(self, dirname):
         """
-        Load .m files from package or from ``sys.path``.
+        Return the names of all .m files in ``dirname`` (without suffix).
+        """
+        if not dirname or dirname == '.':
+            dirname = os.getcwd()
+        
+        try:
+            mtime = os.stat(dirname).st_mtime_ns
+        except (OSError, TypeError, ValueError):
+            return ()
+        
+        listing = self._listings.get(dirname)
+        if listing is None or listing[0] != mtime:
+            try:
+                names = os.listdir(dirname)
+            except OSError:
+                names = []
+            listing = mtime, frozenset(name[:-2] for name in names if name.endswith('.m'))
+            self._listings[dirname] = listing
+        return listing[1]
+    
+    def invalidate_caches(self):
+        """
+        Drop all cached directory listings.
+        """
+        self._listings.clear()
+    
+    def find_spec(self, fullname, path=None, target=None):
+        """
+        Find .m files in package or in ``sys.path``. The parser is only created
+        when a module actually needs to be compiled.
         """
-        # TODO find_spec
         if path is not None:
             # path is set -> we are in a package
-            modname = fullname.split('.')[-1]
+            modname = fullname.rpartition('.')[2]
         else:
             # not in package -> search cwd and sys.path
             modname = fullname
             path = ['.'] + sys.path
         
-        filename = modname + '.m'
         for dirname in path:
-            filepath = os.path.join(dirname, filename)
-            if os.path.exists(filepath):
+            if modname in self._get_modules(dirname):
+                filepath = os.path.join(dirname, modname + '.m')
                 if conf.DEBUG:
                     print("* Loading {0} from {1}...".format(modname, filepath))
-                return MatlabLoader(self._parser, filepath)
+                return spec_from_file_location(fullname, filepath, loader=MatlabLoader(None, filepath))
 
 class MatlabLoader(Loader):
     """
@@ -51,40 +171,146 @@ class MatlabLoader(Loader):
     
     def __init__(self, parser, filepath):
         """
-        ``parser`` is a ``ply.yacc`` parser instance. ``filename`` is the .m file to be loaded. 
+        ``parser`` is a ``ply.yacc`` parser instance or ``None`` to create it
+        on demand. ``filename`` is the .m file to be loaded. 
         """
         self._parser = parser
         self._filepath = filepath
     
     def _get_imports(self):
         """
-        Create ``ast.Import`` nodes for ``mlabpy.autoload``.
+        Create nodes that bind ``mlabpy.autoload`` into the module namespace
+        (see ``mlabpy.runtime.bind``).
         """
-        imports = []
+        imports = [ast.ImportFrom('mlabpy.runtime', [ast.alias('bind', '__mlabpy_bind__')], 0)]
         for modname in mlabpy.autoload:
-            import_node = ast.ImportFrom(modname, [ast.alias('*', None)], 0)
-            import_node.lineno = 0
-            import_node.col_offset = 0
-            imports.append(import_node)
+            bind_call = ast.Call(ast.Name('__mlabpy_bind__', ast.Load()), [
+                ast.Call(ast.Name('globals', ast.Load()), [], []),
+                ast.Constant(modname),
+            ], [])
+            imports.append(ast.Expr(bind_call))
+        for node in imports:
+            ast.fix_missing_locations(node)
         return imports
-
-    def exec_module(self, module):
+    
+    def _get_path_functions(self, tree):
         """
-        Read the source from ``_filepath``, try to parse it and finally
-        compile the AST to a Python module.
+        Create nodes that bind the names read by ``tree`` to functions on
+        the search path (see ``mlabpy.funcindex.bind``).
         """
-        module.__file__ = self._filepath
+        nodes = [
+            ast.ImportFrom('mlabpy.funcindex', [ast.alias('bind', '__mlabpy_functions__')], 0),
+            ast.Expr(ast.Call(ast.Name('__mlabpy_functions__', ast.Load()), [
+                ast.Call(ast.Name('globals', ast.Load()), [], []),
+                ast.Constant(tuple(global_names(tree))),
+            ], [])),
+        ]
+        for node in nodes:
+            ast.fix_missing_locations(node)
+        return nodes
+    
+    def _get_cache_key(self, stat):
+        """
+        Key for the code cache. Changes whenever the source file, the MlabPy
+        version, the code generator, the automatically imported modules or
+        the compilation mode change.
+        """
+        return cache.hash_key(stat.st_mtime_ns, stat.st_size,
+                              mlabpy.VERSION + mlabpy.VERSION_EXTRA, codegen_key(),
+                              list(mlabpy.autoload), conf.LOADER_LAZY_FUNCTIONS)
+    
+    def _get_stubs(self, functions):
+        """
+        Create assignments that install a ``lazy_function`` stub for each
+        function.
+        """
+        stubs = [ast.ImportFrom('mlabpy.loader', [ast.alias('lazy_function', '__mlabpy_lazy__')], 0)]
+        for name, lineno, source in functions:
+            stub_call = ast.Call(ast.Name('__mlabpy_lazy__', ast.Load()), [
+                ast.Call(ast.Name('globals', ast.Load()), [], []),
+                ast.Constant(name),
+                ast.Name('__file__', ast.Load()),
+                ast.Constant(lineno),
+                ast.Constant(source),
+            ], [])
+            stubs.append(ast.Assign([ast.Name(name, ast.Store())], stub_call))
+        for node in stubs:
+            ast.fix_missing_locations(node)
+        return stubs
+    
+    def get_tree(self):
+        """
+        Read the source from ``_filepath`` and parse it to an ``ast.Module``.
+        """
+        from mlabpy import lexer, parser
+        with open(self._filepath, 'r') as infile:
+            buf = infile.read()
         
-        buf = open(self._filepath, 'r').read()
-        tree = self._get_imports() \
-             + self._parser.parse(buf, lexer=lexer.new())
+        tree = self._get_imports()
+        if conf.LOADER_LAZY_FUNCTIONS:
+            chunks = split_functions(buf)
+            if chunks is not None:
+                buf, functions = chunks
+                tree += self._get_stubs(functions)
         
-        mod = ast.Module(tree)
-        if conf.LOADER_DUMP_TREE:
-            parser.dump(mod, outfile=open(self._filepath + '.ast', 'w'))
+        mlexer = lexer.new()
+        with _parse_lock, phases.phase('parse', self._filepath):
+            if self._parser is None:
+                self._parser = parser.new()
+            body = self._parser.parse(buf, lexer=mlexer)
+        tree += self._get_path_functions(body) + body
         
-        code = compile(mod, filename=self._filepath, mode="exec")
-        exec(code, module.__dict__, module.__dict__)
+        mod = ast.fix_missing_locations(ast.Module(tree, []))
+        if conf.LOADER_DUMP_TREE:
+            with open(self._filepath + '.ast', 'w') as outfile:
+                parser.dump(mod, outfile=outfile)
+        return mod
+    
+    def get_code(self):
+        """
+        Return the compiled code for ``_filepath``. Cached code is used if it
+        is still valid, otherwise the source is parsed and compiled.
+        """
+        with phases.phase('load', self._filepath):
+            if not conf.LOADER_CACHE:
+                return self._compile()
+            
+            key = self._get_cache_key(os.stat(self._filepath))
+            cachefile = cache.code_cache_path(self._filepath)
+            code = None
+            if not conf.LOADER_DUMP_TREE:
+                with phases.phase('cached code'):
+                    code = cache.read_code(cachefile, key)
+            if code is None:
+                code = self._compile()
+                cache.write_code(cachefile, key, code)
+            elif conf.DEBUG:
+                print("* Using cached code for {0}".format(self._filepath))
+            return code
+    
+    def _compile(self):
+        tree = self.get_tree()
+        with phases.phase('compile'):
+            return compile(tree, filename=self._filepath, mode="exec")
+
+    def exec_module(self, module):
+        """
+        Compile (or load from cache) the module code and execute it.
+        """
+        module.__file__ = self._filepath
+        code = self.get_code()
+        with phases.phase('exec', self._filepath):
+            exec(code, module.__dict__, module.__dict__)
+
+def load_file(filepath, modname):
+    """
+    Load the matlab file ``filepath`` as module ``modname`` without adding it
+    to ``sys.modules``.
+    """
+    spec = spec_from_file_location(modname, filepath, loader=MatlabLoader(None, filepath))
+    module = module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
 
 # Stores the loader for re-use
 _matlab_loader = None
@@ -0,0 +1,291 @@
+'''
+MlabPy data files.
+
+``save`` and ``load`` store workspace variables in a simple container that
+can be memory-mapped:
+
+- 8 bytes magic, 8 bytes header length (little endian),
+- a JSON header describing all variables,
+- the array data, each block aligned to ``ALIGNMENT`` bytes.
+
+Arrays are stored uncompressed by default, ``load`` maps the file once
+(copy-on-write) and returns views into the mapping. Nothing is read before
+the data is actually used. Compressed blocks (zlib) are inflated on load.
+
+MATLAB ``.mat`` files (v5/v7) are read and written through ``scipy.io`` if
+SciPy is available.
+
+Copyright (C) 2015, led02 <mlabpy@led-inc.eu>
+'''
+import json
+import struct as _struct
+import zlib
+
+import numpy
+
+from mlabpy import cache
+from mlabpy.runtime.core import _columns, _logical, colon, matrix, struct, structarray, vector
+
+MAGIC = b'MLABPY\x00\x01'
+ALIGNMENT = 64
+ZLIB_LEVEL = 1
+
+_HEADER = _struct.Struct('<8sQ')
+_scalar_types = (bool, int, float, complex, str, type(None))
+
+def _align(offset):
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+def saveable(value):
+    """
+    True if ``value`` can be stored by ``save``.
+    """
+    if isinstance(value, (vector, struct)):
+        return True
+    if isinstance(value, (matrix, colon, numpy.ndarray, numpy.generic)):
+        return numpy.asarray(value).dtype.kind != 'O'
+    return isinstance(value, _scalar_types)
+
+class _Writer(object):
+    def __init__(self, compress):
+        self.compress = compress
+        self.blocks = []
+        self.size = 0
+
+    def encode(self, value):
+        if isinstance(value, (bool, _logical)):
+            return {'type': 'bool', 'value': bool(value)}
+        elif isinstance(value, complex):
+            return {'type': 'complex', 'value': [value.real, value.imag]}
+        elif isinstance(value, _scalar_types):
+            return {'type': 'scalar', 'value': value}
+        elif isinstance(value, structarray):
+            return self.encode_columns(value._fields)
+        elif isinstance(value, struct):
+            return {'type': 'struct', 'fields': [[name, self.encode(field)] for name, field in value.items()]}
+        elif isinstance(value, vector):
+            return {'type': 'cell', 'items': [self.encode(item) for item in value]}
+        elif isinstance(value, numpy.generic):
+            node = self.encode_array(numpy.asarray(value))
+            node['type'] = 'npscalar'
+            return node
+        elif isinstance(value, numpy.ndarray):
+            node = self.encode_array(value)
+            node['type'] = 'ndarray'
+            return node
+        elif isinstance(value, (matrix, colon)):
+            return self.encode_array(numpy.asarray(value))
+        raise TypeError("cannot save values of type '{0}'".format(type(value).__name__))
+
+    def encode_columns(self, columns):
+        # Struct arrays are stored column by column
+        fields = []
+        for name, buf in columns.items():
+            column = buf[:columns.n]
+            if column.dtype.kind == 'O':
+                node = {'type': 'cell', 'items': [self.encode(item) for item in column]}
+            else:
+                node = self.encode_array(column)
+            mask = columns.empty.get(name)
+            fields.append([name, node, None if mask is None else self.encode_array(mask[:columns.n])])
+        return {'type': 'structarray', 'n': columns.n, 'fields': fields}
+
+    def encode_array(self, data):
+        if data.dtype.kind == 'O':
+            raise TypeError('cannot save object arrays')
+        if data.flags.f_contiguous and not data.flags.c_contiguous:
+            order, raw = 'F', data.T
+        else:
+            order, raw = 'C', numpy.ascontiguousarray(data)
+        raw = raw.reshape(-1).view(numpy.uint8)
+        if self.compress:
+            raw = zlib.compress(raw, ZLIB_LEVEL)
+
+        offset = _align(self.size)
+        self.blocks.append((offset, raw))
+        self.size = offset + len(raw)
+        return {
+            'type': 'matrix',
+            'dtype': data.dtype.str,
+            'shape': list(data.shape),
+            'order': order,
+            'offset': offset,
+            'nbytes': len(raw),
+            'zlib': self.compress,
+        }
+
+def save_native(filename, variables, compress=False):
+    """
+    Write the mapping ``variables`` to ``filename``. The file is replaced
+    atomically, arrays still mapped from the old file stay valid.
+    """
+    writer = _Writer(compress)
+    nodes = [[name, writer.encode(value)] for name, value in variables.items()]
+    header = json.dumps({'variables': nodes}).encode('utf-8')
+    start = _align(_HEADER.size + len(header))
+
+    tmpfile = cache.temp_name(filename)
+    with open(tmpfile, 'wb') as outfile:
+        outfile.write(_HEADER.pack(MAGIC, len(header)))
+        outfile.write(header)
+        for offset, raw in writer.blocks:
+            outfile.seek(start + offset)
+            outfile.write(raw)
+        outfile.truncate(start + writer.size)
+    if not cache.commit(tmpfile, filename):
+        raise OSError("cannot write '{0}'".format(filename))
+
+class _Reader(object):
+    def __init__(self, filename, start):
+        self.filename = filename
+        self.start = start
+        self._mapping = None
+
+    @property
+    def mapping(self):
+        if self._mapping is None:
+            self._mapping = numpy.memmap(self.filename, numpy.uint8, 'c')
+        return self._mapping
+
+    def decode(self, node):
+        kind = node['type']
+        if kind in ('bool', 'scalar'):
+            return node['value']
+        elif kind == 'complex':
+            return complex(*node['value'])
+        elif kind == 'struct':
+            return struct._from_fields((name, self.decode(field)) for name, field in node['fields'])
+        elif kind == 'cell':
+            return vector(self.decode(item) for item in node['items'])
+        elif kind == 'structarray':
+            return structarray._from_columns(self.decode_columns(node))
+
+        data = self.decode_array(node)
+        if kind == 'npscalar':
+            return data[()]
+        elif kind == 'ndarray':
+            return data
+        return matrix._wrap(data)
+
+    def decode_columns(self, node):
+        columns = _columns(node['n'])
+        for name, column, mask in node['fields']:
+            if column['type'] == 'cell':
+                buf = numpy.empty(columns.n, object)
+                for i, item in enumerate(column['items']):
+                    buf[i] = self.decode(item)
+            else:
+                buf = self.decode_array(column)
+            columns[name] = buf
+            if mask is not None:
+                columns.empty[name] = self.decode_array(mask).copy()
+        return columns
+
+    def decode_array(self, node):
+        dtype = numpy.dtype(node['dtype'])
+        shape = tuple(node['shape'])
+        offset = self.start + node['offset']
+        if node['zlib']:
+            raw = self.mapping[offset:offset + node['nbytes']]
+            data = numpy.frombuffer(bytearray(zlib.decompress(raw)), dtype)
+        elif node['nbytes']:
+            data = numpy.ndarray(node['nbytes'] // dtype.itemsize, dtype, self.mapping, offset)
+        else:
+            data = numpy.zeros(0, dtype)
+        if node['order'] == 'F':
+            return data.reshape(shape[::-1]).T
+        return data.reshape(shape)
+
+def is_native(filename):
+    with open(filename, 'rb') as infile:
+        return infile.read(len(MAGIC)) == MAGIC
+
+def load_native(filename, names=None):
+    """
+    Return the variables stored in ``filename`` (all or only ``names``) as
+    list of (name, value) pairs. Uncompressed arrays are views of the mapped
+    file.
+    """
+    with open(filename, 'rb') as infile:
+        magic, length = _HEADER.unpack(infile.read(_HEADER.size))
+        if magic != MAGIC:
+            raise ValueError("'{0}' is not a MlabPy data file".format(filename))
+        header = json.loads(infile.read(length).decode('utf-8'))
+
+    reader = _Reader(filename, _align(_HEADER.size + length))
+    return [
+        (name, reader.decode(node))
+        for name, node in header['variables']
+        if names is None or name in names
+    ]
+
+def _scipy_io():
+    try:
+        import scipy.io
+    except ImportError:
+        raise ImportError('.mat files need scipy')
+    return scipy.io
+
+def _to_mat(value):
+    if isinstance(value, structarray):
+        names = list(value.keys())
+        record = numpy.empty((1, len(value)), dtype=[(name, object) for name in names])
+        for i in range(len(value)):
+            element = value(i + 1)
+            for name in names:
+                record[name][0, i] = _to_mat(element[name])
+        return record
+    elif isinstance(value, struct):
+        return dict((name, _to_mat(field)) for name, field in value.items())
+    elif isinstance(value, vector):
+        cell = numpy.empty((1, len(value)), dtype=object)
+        for i, item in enumerate(value):
+            cell[0, i] = _to_mat(item)
+        return cell
+    elif isinstance(value, (matrix, colon)):
+        return numpy.asarray(value)
+    elif value is None:
+        return numpy.zeros((0, 0))
+    return value
+
+def _from_mat(value):
+    if isinstance(value, numpy.ndarray):
+        if value.dtype.kind == 'O':
+            items = [_from_mat(item) for item in value.ravel(order='F')]
+            if len(items) > 1 and all(type(item) is struct for item in items):
+                args = []
+                for name in items[0].keys():
+                    args.extend((name, vector(item.get(name) for item in items)))
+                return structarray(*args)
+            return vector(items)
+        if value.ndim == 0:
+            return value.item()
+        return matrix._wrap(value)
+    elif isinstance(value, numpy.generic):
+        return value.item()
+    elif hasattr(value, '_fieldnames'):
+        return struct._from_fields((name, _from_mat(getattr(value, name))) for name in value._fieldnames)
+    return value
+
+def save_mat(filename, variables, compress=False):
+    """
+    Write ``variables`` to the MATLAB v5 (``compress``: v7) file ``filename``.
+    """
+    _scipy_io().savemat(
+        filename, dict((name, _to_mat(value)) for name, value in variables.items()),
+        do_compression=compress, oned_as='row',
+    )
+
+def load_mat(filename, names=None):
+    """
+    Read the variables (all or only ``names``) of a MATLAB file.
+    """
+    contents = _scipy_io().loadmat(
+        filename, variable_names=names, squeeze_me=True,
+        struct_as_record=False, chars_as_strings=True,
+    )
+    return [
+        (name, _from_mat(value))
+        for name, value in contents.items()
+        if not name.startswith('__')
+    ]
@@ -8,10 +8,12 @@ Copyright (C) 2015, led02 <mlabpy@led-inc.eu>
 Heavy based on 'smop'. Copyright 2011-2014 Victor Leikehman.
 '''
 import ast
+import copy
+import os
 import sys
 from ply import yacc
 
-from mlabpy import conf, lexer
+from mlabpy import cache, conf, lexer, phases
 from builtins import isinstance
 import io
 
@@ -114,20 +116,21 @@ class Parser(object):
         """
         arg1 : STRING
         """
-        p[0] = self._new_node(p, ast.Str, p[1])
+        p[0] = self._new_node(p, ast.Constant, p[1])
     
     def p_arg1_number(self, p):
         """
         arg1 : NUMBER
         """
-        p[0] = self._new_node(p, ast.Num, p[1])
+        p[0] = self._new_node(p, ast.Constant, p[1])
     
     def p_arg1_other(self, p):
         """
         arg1 : IDENT
              | GLOBAL
         """
-        p[0] = self._new_name(p, p[1])
+        # Command syntax passes words as strings: save out_mtx -> save('out_mtx')
+        p[0] = self._new_node(p, ast.Constant, p[1])
     
     def p_args(self, p):
         """
@@ -242,10 +245,10 @@ class Parser(object):
                      | FUNCTION ret EQ IDENT args_opt SEMI 
         """
         if len(p) == 5:
-            p[0] = self._new_node(p, ast.FunctionDef, p[2], p[3], [], [], None)
+            p[0] = self._new_function(p, p[2], p[3])
             self._ret_expr = None
         elif len(p) == 7:
-            p[0] = self._new_node(p, ast.FunctionDef, p[4], p[5], [], [], None)
+            p[0] = self._new_function(p, p[4], p[5])
             self._ret_expr = p[2]
             if isinstance(self._ret_expr, ast.Name):
                 name_node = self._new_name(p, self._ret_expr.id)
@@ -253,6 +256,14 @@ class Parser(object):
                 p[0].body.append(self._new_node(p, ast.Assign,
                     [name_node], self._new_call(p, self._new_name(p, 'struct'))
                 ))
+        
+        # Arguments are passed by value
+        for arg in p[0].args.args:
+            name_node = self._new_name(p, arg.arg)
+            name_node.ctx = ast.Store()
+            p[0].body.append(self._new_node(p, ast.Assign,
+                [name_node], self._new_share(p, self._new_name(p, arg.arg))
+            ))
     
     def p_args_opt(self, p):
         """
@@ -328,14 +339,14 @@ class Parser(object):
         """
         concat_list : expr_list SEMI expr_list
         """
-        p[0] = [self._new_list(p, p[1]), self._new_list(p, p[3])]
+        p[0] = [p[1], p[3]]
     
     def p_concat_list_2(self, p):
         """
         concat_list : concat_list SEMI expr_list
         """
         p[0] = p[1]
-        p[0].append(self._new_list(p, p[3]))
+        p[0].append(p[3])
     
     def p_expr_list(self, p):
         """
@@ -457,7 +468,7 @@ class Parser(object):
         """
         number : NUMBER
         """
-        p[0] = self._new_node(p, ast.Num, p[1])
+        p[0] = self._new_node(p, ast.Constant, p[1])
     
     def p_expr_end(self, p):
         """
@@ -469,7 +480,7 @@ class Parser(object):
         """
         string : STRING
         """
-        p[0] = self._new_node(p, ast.Str, p[1])
+        p[0] = self._new_node(p, ast.Constant, p[1])
     
     def p_expr_colon(self, p):
         """
@@ -496,10 +507,10 @@ class Parser(object):
             p[0] = p[2]
         elif p[1] == '++':
             p[2].ctx = ast.Store()
-            p[0] = self._new_node(p, ast.AugAssign, p[2], ast.Add(), self._new_node(p, ast.Num, 1))
+            p[0] = self._new_node(p, ast.AugAssign, p[2], ast.Add(), self._new_node(p, ast.Constant, 1))
         elif p[1] == '--':
             p[2].ctx = ast.Store()
-            p[0] = self._new_node(p, ast.AugAssign, p[2], ast.Sub(), self._new_node(p, ast.Num, 1))
+            p[0] = self._new_node(p, ast.AugAssign, p[2], ast.Sub(), self._new_node(p, ast.Constant, 1))
         else:
             p[0] = self._new_node(p, ast.UnaryOp, Parser.UNARY_OPS[p[1]](), p[2])
     
@@ -513,6 +524,8 @@ class Parser(object):
         # TODO clarify
         if len(p) == 3:
             p[0] = self._new_list(p)
+        elif isinstance(p[2][0], list):
+            p[0] = self._new_list(p, [self._new_list(p, row) for row in p[2]])
         else:
             p[0] = self._new_list(p, p[2])
     
@@ -524,12 +537,15 @@ class Parser(object):
                | LBRACKET expr_list RBRACKET
                | LBRACKET expr_list SEMI RBRACKET
         """
-        # TODO matrix
         if len(p) == 3:
-            data = self._new_list(p)
+            rows = []
+        elif isinstance(p[2][0], list):
+            rows = p[2]
         else:
-            data = self._new_list(p, p[2])
-        p[0] = self._new_call(p, self._new_name(p, 'matrix'), data)
+            rows = [p[2]]
+        p[0] = self._new_call(p, self._new_name(p, 'blkcat'), self._new_node(p, ast.List, [
+            self._new_node(p, ast.List, row, ast.Load()) for row in rows
+        ], ast.Load()))
     
     def p_paren_expr(self, p):
         """
@@ -547,8 +563,11 @@ class Parser(object):
         """
         expr : expr TRANSPOSE
         """
-        # TODO transpose
+        # The token holds a sequence of ' and .' operators
         p[0] = p[1]
+        for op in p[2].replace(".'", "."):
+            func = 'transpose' if op == '.' else 'ctranspose'
+            p[0] = self._new_call(p, self._new_name(p, func), p[0])
     
     def p_cellarrayref(self, p):
         """
@@ -556,13 +575,11 @@ class Parser(object):
              | expr LBRACE RBRACE
         """
         if len(p) == 4:
-            p[0] = self._new_subscript(p, p[1], ast.Slice(None, None, None))
+            p[0] = self._new_subscript(p, p[1], self._new_node(p, ast.Slice, None, None, None))
         elif len(p[3]) == 1:
-            p[0] = self._new_subscript(p, p[1], ast.Index(p[3][0]))
+            p[0] = self._new_subscript(p, p[1], p[3][0])
         else:
-            p[0] = self._new_subscript(p, p[1], ast.ExtSlice([
-                ast.Index(i) if not isinstance(i, ast.Slice) else i for i in p[3]
-            ]))
+            p[0] = self._new_subscript(p, p[1], self._new_index(p, p[3]))
     
     def p_funcall_expr(self, p):
         """
@@ -578,19 +595,30 @@ class Parser(object):
     
     BINARY_OPS = {
         '&': ast.BitAnd,
-        # TODO BACKSLASH
-        '/': ast.Div,
+        './': ast.Div,
         '.*': ast.Mult,
+        '.^': ast.Pow,
         '^': ast.Pow,
         '-': ast.Sub,
-        '*': ast.Mult,
         '|': ast.BitOr,
         '+': ast.Add,
     }
     
+    MATRIX_OPS = {
+        '*': 'mtimes',
+        '/': 'mrdivide',
+        '\\': 'mldivide',
+    }
+    
+    # A *= B is A = A * B (matrix product)
+    MATRIX_ASSIGN_OPS = {
+        '*=': 'mtimes',
+        '/=': 'mrdivide',
+    }
+    
     ASSIGN_OPS = {
-        '*=': ast.Mult,
-        '/=': ast.Div,
+        '.*=': ast.Mult,
+        './=': ast.Div,
         '-=': ast.Sub,
         '+=': ast.Add,
         '^=': ast.Pow,
@@ -647,30 +675,51 @@ class Parser(object):
         """
         if p[2] == "=":
             if isinstance(p[1], ast.Call):
-                subs = self._new_subscript(p, p[1].func, ast.ExtSlice(list(map(ast.Index, p[1].args))))
+                subs = self._new_subscript(p, p[1].func, self._new_index(p, p[1].args))
                 p[1] = [subs]
             elif not isinstance(p[1], list):
                 p[1] = [p[1]]
             
             for target in p[1]:
                 target.ctx = ast.Store()
-    
-            p[0] = self._new_node(p, ast.Assign, p[1], p[3])
+                self._detach_containers(p, target)
+            
+            # Any value may be a view of another variable (a.', a(2:3),
+            # load(...)), only constants certainly are not
+            value = p[3]
+            if not self._is_constant(value):
+                value = self._new_share(p, value)
+            p[0] = self._new_node(p, ast.Assign, p[1], value)
         elif p[2] == ':':
-            p[0] = self._new_call(p, self._new_name(p, 'range'), p[1],
-                                  self._new_node(p, ast.BinOp, p[3], ast.Add(),
-                                                 self._new_node(p, ast.Num, 1)))
+            # COLON is left associative, so a:s:b arrives as (a:s):b
+            if isinstance(p[1], ast.Call) \
+            and isinstance(p[1].func, ast.Name) \
+            and p[1].func.id == 'colon' \
+            and len(p[1].args) == 2:
+                p[1].args.append(p[3])
+                p[0] = p[1]
+            else:
+                p[0] = self._new_call(p, self._new_name(p, 'colon'), p[1], p[3])
         elif p[2] == '.':
             if isinstance(p[3], ast.Subscript):
-                p[0] = self._new_subscript(p, p[1], ast.Index(p[3]))
+                p[0] = self._new_subscript(p, p[1], p[3])
             else:
                 p[0] = self._new_node(p, ast.Attribute, p[1], p[3], ast.Load())
         elif p[2] in Parser.COMPARE_OPS:
             p[0] = self._new_node(p, ast.Compare, p[1], [Parser.COMPARE_OPS[p[2]]()], [p[3]])
         elif p[2] in Parser.LOGIC_OPS:
             p[0] = self._new_node(p, ast.BoolOp, Parser.LOGIC_OPS[p[2]](), [p[1], p[3]])
+        elif p[2] in Parser.MATRIX_OPS:
+            p[0] = self._new_call(p, self._new_name(p, Parser.MATRIX_OPS[p[2]]), p[1], p[3])
         elif p[2] in Parser.BINARY_OPS:
             p[0] = self._new_node(p, ast.BinOp, p[1], Parser.BINARY_OPS[p[2]](), p[3])
+        elif p[2] in Parser.MATRIX_ASSIGN_OPS:
+            value = copy.deepcopy(p[1])
+            value.ctx = ast.Load()
+            p[1].ctx = ast.Store()
+            self._detach_containers(p, p[1])
+            func = self._new_name(p, Parser.MATRIX_ASSIGN_OPS[p[2]])
+            p[0] = self._new_node(p, ast.Assign, [p[1]], self._new_call(p, func, value, p[3]))
         elif p[2] in Parser.ASSIGN_OPS:
             p[1].ctx = ast.Store()
             p[0] = self._new_node(p, ast.AugAssign, p[1], Parser.ASSIGN_OPS[p[2]](), p[3])
@@ -682,8 +731,8 @@ class Parser(object):
     
     def _new_node(self, p, kind, *args, **kw):
         node = kind(*args, **kw)
-        node.lineno = p.lexer.lineno
-        node.col_offset = 0
+        node.lineno = node.end_lineno = p.lexer.lineno
+        node.col_offset = node.end_col_offset = 0
         return node
     
     def _new_arg(self, p, name, ann=None):
@@ -692,23 +741,51 @@ class Parser(object):
     def _new_name(self, p, name):
         return self._new_node(p, ast.Name, name, ast.Load())
     
+    def _zero_based(self, p, value):
+        if isinstance(value, ast.Constant) and type(value.value) in (int, float):
+            value.value -= 1
+            return value
+        return self._new_node(p, ast.BinOp, value, ast.Sub(), self._new_node(p, ast.Constant, 1))
+    
     def _patch_index(self, p, index):
-        if isinstance(index, ast.Index):
-            if isinstance(index.value, ast.Num): index.value.n -= 1
-            else: index.value = self._new_node(p, ast.BinOp, index.value, ast.Sub(), self._new_node(p, ast.Num, 1))
-        elif isinstance(index, ast.Slice):
-            if isinstance(index.lower, ast.Num): index.lower.n -= 1
-            elif index.lower is not None: index.lower = self._new_node(p, ast.BinOp, index.lower, ast.Sub(), self._new_node(p, ast.Num, 1))
-            if isinstance(index.upper, ast.Num): index.upper.n -= 1
-            elif index.upper is not None: index.upper = self._new_node(p, ast.BinOp, index.upper, ast.Sub(), self._new_node(p, ast.Num, 1))
-        elif isinstance(index, ast.ExtSlice):
-            for dim in index.dims:
-                self._patch_index(p, dim)
+        if isinstance(index, ast.Slice):
+            if index.lower is not None: index.lower = self._zero_based(p, index.lower)
+            if index.upper is not None: index.upper = self._zero_based(p, index.upper)
+        elif isinstance(index, ast.Tuple):
+            index.elts = [self._patch_index(p, dim) for dim in index.elts]
+        else:
+            index = self._zero_based(p, index)
+        return index
+    
+    def _new_index(self, p, dims):
+        # x(i, ...) indexes by tuple, even for a single dimension
+        return self._new_node(p, ast.Tuple, list(dims), ast.Load())
     
     def _new_subscript(self, p, target, index):
-        self._patch_index(p, index)
-        return self._new_node(p, ast.Subscript, target, index, ast.Load())
+        return self._new_node(p, ast.Subscript, target, self._patch_index(p, index), ast.Load())
 
+    def _is_constant(self, node):
+        if isinstance(node, ast.UnaryOp):
+            node = node.operand
+        return isinstance(node, ast.Constant)
+    
+    def _new_share(self, p, value):
+        return self._new_call(p, self._new_name(p, 'share'), value)
+    
+    def _detach_containers(self, p, target):
+        # s.a(2) = x writes into s.a, so s must not share s.a with a copy
+        node = target
+        while isinstance(node, (ast.Attribute, ast.Subscript)):
+            if isinstance(node.value, ast.Call):
+                # s(2).a = x indexes s instead of calling it
+                call = node.value
+                node.value = self._new_subscript(p, call.func, self._new_index(p, call.args))
+            if node is not target:
+                node.value = self._new_call(p, self._new_name(p, 'detach'), node.value)
+                node = node.value.args[0]
+            else:
+                node = node.value
+    
     def _new_list(self, p, data=None):
         return self._new_call(p,
             self._new_name(p, 'vector'),
@@ -716,21 +793,72 @@ class Parser(object):
         )
     
     def _new_arguments(self, p, args=None):
-        return self._new_node(p, ast.arguments, args or [], self._use_nargin, [], [], self._use_varargin, [])
+        return self._new_node(p, ast.arguments, [], args or [], self._use_varargin, [], [], self._use_nargin, [])
+    
+    def _new_function(self, p, name, args):
+        node = self._new_node(p, ast.FunctionDef, name, args, [], [], None)
+        if 'type_params' in ast.FunctionDef._fields:
+            node.type_params = []
+        return node
     
     def _new_call(self, p, target, *args):
-        return self._new_node(p, ast.Call, target, list(args), [], None, None)
+        return self._new_node(p, ast.Call, target, list(args), [])
 
 _p = Parser()
 _parsers = {}
 
-def new(start='top'):
-    if start not in _parsers:
+def _grammar_key(start):
+    """
+    Hash over everything the generated tables depend on.
+    """
+    rules = sorted((name, getattr(Parser, name).__doc__)
+                   for name in dir(Parser) if name.startswith('p_'))
+    return cache.hash_key(start, Parser.precedence, Parser.tokens, rules,
+                          yacc.__tabversion__)
+
+def _build(start, picklefile=None, optimize=0):
+    return yacc.yacc(start=start, module=_p, debug=0, write_tables=0,
+                     optimize=optimize, picklefile=picklefile)
+
+def _load(start):
+    """
+    Load the tables for ``start`` from the cache directory or generate (and
+    store) them.
+    """
+    cachedir = cache.get_cache_dir('parser')
+    if cachedir is None:
         if conf.DEBUG:
             print("* Creating '{0}' parser...".format(start))
+        return _build(start)
+    
+    tabfile = os.path.join(cachedir, 'mlab_{0}-{1}.pickle'.format(start, _grammar_key(start)))
+    if os.path.exists(tabfile):
+        try:
+            # The file name includes the grammar hash, no need to check the signature.
+            return _build(start, tabfile, optimize=1)
+        except Exception:
+            pass
+    
+    if conf.DEBUG:
+        print("* Creating '{0}' parser...".format(start))
+    tmpfile = cache.temp_name(tabfile)
+    mparser = _build(start, tmpfile)
+    cache.commit(tmpfile, tabfile)
+    return mparser
+
+def new(start='top'):
+    """
+    Return the parser for the given start symbol. The parse tables are loaded
+    from the cache directory if possible, otherwise they are generated and
+    stored for later runs.
+    """
+    if start not in _parsers:
         muted_stderr, sys.stderr = sys.stderr, io.StringIO()
-        _parsers[start] = yacc.yacc(start=start, module=_p, debug=0, tabmodule='mlab_' + start)
-        sys.stderr = muted_stderr
+        try:
+            with phases.phase("parser tables ('{0}')".format(start)):
+                _parsers[start] = _load(start)
+        finally:
+            sys.stderr = muted_stderr
     
     return _parsers[start]
 
@@ -747,8 +875,7 @@ def dump(node, p='', outfile=sys.stdout):
         print(p + node.__class__.__name__, file=outfile)
     for key, value in ast.iter_fields(node):
         if key == 'body' \
-        or (isinstance(value, list) and not value) \
-        or (key in ('starargs', 'kwargs') and value is None):
+        or (isinstance(value, list) and not value):
             continue
         print(p + '+ {0}={1}'.format(key, value), file=outfile)
     for child in ast.iter_child_nodes(node):
@@ -767,7 +894,7 @@ if __name__ == '__main__':
         try:
             buf = open(filename, 'r').read()
             p = parse(buf)
-            m = ast.Module(body=p)
+            m = ast.fix_missing_locations(ast.Module(body=p, type_ignores=[]))
     
             dump(m, outfile=open(filename + '.tree', 'w'))
     
@@ -0,0 +1,122 @@
+'''
+MlabPy phase profiler.
+
+Records wall time and peak memory of the stages a matlab file goes through:
+lexer construction, parser table build or load, parsing, ``compile()``,
+loading cached code, binding autoload modules, module execution and the
+``main()`` call. Phases are recorded per file and may be nested, the numbers
+of an outer phase include its inner phases.
+
+Recording is enabled by ``conf.PROFILE_PHASES`` (``mlabpy --profile-phases``).
+Peak memory per phase needs ``tracemalloc.reset_peak`` (Python 3.9) and is
+only recorded while ``tracemalloc`` is tracing, which ``enable(memory=True)``
+(``--profile-memory``) starts. Tracing slows down every allocation, so the
+wall times of such a run are inflated; measure time and memory separately.
+
+Copyright (C) 2015, led02 <mlabpy@led-inc.eu>
+'''
+import json
+import sys
+import time
+import tracemalloc
+
+from mlabpy import conf
+
+# Finished phases as dicts (phase, file, depth, start, wall, peak)
+records = []
+
+# Currently open phases
+_stack = []
+
+class _Phase(object):
+    def __init__(self, name, filename):
+        self.name = name
+        self.filename = filename
+        self.peak = 0
+        self.base = 0
+        self.start = 0.0
+
+    def __enter__(self):
+        if self.filename is None and _stack:
+            self.filename = _stack[-1].filename
+        if tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            if _stack:
+                _stack[-1].peak = max(_stack[-1].peak, peak)
+            tracemalloc.reset_peak()
+            self.base = self.peak = current
+        _stack.append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        wall = time.perf_counter() - self.start
+        _stack.pop()
+        peak = None
+        if tracemalloc.is_tracing():
+            self.peak = max(self.peak, tracemalloc.get_traced_memory()[1])
+            peak = self.peak - self.base
+            if _stack:
+                _stack[-1].peak = max(_stack[-1].peak, self.peak)
+        records.append({
+            'phase': self.name,
+            'file': self.filename,
+            'depth': len(_stack),
+            'start': self.start,
+            'wall': wall,
+            'peak': peak,
+        })
+        return False
+
+class _NoPhase(object):
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+_no_phase = _NoPhase()
+
+def phase(name, filename=None):
+    """
+    Context manager that records the phase ``name`` (for ``filename``) if
+    profiling is enabled.
+    """
+    if not conf.PROFILE_PHASES:
+        return _no_phase
+    return _Phase(name, filename)
+
+def enable(memory=False):
+    """
+    Turn on phase recording, with ``memory`` also peak memory tracking.
+    """
+    conf.PROFILE_PHASES = True
+    if memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+def report(fmt='table', outfile=None):
+    """
+    Write the recorded phases to ``outfile`` (default: ``sys.stderr``) either
+    as ``table`` or as ``json``. Phases are grouped by file.
+    """
+    outfile = outfile or sys.stderr
+    order = []
+    for record in records:
+        if record['file'] not in order:
+            order.append(record['file'])
+    ordered = sorted(records, key=lambda record: (order.index(record['file']), record['start']))
+
+    if fmt == 'json':
+        json.dump(ordered, outfile, indent=2)
+        outfile.write('\n')
+        return
+
+    print("{0:<36} {1:>12} {2:>12}".format("Phase", "Wall [ms]", "Peak [KiB]"), file=outfile)
+    for filename in order:
+        print(filename or '(global)', file=outfile)
+        for record in ordered:
+            if record['file'] != filename:
+                continue
+            peak = '-' if record['peak'] is None else '{0:.1f}'.format(record['peak'] / 1024.0)
+            label = '  ' * (record['depth'] + 1) + record['phase']
+            print("{0:<36} {1:>12.3f} {2:>12}".format(label, record['wall'] * 1e3, peak), file=outfile)
@@ -5,13 +5,15 @@ Copyright (C) 2015, led02 <mlabpy@led-inc.eu>
 '''
 import argparse
 import os
+import sys
 
 import mlabpy
-from mlabpy import conf, interactive, loader, parser
+from mlabpy import compileall, conf, loader, phases
 
 argp = argparse.ArgumentParser(
     description="MlabPy runtime",
-    epilog="If no files are passed, an interactive console will be presented."
+    epilog="If no files are passed, an interactive console will be presented. "
+           "Use 'mlabpy compile' to compile matlab files ahead of time."
 )
 argp.add_argument(
     '-d', '--debug', action='store_true',
@@ -25,17 +27,37 @@ argp.add_argument(
     '-a', '--autoload', action='append',
     help="Auto load given Python modules. (from foo import *)",
 )
+argp.add_argument(
+    '--profile-phases', action='store_true',
+    help="Report the wall time of each load and run phase per file to stderr.",
+)
+argp.add_argument(
+    '--profile-memory', action='store_true',
+    help="Also report peak memory of each phase (slows down the run, implies --profile-phases).",
+)
+argp.add_argument(
+    '--profile-format', choices=['table', 'json'], default='table',
+    help="Output format of --profile-phases. (default: table)",
+)
 argp.add_argument(
     'files', nargs='*', metavar="FILE",
     help="Files to be executed.",
 )
 
 def main():
+    if sys.argv[1:2] == ['compile']:
+        sys.exit(compileall.main(sys.argv[2:]))
+    
     args = argp.parse_args()
     
     if args.debug is not None:
         conf.DEBUG = args.debug
     
+    if args.profile_memory:
+        args.profile_phases = True
+    if args.profile_phases:
+        phases.enable(memory=args.profile_memory)
+    
     if not args.files:
         print("{0} interactive console ({1})".format(mlabpy.RELEASE, mlabpy.VERSION + mlabpy.VERSION_EXTRA))
         if conf.DEBUG:
@@ -48,22 +70,27 @@ def main():
         loader.enable_matlab_import()
     
     if args.files:
-        mparser = parser.new()
         for filename in args.files:
             modname, _ = os.path.splitext(os.path.basename(filename))
             try:
-                mloader = loader.MatlabLoader(mparser, filename)
+                mloader = loader.MatlabLoader(None, filename)
                 mod = mloader.load_module(modname)
                 
                 # Look for a main routine called like the module and call it
                 if hasattr(mod, 'main'):
-                    ret = getattr(mod, 'main')()
+                    with phases.phase('main', filename):
+                        ret = getattr(mod, 'main')()
                     if ret is not None:
                         print(ret)
             except Exception as e:
                 print("Error.", e)
+        
+        if args.profile_phases:
+            phases.report(args.profile_format)
 
     else:
+        # The console needs the parser, running cached files does not
+        from mlabpy import interactive
         interactive.MlabInterpreter().cmdloop()
 
 if __name__ == '__main__':
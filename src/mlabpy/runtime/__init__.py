@@ -0,0 +1,95 @@
+'''
+MlabPy runtime.
+
+The modules in ``mlabpy.autoload`` are bound into every matlab module using
+``bind``, which works like ``from module import *``. If a symbol manifest has
+been declared for a module, the module is not imported at all. Instead each
+declared name is bound to a ``LazyBinding`` that imports the module on first
+use. This keeps heavy dependencies (like SciPy) out of the startup path.
+
+Copyright (C) 2015, led02 <mlabpy@led-inc.eu>
+'''
+import importlib
+
+from mlabpy import phases
+
+manifests = {}
+
+def declare(modname, names):
+    """
+    Declare the public names of ``modname``. Modules with a manifest are
+    not executed by ``bind``.
+    """
+    manifests[modname] = tuple(names)
+
+class LazyBinding(object):
+    """
+    Stand-in for ``modname.name`` in ``namespace``. The module is imported on
+    first use, then the real object replaces the binding in ``namespace``.
+    """
+    __slots__ = ('_namespace', '_modname', '_name', '_target')
+
+    def __init__(self, namespace, modname, name):
+        self._namespace = namespace
+        self._modname = modname
+        self._name = name
+        self._target = None
+
+    def resolve(self):
+        if self._target is None:
+            with phases.phase('autoload ' + self._modname):
+                module = importlib.import_module(self._modname)
+            try:
+                self._target = getattr(module, self._name)
+            except AttributeError:
+                # The manifest is out of date
+                raise ImportError("cannot import name '{0}' from '{1}', but it is declared in its manifest".format(
+                    self._name, self._modname), name=self._modname) from None
+            if self._namespace.get(self._name) is self:
+                self._namespace[self._name] = self._target
+        return self._target
+
+    def __call__(self, *args, **kwargs):
+        return self.resolve()(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.resolve(), name)
+
+    def __repr__(self):
+        return '<lazy {0}.{1}>'.format(self._modname, self._name)
+
+class LazyModule(object):
+    """
+    Module proxy that imports ``modname`` on first attribute access.
+    """
+
+    def __init__(self, modname):
+        self.__modname = modname
+        self.__module = None
+
+    def __getattr__(self, name):
+        if self.__module is None:
+            self.__module = importlib.import_module(self.__modname)
+        return getattr(self.__module, name)
+
+    def __repr__(self):
+        return '<lazy module {0}>'.format(self.__modname)
+
+def bind(namespace, modname):
+    """
+    Make the public names of ``modname`` available in ``namespace``, just like
+    ``from modname import *`` does. Modules with a manifest are bound lazily.
+    """
+    names = manifests.get(modname)
+    if names is None:
+        with phases.phase('autoload ' + modname):
+            module = importlib.import_module(modname)
+        names = getattr(module, '__all__', None) \
+             or [name for name in vars(module) if not name.startswith('_')]
+        for name in names:
+            namespace[name] = getattr(module, name)
+    else:
+        for name in names:
+            namespace[name] = LazyBinding(namespace, modname, name)
+
+declare('mlabpy.runtime.scipy', ['interp1', 'interp2', 'interpn', 'sparse', 'spdiags', 'speye'])
@@ -7,21 +7,29 @@ includes wrappers for martix, struct and vector types.
 
 Copyright (C) 2015, led02 <mlabpy@led-inc.eu>
 '''
+import atexit
+import fnmatch
+import functools
+import io
 import math
+import operator
+import os
+import re
 import sys
+import threading
 import time
 
 import numpy
-from numpy import identity as eye, mean, median, prod, roots, std
+from numpy import mean, median, prod, roots, std
 
 import mlabpy
+from mlabpy import conf, funcindex
 
 OCTAVE_VERSION = mlabpy.VERSION + mlabpy.VERSION_EXTRA
 
 # Constants
 ###########
-true = True
-false = False
+# true, false, Inf and NaN are callable, see Allocation below
 stdout = sys.stdout
 
 
@@ -30,67 +38,1416 @@ stdout = sys.stdout
 clc = lambda: None # TODO dummy stub -> clear console window
 clear = lambda *args: None # TODO dummy stub -> delete vars
 disp = lambda x: print(x)
-fclose = lambda fid: fid.close()
 fflush = lambda fid: fid.flush()
-fopen = open
-fprintf = lambda fid, fmt, *v: (sys.stdout if fid == 1 else fid).write(fmt % v)
 isempty = lambda x: len(x) <= 0
 isfield = lambda s, n: n in s
 length = len
 mod = lambda x, y: x % y
 strrep = str.replace
-size = lambda x: x.size
 sqrt = lambda x: math.sqrt(x)
 version = lambda: mlabpy.RELEASE + ' ' + mlabpy.VERSION + mlabpy.VERSION_EXTRA
-zeros = lambda *args: numpy.zeros(args)
 
 
 # Custom functions
 ##################
+def size(x, dim=None):
+    """
+    ``size(A)`` is the row vector of the dimensions of ``A``, so that
+    ``zeros(size(A))`` has the shape of ``A``; ``size(A, dim)`` is a single
+    dimension. Row vectors, strings, cell and struct arrays are 1-by-n.
+    """
+    if isinstance(x, (str, vector, structarray, colon)):
+        dims = (1, len(x))
+    elif isinstance(x, struct):
+        dims = (1, 1)
+    else:
+        dims = numpy.shape(_operand(x))
+        if len(dims) < 2:
+            dims = (1,) * (2 - len(dims)) + tuple(dims)
+    if dim is not None:
+        dim = int(dim)
+        if dim < 1:
+            raise ValueError('size: dimension must be a positive integer')
+        return dims[dim - 1] if dim <= len(dims) else 1
+    return matrix._wrap(numpy.array(dims, dtype=numpy.float64))
+
 def exist(name, kind='file'):
     if kind == 'builtin':
         return name in globals()
     elif kind == 'file':
-        # TODO implement me
-        return false
+        if name.endswith('.m'):
+            name = name[:-2]
+        if name in funcindex.get_index() or os.path.isfile(name):
+            return 2
+        return 0
     return False
 
+def delete(*files):
+    for name in files:
+        os.remove(name)
+
+def addpath(*dirs):
+    append = '-end' in dirs
+    dirs = [d for arg in dirs if arg not in ('-begin', '-end') for d in arg.split(os.pathsep) if d]
+    for dirname in (dirs if append else reversed(dirs)):
+        if dirname in conf.MATLAB_PATH:
+            conf.MATLAB_PATH.remove(dirname)
+        if append:
+            conf.MATLAB_PATH.append(dirname)
+        else:
+            conf.MATLAB_PATH.insert(0, dirname)
+    funcindex.forget_resolved()
+
+def rmpath(*dirs):
+    for dirname in (d for arg in dirs for d in arg.split(os.pathsep)):
+        if dirname in conf.MATLAB_PATH:
+            conf.MATLAB_PATH.remove(dirname)
+    funcindex.forget_resolved()
+
+rehash = funcindex.rehash
+
+_scalar_types = (int, float, complex, bool)
+
+def blkcat(rows):
+    """
+    Assemble the matrix literal ``[A, B; C, D]`` given as a list of rows of
+    blocks. The result shape and type are determined first, then each block
+    is copied into the preallocated result exactly once. Empty blocks are
+    skipped, rows of strings are joined to a string and a single row of
+    scalars and vectors stays one-dimensional.
+    """
+    if len(rows) == 1 and len(rows[0]) == 1 and isinstance(rows[0][0], matrix):
+        # [x] is x, e.g. the column view [s.x]
+        return share(rows[0][0])
+    if len(set(map(len, rows))) == 1 \
+    and all(type(value) in _scalar_types for row in rows for value in row):
+        return matrix._wrap(numpy.array(rows[0] if len(rows) == 1 else rows))
+
+    blocks = []
+    for row in rows:
+        row = [
+            value._data if isinstance(value, matrix) else bool(value) if isinstance(value, _logical) else value
+            for value in row
+        ]
+        row = [value for value in row if isinstance(value, str) or numpy.size(value) > 0]
+        if row:
+            blocks.append(row)
+
+    if not blocks:
+        return matrix([])
+    if all(isinstance(value, str) for row in blocks for value in row):
+        if len(blocks) == 1:
+            return ''.join(blocks[0])
+        return vector(''.join(row) for row in blocks)
+
+    if any(_is_sparse(value) for row in blocks for value in row):
+        return _sparse_blkcat(blocks)
+    blocks = [[numpy.asarray(value) for value in row] for row in blocks]
+    dtype = functools.reduce(numpy.promote_types, (value.dtype for row in blocks for value in row))
+    if len(blocks) == 1 \
+    and all(value.ndim <= 1 for value in blocks[0]):
+        row = blocks[0]
+        result = numpy.empty(sum(value.size for value in row), dtype)
+        offset = 0
+        for value in row:
+            result[offset:offset + value.size] = value
+            offset += value.size
+        return matrix._wrap(result)
+
+    blocks = [[value.reshape(1, -1) if value.ndim < 2 else value for value in row] for row in blocks]
+    heights = []
+    width = None
+    for row in blocks:
+        height = row[0].shape[0]
+        if any(value.shape[0] != height for value in row):
+            raise ValueError('vertical dimensions mismatch in horizontal concatenation')
+        row_width = sum(value.shape[1] for value in row)
+        if width is not None and row_width != width:
+            raise ValueError('horizontal dimensions mismatch in vertical concatenation')
+        width = row_width
+        heights.append(height)
+
+    result = numpy.empty((sum(heights), width), dtype)
+    top = 0
+    for row, height in zip(blocks, heights):
+        left = 0
+        for value in row:
+            result[top:top + height, left:left + value.shape[1]] = value
+            left += value.shape[1]
+        top += height
+    return matrix._wrap(result)
+
+def _is_scalar(value):
+    return type(value) in _scalar_types or isinstance(value, numpy.generic)
+
+def _is_sparse(value):
+    return isinstance(value, _sparse_operators) or type(value).__module__.startswith('scipy.sparse')
+
+def _dense(value):
+    return value._data if isinstance(value, matrix) else numpy.asarray(value)
+
+def _unwrap_scalar(result):
+    if isinstance(result, numpy.ndarray) and result.size == 1:
+        return result.item()
+    return result
+
+def _matrix_result(result):
+    # Results of the matrix operators behave like other matrices
+    result = _unwrap_scalar(result)
+    if isinstance(result, numpy.ndarray):
+        return matrix._wrap(result)
+    if _is_sparse(result):
+        return _sparse(result)
+    return result
+
+_linalg = None
+
+def _scipy_linalg():
+    """
+    Return ``scipy.linalg`` or ``None`` if SciPy is not installed.
+    """
+    global _linalg
+    if _linalg is None:
+        try:
+            import scipy.linalg
+            _linalg = scipy.linalg
+        except ImportError:
+            _linalg = False
+    return _linalg or None
+
+def transpose(x):
+    """
+    Transpose ``x.'`` as a view. One-dimensional arrays are row vectors, so
+    they become a column. The view shares the storage of ``x``, the first
+    write to either of them copies it.
+    """
+    if _is_scalar(x) or isinstance(x, str):
+        return x
+    if _is_sparse(x):
+        return _sparse(x.T)
+    data = _dense(x)
+    view = data.reshape(-1, 1) if data.ndim < 2 else data.T
+    return matrix._wrap(view, x if isinstance(x, matrix) else True)
+
+def ctranspose(x):
+    """
+    Conjugate transpose ``x'``. The conjugate of a complex matrix is only
+    computed if needed, ``mtimes`` hands the original to BLAS instead.
+    """
+    if _is_scalar(x):
+        return x.conjugate()
+    if _is_sparse(x):
+        return _sparse(x.conj().T)
+    data = _dense(x)
+    if data.dtype.kind != 'c':
+        return transpose(x)
+    if data.ndim < 2:
+        return matrix._wrap(data.conj().reshape(-1, 1))
+    return _ctransposed(data, x if isinstance(x, matrix) else None)
+
+def _gemm(a, b):
+    """
+    Product of ``a`` and ``b`` where at least one is a conjugate transpose,
+    computed by BLAS ``gemm`` with transpose flags. Returns ``None`` if that
+    is not possible.
+    """
+    linalg = _scipy_linalg()
+    if linalg is None:
+        return None
+    trans = []
+    operands = []
+    for x in (a, b):
+        if isinstance(x, _ctransposed) and x._buf is None:
+            operands.append(x.base)
+            trans.append(2)
+        else:
+            operands.append(_dense(x))
+            trans.append(0)
+    a, b = operands
+    if a.ndim != 2 or b.ndim != 2 \
+    or a.shape[0 if trans[0] else 1] != b.shape[1 if trans[1] else 0]:
+        return None
+    gemm = linalg.get_blas_funcs('gemm', (a, b))
+    return _matrix_result(gemm(1.0, a, b, trans_a=trans[0], trans_b=trans[1]))
+
+def _divide(a, b):
+    try:
+        return a / b
+    except ZeroDivisionError:
+        # Like MATLAB: x/0 is inf or nan
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            return numpy.true_divide(a, b)
+
+def mtimes(a, b):
+    """
+    Matrix product ``a * b``. One-dimensional arrays are row vectors. NumPy
+    passes transposed views to BLAS with transpose flags, the same is done
+    for a lazy conjugate transpose (see ``ctranspose``).
+    """
+    if _is_scalar(a) or _is_scalar(b):
+        return _matrix_result(a * b)
+    if isinstance(a, _ctransposed) or isinstance(b, _ctransposed):
+        result = _gemm(a, b)
+        if result is not None:
+            return result
+    if _is_sparse(a) or _is_sparse(b):
+        return _matrix_result(a.dot(b) if _is_sparse(a) else b.T.dot(_dense(a).T).T)
+
+    a, b = _dense(a), _dense(b)
+    if a.ndim > 2 or b.ndim > 2:
+        raise ValueError('matrix products need two-dimensional operands')
+    row = a.ndim == 1
+    a, b = a.reshape(1, -1) if row else a, b.reshape(1, -1) if b.ndim == 1 else b
+    if a.shape[1] != b.shape[0]:
+        raise ValueError('inner matrix dimensions must agree ({0}x{1} * {2}x{3})'.format(
+            a.shape[0], a.shape[1], b.shape[0], b.shape[1]))
+    result = numpy.dot(a, b)
+    return _matrix_result(result[0] if row else result)
+
+def _is_triangular(a, lower):
+    """
+    True if the square matrix ``a`` has only zeros above (``lower``) or below
+    the diagonal. The rows are scanned without temporaries of the size of
+    ``a``, a full matrix usually fails at the first row.
+    """
+    n = a.shape[0]
+    for i in range(n - 1):
+        part = a[i, i + 1:] if lower else a[i + 1, :i + 1]
+        if part.any():
+            return False
+    return True
+
+def _is_hermitian(a, block=64):
+    """
+    True if the square matrix ``a`` equals its conjugate transpose, compared
+    in blocks of rows to stop early and keep temporaries small.
+    """
+    for i in range(0, a.shape[0], block):
+        rows = a[i:i + block]
+        columns = a[:, i:i + block].T
+        if not numpy.array_equal(rows, columns.conj() if a.dtype.kind == 'c' else columns):
+            return False
+    return True
+
+def mldivide(a, b):
+    """
+    Solve ``a * x = b`` (``a \\ b``). The solver is chosen like MATLAB does:
+    triangular and symmetric positive definite systems are solved using
+    their structure, other square systems by LU decomposition and non-square
+    ones in the least squares sense. Sparse systems use ``spsolve``.
+    """
+    if _is_scalar(a):
+        return _matrix_result(_divide(b, a))
+    if _is_sparse(a):
+        return _matrix_result(_sparse_solve(a, b))
+
+    a, b = _dense(a), _dense(b)
+    if a.ndim != 2 or a.shape[0] != a.shape[1]:
+        return _matrix_result(numpy.linalg.lstsq(a, b, rcond=-1)[0])
+
+    linalg = _scipy_linalg()
+    if linalg is not None:
+        if _is_triangular(a, lower=False):
+            return _matrix_result(linalg.solve_triangular(a, b, lower=False))
+        if _is_triangular(a, lower=True):
+            return _matrix_result(linalg.solve_triangular(a, b, lower=True))
+        if numpy.all(numpy.diagonal(a).real > 0) and _is_hermitian(a):
+            try:
+                return _matrix_result(linalg.cho_solve(linalg.cho_factor(a), b))
+            except numpy.linalg.LinAlgError:
+                pass
+    return _matrix_result(numpy.linalg.solve(a, b))
+
+def _sparse_solve(a, b):
+    """
+    ``a \\ b`` for sparse ``a``. Triangular systems are solved by
+    substitution, other square systems by ``spsolve`` (sparse LU), which
+    keeps a sparse ``b`` sparse. Non-square systems are solved as dense
+    least squares problems.
+    """
+    from scipy.sparse import linalg as splinalg
+    if a.shape[0] != a.shape[1]:
+        return numpy.linalg.lstsq(a.toarray(), b.toarray() if _is_sparse(b) else _dense(b), rcond=-1)[0]
+    if not _is_sparse(b):
+        b = _dense(b)
+        coo = a.tocoo()
+        if not numpy.any(coo.row > coo.col):
+            return splinalg.spsolve_triangular(a.tocsr(), b, lower=False)
+        if not numpy.any(coo.row < coo.col):
+            return splinalg.spsolve_triangular(a.tocsr(), b, lower=True)
+    return splinalg.spsolve(a.tocsc(), b)
+
+def mrdivide(b, a):
+    """
+    Solve ``x * a = b`` (``b / a``) by transposing to ``a.' \\ b.'``.
+    """
+    if _is_scalar(a):
+        return _matrix_result(_divide(b, a))
+    if _is_sparse(a):
+        b = b.T if _is_sparse(b) else _dense(b).T
+        return _matrix_result(numpy.transpose(mldivide(a.T, b)))
+    return _matrix_result(numpy.transpose(mldivide(_dense(a).T, _dense(b).T)))
+
+def issparse(x):
+    return _is_sparse(x)
+
+def full(x):
+    """
+    Dense copy of the sparse matrix ``x``, other values are returned as is.
+    """
+    return matrix._wrap(x.toarray()) if _is_sparse(x) else x
+
+def nnz(x):
+    """
+    Number of non-zero elements. Stored zeros of sparse matrices do not count.
+    """
+    if _is_sparse(x):
+        return int(x.count_nonzero())
+    return int(numpy.count_nonzero(_operand(x)))
+
+def find(x, n=None, direction='first'):
+    """
+    Linear indices (1-based, column-major) of the non-zero elements of ``x``,
+    only the first or last ``n`` if given. Sparse matrices are not expanded.
+    The indices are returned as row vector.
+    """
+    if _is_sparse(x):
+        rows, cols = x.nonzero()
+        indices = numpy.sort(cols * x.shape[0] + rows)
+    else:
+        indices = numpy.flatnonzero(numpy.ravel(_operand(x), order='F'))
+    if n is not None:
+        indices = indices[-int(n):] if direction == 'last' else indices[:int(n)]
+    return matrix._wrap(indices + 1)
+
+def _sparse_blkcat(blocks):
+    from scipy import sparse
+    rows = [
+        [value if _is_sparse(value) else numpy.atleast_2d(numpy.asarray(value)) for value in row]
+        for row in blocks
+    ]
+    return _sparse(sparse.bmat(rows, format='csc'))
+
+def horzcat(*blocks):
+    return blkcat([blocks])
+
+def vertcat(*blocks):
+    return blkcat([[block] for block in blocks])
+
+# Formatted output
+###################
+_FORMAT_RE = re.compile(r"%([-+ 0#]*)(\d*)(?:\.(\d+))?[lhL]*([diouxXfFeEgGcs%])")
+_ESCAPE_RE = re.compile(r"\\(x[0-9a-fA-F]{1,2}|[0-7]{1,3}|.)")
+_ESCAPES = {'a': '\a', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t', 'v': '\v'}
+
+def _unescape(match):
+    code = match.group(1)
+    if code[0] == 'x':
+        return chr(int(code[1:], 16))
+    elif code[0] in '01234567':
+        return chr(int(code, 8))
+    return _ESCAPES.get(code, code)
+
+class _format(object):
+    """
+    A MATLAB format translated for Python's ``%`` operator. ``literals``
+    holds the text around the conversions, ``specs`` the Python conversion
+    specifiers with their conversion character and ``template`` all of it
+    joined into one format.
+    """
+    __slots__ = ('literals', 'specs', 'template', 'numeric')
+    
+    def __init__(self, fmt):
+        fmt = _ESCAPE_RE.sub(_unescape, fmt)
+        self.literals = []
+        self.specs = []
+        literal = []
+        pos = 0
+        for match in _FORMAT_RE.finditer(fmt):
+            literal.append(fmt[pos:match.start()])
+            pos = match.end()
+            flags, width, precision, conv = match.groups()
+            if conv == '%':
+                literal.append('%')
+                continue
+            spec = '%' + flags + width + ('.' + precision if precision is not None else '')
+            self.literals.append(''.join(literal))
+            self.specs.append((spec, 'd' if conv == 'u' else conv))
+            literal = []
+        literal.append(fmt[pos:])
+        self.literals.append(''.join(literal))
+        
+        self.template = ''.join(
+            literal.replace('%', '%%') + spec + conv
+            for literal, (spec, conv) in zip(self.literals, self.specs)
+        ) + self.literals[-1].replace('%', '%%')
+        self.numeric = all(conv in 'dieEfFgG' for _, conv in self.specs)
+
+_formats = {}
+
+def _get_format(fmt):
+    form = _formats.get(fmt)
+    if form is None:
+        form = _formats[fmt] = _format(fmt)
+    return form
+
+def _format_value(spec, conv, value):
+    """
+    Format a single value like MATLAB does: text for numeric conversions is
+    printed as string, non-integers for integer conversions use ``%e``.
+    """
+    if isinstance(value, str):
+        return (spec + 's') % value
+    if isinstance(value, complex):
+        value = value.real
+    if not math.isfinite(value):
+        return (spec.split('.')[0] + 's') % ('NaN' if math.isnan(value) else 'Inf' if value > 0 else '-Inf')
+    if conv in 'cs':
+        if conv == 'c' or value == int(value):
+            return (spec + 's') % chr(int(value))
+        return (spec + 's') % _number_str(value)
+    if conv in 'dioxX':
+        if value != int(value):
+            return (spec + 'e') % value
+        value = int(value)
+    return (spec + conv) % value
+
+def _number_str(value):
+    return '{0:g}'.format(value) if value != int(value) else str(int(value))
+
+def _flatten_args(args):
+    """
+    Return all values of ``args`` in MATLAB order, either as one NumPy array
+    (all numeric) or as a list.
+    """
+    if all(_is_scalar(arg) or isinstance(arg, str) for arg in args):
+        return list(args)
+    arrays = []
+    for arg in args:
+        if isinstance(arg, str):
+            break
+        arrays.append(numpy.ravel(numpy.asarray(_operand(arg)), order='F'))
+    else:
+        data = numpy.concatenate(arrays) if arrays else numpy.zeros(0)
+        if data.dtype.kind in 'biuf':
+            return data
+    values = []
+    for arg in args:
+        if isinstance(arg, str):
+            values.append(arg)
+        elif isinstance(arg, vector):
+            values.extend(_flatten_args(arg))
+        else:
+            values.extend(numpy.ravel(numpy.asarray(_operand(arg)), order='F').tolist())
+    return values
+
+def sprintf(fmt, *args):
+    """
+    Format ``args`` with the C-style format ``fmt``. Like in MATLAB, arrays
+    are flattened (column-major) and the format is applied again and again
+    until all values are used. Numeric data is formatted in bulk.
+    """
+    form = _get_format(fmt)
+    values = _flatten_args(args)
+    count = len(form.specs)
+    if count == 0 or len(values) == 0:
+        return ''.join(form.literals)
+    
+    out = []
+    rows = len(values) // count
+    if rows and isinstance(values, numpy.ndarray) and form.numeric:
+        data = values[:rows * count]
+        integral = [i for i, (_, conv) in enumerate(form.specs) if conv in 'di']
+        table = data.reshape(rows, count)
+        if numpy.all(numpy.isfinite(data)) \
+        and all(numpy.all(table[:, i] == numpy.floor(table[:, i])) for i in integral):
+            out.append((form.template * rows) % tuple(data.tolist()))
+            values = values[rows * count:]
+    
+    if isinstance(values, numpy.ndarray):
+        values = values.tolist()
+    index = 0
+    for i, value in enumerate(values):
+        index = i % count
+        if index == 0 and i:
+            out.append(form.literals[-1])
+        out.append(form.literals[index])
+        out.append(_format_value(form.specs[index][0], form.specs[index][1], value))
+    if len(values) % count == 0:
+        if values:
+            out.append(form.literals[-1])
+    else:
+        # Stop at the first conversion without data
+        out.append(form.literals[index + 1])
+    return ''.join(out)
+
+def fprintf(*args):
+    """
+    ``fprintf(fid, fmt, ...)`` writes ``sprintf(fmt, ...)`` to the file
+    ``fid`` (1 is stdout, 2 is stderr). Without ``fid`` it writes to stdout.
+    Returns the number of bytes written.
+    """
+    if isinstance(args[0], str):
+        fid, args = 1, args
+    else:
+        fid, args = args[0], args[1:]
+    text = sprintf(*args)
+    if fid == 1:
+        fid = sys.stdout
+    elif fid == 2:
+        fid = sys.stderr
+    if not isinstance(fid, io.TextIOBase):
+        text = text.encode('utf-8')
+    fid.write(text)
+    return len(text)
+
+def fopen(filename, permission='r', machinefmt=None, encoding='utf-8'):
+    """
+    Open ``filename`` with a MATLAB permission (``'r'``, ``'w'``, ``'a'``,
+    ``'r+'``, ...). Files are opened in binary mode unless the permission
+    contains ``'t'``. ``machinefmt`` sets the byte order used by ``fread``
+    and ``fwrite``. Returns -1 if the file cannot be opened.
+    """
+    text = 't' in permission
+    mode = permission.replace('t', '').replace('b', '')
+    mode = mode[0] + ('' if text else 'b') + mode[1:]
+    try:
+        if text:
+            return open(filename, mode, buffering=conf.FILE_BUFFER_SIZE, encoding=encoding)
+        fid = open(filename, mode, buffering=conf.FILE_BUFFER_SIZE)
+    except OSError:
+        return -1
+    fid.machinefmt = _byte_order(machinefmt)
+    return fid
+
+def fclose(fid):
+    fid.close()
+    return 0
+
+# Binary file I/O
+#################
+# MATLAB precision names -> NumPy type codes
+_PRECISIONS = {
+    'uchar': 'u1', 'uint8': 'u1', 'schar': 'i1', 'int8': 'i1',
+    'char': 'u1', 'char*1': 'u1', 'integer*1': 'i1',
+    'int16': 'i2', 'uint16': 'u2', 'short': 'i2', 'ushort': 'u2', 'integer*2': 'i2',
+    'int32': 'i4', 'uint32': 'u4', 'int': 'i4', 'uint': 'u4', 'integer*4': 'i4',
+    'int64': 'i8', 'uint64': 'u8', 'long': 'i8', 'ulong': 'u8', 'integer*8': 'i8',
+    'single': 'f4', 'float32': 'f4', 'float': 'f4', 'real*4': 'f4',
+    'double': 'f8', 'float64': 'f8', 'real*8': 'f8',
+}
+
+_PRECISION_RE = re.compile(r"^\s*(?:(\d+)\*)?(\*)?([\w*]+?)\s*(?:=>\s*([\w*]+))?\s*$")
+
+def _byte_order(machinefmt):
+    """
+    Translate a MATLAB machine format (``'n'``, ``'l'``, ``'b'``,
+    ``'ieee-le'``, ``'ieee-be'``, ...) to a NumPy byte order character.
+    """
+    if not machinefmt:
+        return '='
+    machinefmt = machinefmt.lower()
+    if machinefmt.startswith('ieee-'):
+        machinefmt = machinefmt[5:]
+    if machinefmt[0] == 'l':
+        return '<'
+    elif machinefmt[0] == 'b':
+        return '>'
+    elif machinefmt[0] in 'na':
+        return '='
+    raise ValueError("unknown machine format '{0}'".format(machinefmt))
+
+def _precision_dtype(name, order='='):
+    code = _PRECISIONS.get(name.lower())
+    if code is None:
+        raise ValueError("unknown precision '{0}'".format(name))
+    return numpy.dtype(order + code)
+
+def _parse_precision(precision):
+    """
+    Split a precision like ``'int16'``, ``'*uint8'``, ``'int16=>double'``
+    or ``'4*int16=>int16'`` into block size, source and output type. The
+    output type defaults to double.
+    """
+    match = _PRECISION_RE.match(precision)
+    if match is None:
+        raise ValueError("invalid precision '{0}'".format(precision))
+    block, same, source, output = match.groups()
+    if output is None:
+        output = source if same else 'double'
+    return int(block or 1), source, output
+
+def _fid_order(fid, machinefmt):
+    if machinefmt is not None:
+        return _byte_order(machinefmt)
+    return getattr(fid, 'machinefmt', '=')
+
+def _remaining(fid):
+    """
+    Bytes between the position of ``fid`` and the end of the file or
+    ``None`` if the file has no size (pipes, ...).
+    """
+    try:
+        return max(os.fstat(fid.fileno()).st_size - fid.tell(), 0)
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        return None
+
+def _read_values(fid, dtype, count):
+    """
+    Read up to ``count`` (``None``: all) values of ``dtype`` straight into
+    a new array.
+    """
+    if count is None:
+        size = _remaining(fid)
+        if size is None:
+            raw = fid.read()
+            return numpy.frombuffer(raw, dtype, len(raw) // dtype.itemsize)
+        count = size // dtype.itemsize
+    data = numpy.empty(count, dtype)
+    nread = fid.readinto(data.view(numpy.uint8)) or 0
+    return data[:nread // dtype.itemsize]
+
+def _read_blocks(fid, dtype, count, block, skip):
+    """
+    Read ``count`` values of ``dtype`` in blocks of ``block`` values, each
+    followed by ``skip`` bytes. The blocks are picked from the raw bytes with
+    a strided view.
+    """
+    stride = block * dtype.itemsize + skip
+    if count is None:
+        raw = fid.read()
+    else:
+        raw = fid.read(-(-count // block) * stride)
+    full = len(raw) // stride
+    blocks = numpy.ndarray((full, block), dtype, raw, 0, (stride, dtype.itemsize))
+    tail = min(block, (len(raw) - full * stride) // dtype.itemsize)
+    data = numpy.concatenate((blocks.ravel(), numpy.frombuffer(raw, dtype, tail, full * stride)))
+    return data if count is None else data[:count]
+
+def fread(fid, size=float('inf'), precision='uint8', skip=0, machinefmt=None):
+    """
+    Read binary data from ``fid``. ``size`` is ``n``, ``Inf``, ``[m, n]`` or
+    ``[m, Inf]``; matrices are filled column by column and padded with zeros.
+    ``precision`` and ``skip`` work like in MATLAB, character output is
+    returned as string. The byte order defaults to the ``machinefmt`` given
+    to ``fopen``.
+    """
+    block, source, output = _parse_precision(precision)
+    dtype = _precision_dtype(source, _fid_order(fid, machinefmt))
+    
+    dims = numpy.ravel(numpy.asarray(_operand(size), dtype=float)).tolist()
+    count = None if math.isinf(dims[-1]) else int(numpy.prod(dims))
+    if skip:
+        data = _read_blocks(fid, dtype, count, block, skip)
+    else:
+        data = _read_values(fid, dtype, count)
+    
+    if output.lower() == 'char':
+        return ''.join(map(chr, data.tolist()))
+    data = data.astype(_precision_dtype(output), copy=False)
+    if len(dims) > 1:
+        rows = int(dims[0])
+        cols = -(-len(data) // rows) if rows else 0
+        if len(data) < rows * cols:
+            data = numpy.concatenate((data, numpy.zeros(rows * cols - len(data), data.dtype)))
+        data = data.reshape((rows, cols), order='F')
+    return matrix._wrap(data)
+
+def fwrite(fid, A, precision='uint8', skip=0, machinefmt=None):
+    """
+    Write the values of ``A`` (column-major) to ``fid`` as ``precision``,
+    skipping ``skip`` bytes before each block. Returns the number of values
+    written.
+    """
+    block, source, _ = _parse_precision(precision)
+    dtype = _precision_dtype(source, _fid_order(fid, machinefmt))
+    if isinstance(A, str):
+        values = numpy.array([ord(c) for c in A])
+    else:
+        values = numpy.ravel(numpy.asarray(_operand(A)), order='F')
+    data = numpy.ascontiguousarray(values.astype(dtype, copy=False))
+    
+    if skip:
+        for start in range(0, len(data), block):
+            fid.seek(skip, os.SEEK_CUR)
+            fid.write(data[start:start + block].view(numpy.uint8))
+    else:
+        fid.write(data.view(numpy.uint8))
+    return len(data)
+
+_ORIGINS = {'bof': os.SEEK_SET, -1: os.SEEK_SET, 'cof': os.SEEK_CUR, 0: os.SEEK_CUR, 'eof': os.SEEK_END, 1: os.SEEK_END}
+
+def fseek(fid, offset, origin='bof'):
+    """
+    Move the position of ``fid`` by ``offset`` bytes relative to ``origin``
+    (``'bof'``/-1, ``'cof'``/0 or ``'eof'``/1). Returns 0 or -1 on failure.
+    """
+    try:
+        fid.seek(int(offset), _ORIGINS[origin])
+    except (KeyError, OSError, ValueError):
+        return -1
+    return 0
+
+def ftell(fid):
+    try:
+        return fid.tell()
+    except (OSError, ValueError):
+        return -1
+
+def frewind(fid):
+    fid.seek(0)
+
+def feof(fid):
+    """
+    True if the end of ``fid`` is reached.
+    """
+    peek = getattr(fid, 'peek', None)
+    if peek is not None:
+        return not peek(1)
+    return _remaining(fid) == 0
+
+class memmapfile(object):
+    """
+    ``memmapfile(filename, 'Format', fmt, 'Offset', n, 'Repeat', n,
+    'Writable', tf)`` maps a file into memory. ``Data`` is a matrix backed by
+    the mapping, nothing is read before it is accessed. Writes go to the file
+    if the map is writable.
+    
+    ``Format`` is either a precision or a cell array of ``{type, dims, name}``
+    rows. In the latter case ``Data`` is a struct holding one column per
+    field (``m.Data.x(k)`` instead of MATLAB's ``m.Data(k).x``).
+    """
+    
+    def __init__(self, filename, *args):
+        options = dict((name.lower(), value) for name, value in zip(args[::2], args[1::2]))
+        self.Filename = filename
+        self.Format = options.get('format', 'uint8')
+        self.Offset = int(options.get('offset', 0))
+        self.Repeat = options.get('repeat', float('inf'))
+        self.Writable = bool(options.get('writable', False))
+        self._data = None
+    
+    @property
+    def Data(self):
+        if self._data is None:
+            self._data = self._map()
+        return self._data
+    
+    def _map(self):
+        if isinstance(self.Format, str):
+            dtype = _precision_dtype(self.Format)
+        else:
+            rows = list(self.Format)
+            if isinstance(rows[0], str):
+                rows = [rows]
+            fields = []
+            for source, dims, name in rows:
+                shape = tuple(int(dim) for dim in numpy.ravel(numpy.asarray(_operand(dims))))
+                # Column-major element data, singleton dimensions are dropped
+                shape = tuple(dim for dim in reversed(shape) if dim != 1)
+                fields.append((name, _precision_dtype(source), shape))
+            dtype = numpy.dtype(fields)
+        
+        shape = None if math.isinf(self.Repeat) else (int(self.Repeat),)
+        data = numpy.memmap(self.Filename, dtype, 'r+' if self.Writable else 'r', self.Offset, shape)
+        if dtype.names is None:
+            return matrix._wrap(data)
+        return struct._from_fields((name, matrix._wrap(data[name])) for name in dtype.names)
+
+# Data files
+############
+# MlabPy containers get their own extension, so that no MATLAB installation
+# tries to read them
+_NATIVE_EXTENSION = '.mlabpy'
+
+def _data_filename(filename, native):
+    if not os.path.splitext(filename)[1]:
+        filename += _NATIVE_EXTENSION if native else '.mat'
+    return filename
+
+def _workspace(frame):
+    """
+    The variables of the matlab code running in ``frame``, without the names
+    bound from the runtime.
+    """
+    variables = {}
+    for name, value in frame.f_locals.items():
+        if name.startswith('_') or globals().get(name) is value \
+        or (callable(value) and not isinstance(value, _cow)):
+            continue
+        variables[name] = value
+    return variables
+
+def save(filename, *args):
+    """
+    ``save(filename, 'a', 'b*', ...)`` stores the named (default: all)
+    variables of the caller. ``'-struct', 's'`` stores the fields of ``s``
+    instead.
+    
+    The file format is chosen by the options ``'-mlabpy'`` (memory-mappable
+    MlabPy container, see ``mlabpy.matfile``) or ``'-v6'``/``'-v7'`` (MATLAB
+    file, needs SciPy), else by the extension: ``.mat`` files are always
+    MATLAB files. Other files are written in ``conf.SAVE_FORMAT``, without
+    extension ``.mlabpy`` or ``.mat`` is appended. ``'-compress'`` and
+    ``'-v7'`` compress the data, ``'-append'`` keeps the other variables of an
+    existing file.
+    """
+    from mlabpy import matfile
+    
+    options = set(arg.lower() for arg in args if arg.startswith('-'))
+    names = [arg for arg in args if not arg.startswith('-')]
+    if '-struct' in options:
+        variables = dict(sys._getframe(1).f_locals[names[0]].items())
+        names = names[1:]
+    else:
+        variables = _workspace(sys._getframe(1))
+    
+    if names:
+        selected = {}
+        for pattern in names:
+            matches = fnmatch.filter(variables, pattern)
+            if not matches:
+                raise NameError("undefined variable '{0}'".format(pattern))
+            for name in matches:
+                selected[name] = variables[name]
+        variables = selected
+    else:
+        variables = dict((name, value) for name, value in variables.items() if matfile.saveable(value))
+    
+    if options & {'-v6', '-v7'}:
+        native = False
+    elif '-mlabpy' in options:
+        native = True
+    else:
+        native = os.path.splitext(filename)[1].lower() != '.mat' and conf.SAVE_FORMAT == 'mlabpy'
+    filename = _data_filename(filename, native)
+    if '-append' in options and os.path.exists(filename):
+        previous = dict(load(filename).items())
+        previous.update(variables)
+        variables = previous
+    
+    compress = bool(options & {'-compress', '-v7'})
+    if native:
+        matfile.save_native(filename, variables, compress)
+    else:
+        matfile.save_mat(filename, variables, compress)
+
+def load(filename, *names):
+    """
+    ``s = load(filename, 'a', ...)`` returns the stored variables (all or the
+    named ones) as struct. MlabPy data files are memory-mapped, arrays are
+    only read when they are used. Other files are read as MATLAB files.
+    Without extension ``.mlabpy`` and ``.mat`` are tried.
+    """
+    from mlabpy import matfile
+    
+    if not os.path.exists(filename) and not os.path.splitext(filename)[1]:
+        for extension in (_NATIVE_EXTENSION, '.mat'):
+            if os.path.exists(filename + extension):
+                filename += extension
+                break
+    names = names or None
+    if matfile.is_native(filename):
+        variables = matfile.load_native(filename, names)
+    else:
+        variables = matfile.load_mat(filename, names)
+    
+    return struct._from_fields(variables)
+
 def getargs(defaults, updates):
     cloned = defaults.clone()
     cloned.update(updates)
     return cloned
 
+# All primes below _prime_limit, extended on demand up to _PRIME_CACHE_LIMIT
+_prime_cache = numpy.array([2, 3, 5, 7])
+_prime_cache.flags.writeable = False
+_prime_limit = 10
+_PRIME_CACHE_LIMIT = 1 << 27
+
+# Odd numbers per sieve segment
+_SIEVE_SEGMENT = 1 << 20
+
+def _isqrt(n):
+    root = int(math.sqrt(n))
+    while root * root > n:
+        root -= 1
+    while (root + 1) * (root + 1) <= n:
+        root += 1
+    return root
+
+def _sieve(lo, hi, base):
+    """
+    Return the primes in ``[lo, hi)`` for odd ``lo >= 3``. ``base`` must
+    contain all odd primes up to the square root of ``hi``.
+    """
+    mark = numpy.ones((hi - lo + 1) // 2, dtype=bool)
+    for p in base.tolist():
+        if p * p >= hi:
+            break
+        start = max(p * p, (lo + p - 1) // p * p)
+        if start % 2 == 0:
+            start += p
+        mark[(start - lo) // 2::p] = False
+    return lo + 2 * numpy.flatnonzero(mark)
+
+def _segments(lo, hi):
+    """
+    Yield the primes in ``[lo, hi)`` (``lo > 2``) segment by segment, so the
+    memory needed does not grow with ``hi``.
+    """
+    root = _isqrt(hi - 1)
+    if root >= _prime_limit:
+        _extend_prime_cache(root + 1)
+    base = _prime_cache[1:numpy.searchsorted(_prime_cache, root, 'right')]
+    lo |= 1
+    while lo < hi:
+        top = min(lo + 2 * _SIEVE_SEGMENT, hi)
+        yield _sieve(lo, top, base)
+        lo = top | 1
+
+def _extend_prime_cache(n):
+    """
+    Make sure the cache holds all primes below ``n`` (at most up to
+    ``_PRIME_CACHE_LIMIT``). The cache grows at least by a factor of two.
+    """
+    global _prime_cache, _prime_limit
+    if n <= _prime_limit:
+        return
+    hi = min(max(n, 2 * _prime_limit), _PRIME_CACHE_LIMIT)
+    # The sieve needs the primes up to the square root first
+    _extend_prime_cache(_isqrt(hi - 1) + 1)
+    parts = list(_segments(_prime_limit, hi))
+    cache = numpy.concatenate([_prime_cache] + parts)
+    cache.flags.writeable = False
+    _prime_cache, _prime_limit = cache, hi
+
+def _primes_upto(n):
+    """
+    Array of all primes ``<= n``. Below the cache limit this is a read-only
+    view of the cache.
+    """
+    if n < _PRIME_CACHE_LIMIT:
+        _extend_prime_cache(n + 1)
+        return _prime_cache[:numpy.searchsorted(_prime_cache, n, 'right')]
+    _extend_prime_cache(_PRIME_CACHE_LIMIT)
+    return numpy.concatenate([_prime_cache] + list(_segments(_prime_limit, n + 1)))
+
 def primes(n):
-    """ Input n>=6, Returns a array of primes, 2 <= p < n """
-    sieve = numpy.ones(n/3 + (n%6==2), dtype=numpy.bool)
-    for i in range(1,int(n**0.5)//3+1):
-        if sieve[i]:
-            k=3*i+1|1
-            sieve[       k*k/3     ::2*k] = False
-            sieve[k*(k-2*(i&1)+4)/3::2*k] = False
-    return numpy.r_[2,3,((3*numpy.nonzero(sieve)[0][1:]+1)|1)]
-
-def _make_rand(randf):
-    def _randf(*args):
-        if len(args) == 1 \
-        and isinstance(args[0], int):
-            return randf(args[0], args[0])
-        elif len(args) == 2 \
-        and args[1] == 1:
-            return randf(args[0])
-        else:
-            return randf(*args)
-    return _randf
-
-rand = _make_rand(numpy.random.rand)
-randn = _make_rand(numpy.random.randn)
-
-def tic():
-    global _last_tick
-    _last_tick = time.clock()
-
-def toc(interval=None):
-    return time.clock() - (interval or _last_tick)
+    """
+    Return the primes less than or equal to ``n``. The primes are computed by
+    a segmented sieve and cached for later calls.
+    """
+    n = int(math.floor(n))
+    if n < 2:
+        return matrix(numpy.zeros(0, dtype=int))
+    return matrix._wrap(_primes_upto(n))
+
+def isprime(x):
+    """
+    True for the elements of ``x`` that are prime numbers.
+    """
+    values = numpy.asarray(_operand(x))
+    candidates = (values >= 2) & (values == numpy.floor(values))
+    numbers = values[candidates].astype(numpy.int64)
+    found = numpy.zeros(numbers.shape, dtype=bool)
+    if numbers.size:
+        top = int(numbers.max())
+        if top < _PRIME_CACHE_LIMIT:
+            table = _primes_upto(top)
+            # Sorted lookups are much more cache friendly
+            order = numpy.argsort(numbers)
+            ordered = numbers[order]
+            found[order] = table[numpy.searchsorted(table, ordered).clip(0, len(table) - 1)] == ordered
+        else:
+            base = _primes_upto(_isqrt(top))
+            for i, number in enumerate(numbers.tolist()):
+                divisors = base[:numpy.searchsorted(base, _isqrt(number), 'right')]
+                found[i] = not numpy.any(number % divisors == 0)
+    result = numpy.zeros(values.shape, dtype=bool)
+    result[candidates] = found
+    return bool(result) if result.ndim == 0 else matrix._wrap(result)
+
+def factor(n):
+    """
+    Return the prime factors of ``n`` in ascending order.
+    """
+    n = int(n)
+    if n < 4:
+        return matrix._wrap(numpy.array([n]))
+    base = _primes_upto(_isqrt(n))
+    factors = []
+    for p in base[n % base == 0].tolist():
+        while n % p == 0:
+            factors.append(p)
+            n //= p
+    if n > 1:
+        factors.append(n)
+    return matrix._wrap(numpy.array(factors))
+
+# Allocation
+############
+# MATLAB class names -> NumPy types
+_CLASSES = {
+    'double': numpy.float64, 'single': numpy.float32, 'logical': numpy.bool_,
+    'int8': numpy.int8, 'int16': numpy.int16, 'int32': numpy.int32, 'int64': numpy.int64,
+    'uint8': numpy.uint8, 'uint16': numpy.uint16, 'uint32': numpy.uint32, 'uint64': numpy.uint64,
+}
+
+def _class_dtype(name):
+    try:
+        return numpy.dtype(_CLASSES[name.lower()])
+    except KeyError:
+        raise ValueError("unknown class '{0}'".format(name))
+
+def _like_dtype(value):
+    # Python numbers are doubles in matlab code
+    if isinstance(value, (bool, _logical)):
+        return numpy.dtype(numpy.bool_)
+    elif isinstance(value, complex):
+        return numpy.dtype(numpy.complex128)
+    elif isinstance(value, (int, float)):
+        return numpy.dtype(numpy.float64)
+    return numpy.asarray(_operand(value)).dtype
+
+def _dim(value):
+    if isinstance(value, (int, float, numpy.number)):
+        return max(int(value), 0)
+    return max(int(numpy.ravel(numpy.asarray(_operand(value)))[0]), 0)
+
+def _alloc_args(args, default=numpy.float64):
+    """
+    Split the arguments of ``zeros``, ``ones``, ... into shape and type.
+    ``(n)`` is n-by-n, ``(m, n, ...)`` and ``([m, n, ...])`` give all
+    dimensions; the type is given by a trailing class name or ``'like', p``.
+    Row vectors are one-dimensional (like matrix literals), no dimensions
+    mean a scalar.
+    """
+    dtype = None
+    if len(args) >= 2 and isinstance(args[-2], str) and args[-2].lower() == 'like':
+        dtype = _like_dtype(args[-1])
+        args = args[:-2]
+    elif args and isinstance(args[-1], str):
+        dtype = _class_dtype(args[-1])
+        args = args[:-1]
+    
+    if len(args) == 1 and not _is_scalar(args[0]):
+        args = numpy.ravel(numpy.asarray(_operand(args[0]))).tolist()
+    dims = [_dim(arg) for arg in args]
+    if len(dims) == 1:
+        dims.append(dims[0])
+    while len(dims) > 2 and dims[-1] == 1:
+        dims.pop()
+    if len(dims) == 2 and dims[0] == 1:
+        dims.pop(0)
+    return tuple(dims), dtype or numpy.dtype(default)
+
+def _allocated(data):
+    if data.ndim > 0:
+        return matrix._wrap(data)
+    if data.dtype in (numpy.float64, numpy.bool_):
+        return data.item()
+    return data[()]
+
+def zeros(*args):
+    shape, dtype = _alloc_args(args)
+    return _allocated(numpy.zeros(shape, dtype))
+
+def ones(*args):
+    shape, dtype = _alloc_args(args)
+    return _allocated(numpy.ones(shape, dtype))
+
+def prealloc(*args):
+    """
+    Like ``zeros``, but the contents are undefined. For arrays that are
+    completely overwritten afterwards this saves touching the memory twice.
+    """
+    shape, dtype = _alloc_args(args)
+    return _allocated(numpy.empty(shape, dtype))
+
+def eye(*args):
+    shape, dtype = _alloc_args(args)
+    if len(shape) > 2:
+        raise ValueError('eye only supports two dimensions')
+    if len(shape) < 2:
+        data = numpy.eye(1, shape[0] if shape else 1, dtype=dtype)
+        return _allocated(data[0] if shape else data[0, 0])
+    return _allocated(numpy.eye(shape[0], shape[1], dtype=dtype))
+
+# Random numbers
+
+# Bit generators of numpy.random by the names accepted by rng
+_GENERATORS = {
+    'pcg64': 'PCG64', 'twister': 'MT19937', 'philox': 'Philox', 'sfc64': 'SFC64',
+}
+
+class _RandomStreams(object):
+    """
+    Seed of the random number streams of all threads. The thread that called
+    ``rng`` draws from the root ``SeedSequence`` itself, every other thread
+    spawns a child sequence on its first draw, so that threads get
+    independent streams. A forked process derives a new root from its
+    process id instead of repeating the numbers of its siblings.
+    """
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.generation = 0
+        self.reset('pcg64', 0)
+    
+    def reset(self, kind, seed, state=None):
+        with self.lock:
+            self.kind = kind
+            self.seed = seed
+            self.state = state
+            self.root = None
+            self.pid = os.getpid()
+            self.owner = self._token()
+            self.spawned = 0
+            # Streams of older generations are replaced on their next draw
+            self.generation += 1
+    
+    def _token(self):
+        # Thread identities are reused, tokens live as long as their thread
+        token = getattr(self.local, 'token', None)
+        if token is None:
+            token = self.local.token = object()
+        return token
+    
+    def generator(self):
+        local = self.local
+        if getattr(local, 'generation', None) != self.generation or local.pid != os.getpid():
+            self._start(local)
+        return local.generator
+    
+    def _start(self, local):
+        with self.lock:
+            pid = os.getpid()
+            if self.root is None:
+                self.root = numpy.random.SeedSequence(self.seed)
+            if pid != self.pid:
+                self.root = numpy.random.SeedSequence(
+                    self.root.entropy, spawn_key=self.root.spawn_key + (1, pid))
+                self.pid, self.owner, self.state, self.spawned = pid, None, None, 0
+            
+            state = None
+            if self._token() is self.owner:
+                sequence, state = self.root, self.state
+            else:
+                sequence = numpy.random.SeedSequence(
+                    self.root.entropy, spawn_key=self.root.spawn_key + (0, self.spawned))
+                self.spawned += 1
+            bits = getattr(numpy.random, _GENERATORS[self.kind])(sequence)
+            if state is not None:
+                bits.state = state
+            local.generator = numpy.random.Generator(bits)
+            local.generation = self.generation
+            local.pid = pid
+
+_random_streams = _RandomStreams()
+
+def _state_struct(value):
+    if isinstance(value, dict):
+        return struct._from_fields((key, _state_struct(item)) for key, item in value.items())
+    return value
+
+def _state_dict(value):
+    if isinstance(value, struct):
+        return dict((key, _state_dict(item)) for key, item in value.items())
+    return _operand(value)
+
+def rng(*args):
+    """
+    Seed the random number generators: ``rng(seed)``, ``rng('shuffle')``
+    (seed from the operating system), ``rng('default')`` (seed 0) and
+    ``rng(seed, generator)`` with one of ``'pcg64'`` (default),
+    ``'twister'``, ``'philox'`` and ``'sfc64'``. ``rng(s)`` restores the
+    settings ``s`` returned earlier. Returns the settings (``Type``,
+    ``Seed`` and ``State`` of the calling thread) before the call.
+    """
+    streams = _random_streams
+    settings = _state_struct({
+        'Type': streams.kind,
+        'Seed': streams.seed,
+        'State': streams.generator().bit_generator.state,
+    })
+    if not args:
+        return settings
+    
+    seed, kind = args[0], args[1] if len(args) > 1 else None
+    if isinstance(seed, struct):
+        streams.reset(seed.Type, int(seed.Seed), _state_dict(seed.State))
+        return settings
+    if isinstance(seed, str):
+        seed = seed.lower()
+        if seed == 'shuffle':
+            seed = numpy.random.SeedSequence().entropy
+        elif seed == 'default':
+            seed, kind = 0, kind or 'pcg64'
+        elif seed in _GENERATORS:
+            seed, kind = 0, seed
+        else:
+            raise ValueError("unknown rng option '{0}'".format(seed))
+    else:
+        seed = _operand(seed)
+        if int(seed) != seed or seed < 0:
+            raise ValueError('seed must be a non-negative integer')
+        seed = int(seed)
+    kind = (kind or streams.kind).lower()
+    if kind not in _GENERATORS:
+        raise ValueError("unknown generator '{0}'".format(kind))
+    streams.reset(kind, seed)
+    return settings
+
+def _random(method, args):
+    """
+    Draw from the stream of the calling thread. With ``'out', A`` the
+    matrix ``A`` (double or single) is filled in place instead of
+    allocating a new one.
+    """
+    draw = getattr(_random_streams.generator(), method)
+    if len(args) >= 2 and isinstance(args[-2], str) and args[-2].lower() == 'out':
+        out = args[-1]
+        if not isinstance(out, matrix):
+            raise TypeError("'out' must be a matrix")
+        data = out._detach()._data
+        if data.dtype not in (numpy.float64, numpy.float32) or not data.flags.c_contiguous:
+            raise ValueError("'out' must be a contiguous double or single matrix")
+        draw(out=data, dtype=data.dtype)
+        return out
+    
+    shape, dtype = _alloc_args(args)
+    if dtype.kind != 'f':
+        raise ValueError('random numbers are double or single')
+    if not shape and dtype == numpy.float64:
+        return draw()
+    return _allocated(draw(shape, dtype))
+
+def rand(*args):
+    return _random('random', args)
+
+def randn(*args):
+    return _random('standard_normal', args)
+
+def cell(*args):
+    """
+    Cell array of empty matrices. Like cell array literals, ``cell(m, n)``
+    holds ``m`` rows of ``n`` cells each.
+    """
+    shape, _ = _alloc_args(args)
+    if len(shape) > 2:
+        raise ValueError('cell arrays only support two dimensions')
+    if len(shape) < 2 or shape[0] == 1 or shape[1] == 1:
+        return vector(matrix._wrap(numpy.zeros(0)) for _ in range(int(numpy.prod(shape))))
+    return vector(
+        vector(matrix._wrap(numpy.zeros(0)) for _ in range(shape[1]))
+        for _ in range(shape[0])
+    )
+
+class _logical(int):
+    """
+    ``true`` and ``false``. Called with dimensions they create logical
+    arrays: ``false(3)``, ``true(1, n)``.
+    """
+    __slots__ = ()
+    
+    def __call__(self, *args):
+        shape, _ = _alloc_args(args, numpy.bool_)
+        return _allocated(numpy.full(shape, bool(self)))
+
+true = _logical(1)
+false = _logical(0)
+
+class _special(float):
+    """
+    ``Inf`` and ``NaN``. Called with dimensions they create filled arrays:
+    ``nan(3, 1)``, ``inf(n, 'single')``.
+    """
+    __slots__ = ()
+    
+    def __call__(self, *args):
+        shape, dtype = _alloc_args(args)
+        if dtype.kind not in 'fc':
+            raise ValueError('{0} is double or single'.format(self))
+        return _allocated(numpy.full(shape, float(self), dtype))
+
+Inf = inf = _special('inf')
+NaN = nan = _special('nan')
+
+_now_ns = getattr(time, 'perf_counter_ns', lambda: int(time.perf_counter() * 1e9))
+
+# Last tic and running named timers of each thread
+_tic_state = threading.local()
+
+# Named timers: name -> [count, total, min, max] in seconds
+_timers = {}
+_timers_lock = threading.Lock()
+
+def tic(name=None):
+    """
+    Start a timer. Returns a handle for ``toc(handle)``, ``toc()`` uses the
+    last ``tic`` of the current thread. ``tic(name)`` starts the named timer
+    ``name`` that is stopped and recorded by ``toc(name)``.
+    """
+    start = _now_ns()
+    if name is None:
+        _tic_state.last = start
+    else:
+        if not hasattr(_tic_state, 'named'):
+            _tic_state.named = {}
+        _tic_state.named[name] = start
+    return start
+
+def toc(handle=None):
+    """
+    Return the seconds elapsed since ``tic``, see there for ``handle``.
+    """
+    now = _now_ns()
+    if handle is None:
+        start = getattr(_tic_state, 'last', None)
+        if start is None:
+            raise RuntimeError('toc called before tic')
+    elif isinstance(handle, str):
+        start = getattr(_tic_state, 'named', {}).pop(handle, None)
+        if start is None:
+            raise RuntimeError("timer '{0}' was not started".format(handle))
+    else:
+        start = handle
+    elapsed = (now - start) / 1e9
+
+    if isinstance(handle, str):
+        with _timers_lock:
+            stats = _timers.get(handle)
+            if stats is None:
+                _timers[handle] = [1, elapsed, elapsed, elapsed]
+            else:
+                stats[0] += 1
+                stats[1] += elapsed
+                stats[2] = min(stats[2], elapsed)
+                stats[3] = max(stats[3], elapsed)
+    return elapsed
+
+def timers():
+    """
+    Return the named timers as dict of ``(count, total, min, max)``.
+    """
+    with _timers_lock:
+        return dict((name, tuple(stats)) for name, stats in _timers.items())
+
+def _report_timers(outfile=None):
+    stats = timers()
+    if not conf.TIMERS_REPORT or not stats:
+        return
+    outfile = outfile or sys.stderr
+    print("{0:<24} {1:>8} {2:>12} {3:>12} {4:>12} {5:>12}".format(
+        "Timer", "Count", "Total [s]", "Mean [s]", "Min [s]", "Max [s]"), file=outfile)
+    for name in sorted(stats):
+        count, total, least, most = stats[name]
+        print("{0:<24} {1:>8} {2:>12.6f} {3:>12.6f} {4:>12.6f} {5:>12.6f}".format(
+            name, count, total, total / count, least, most), file=outfile)
+
+atexit.register(_report_timers)
 
 
 # Custom classes
@@ -107,13 +1464,457 @@ class _end(object):
 
 end = _end()
 
-class matrix(object):
+_integer_types = (int, numpy.integer)
+
+def _bound(value):
+    return value.offset if isinstance(value, _end) else int(value)
+
+class colon(object):
+    """
+    The range ``start:stop`` or ``start:step:stop``. Iterating does not
+    allocate (integer ranges use ``range``), the elements are only computed
+    as a double array when NumPy asks for them (``__array__``). Adding or
+    multiplying scalars yields another range, all other operations work on
+    the elements like for a matrix. Assigning a range to a variable turns it
+    into a matrix (see ``share``). As a subscript it is turned into a slice
+    (see ``_to_index``), the bounds may be ``end`` expressions.
+    """
+    __slots__ = ('start', 'step', 'stop', '_array')
+    
+    def __init__(self, start, step, stop=None):
+        if stop is None:
+            step, stop = 1, step
+        self.start = start
+        self.step = step
+        self.stop = stop
+        self._array = None
+    
+    def _is_integer(self):
+        return isinstance(self.start, _integer_types) and isinstance(self.step, _integer_types)
+    
+    def __len__(self):
+        if self.step == 0:
+            return 0
+        count = (self.stop - self.start) / self.step
+        # Tolerate rounding errors like 0:0.1:1 does in MATLAB
+        count = math.floor(count + 3 * sys.float_info.epsilon * abs(count)) + 1
+        return max(count, 0)
+    
+    def __iter__(self):
+        n = len(self)
+        if self._is_integer():
+            return iter(range(self.start, self.start + n * self.step, self.step))
+        return (self.start + k * self.step for k in range(n))
+    
+    def __array__(self, dtype=None, copy=None):
+        if self._array is None:
+            n = len(self)
+            if self._is_integer():
+                # Ranges are double in MATLAB, x = 1:5; x(2) = 2.5 must not truncate
+                data = numpy.arange(self.start, self.start + n * self.step, self.step, dtype=numpy.float64)
+            elif n > 1:
+                data = numpy.linspace(self.start, self.start + (n - 1) * self.step, n)
+            else:
+                data = numpy.array([self.start] * n, dtype=float)
+            data.flags.writeable = False
+            self._array = data
+        if dtype is None:
+            return self._array
+        return self._array.astype(dtype, copy=False)
+    
+    def __getitem__(self, index):
+        return self.__array__()[index]
+    
+    def _to_slice(self):
+        if not isinstance(self.step, _integer_types) or self.step == 0:
+            return self.__array__().astype(int)
+        start, stop = _bound(self.start), _bound(self.stop)
+        if self.step > 0:
+            stop += 1
+        else:
+            stop -= 1
+        if isinstance(self.stop, _end) and stop == 0 \
+        or not isinstance(self.stop, _end) and stop < 0:
+            stop = None
+        return slice(start, stop, self.step)
+    
+    def _matrix(self):
+        return matrix._wrap(self.__array__(), shared=True)
+    
+    def __getattr__(self, name):
+        # Everything else behaves like the array of the elements
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self.__array__(), name)
+    
+    def __add__(self, other):
+        if not _is_scalar(other):
+            return self._matrix() + other
+        return colon(self.start + other, self.step, self.stop + other)
+    
+    __radd__ = __add__
+    
+    def __sub__(self, other):
+        if not _is_scalar(other):
+            return self._matrix() - other
+        return colon(self.start - other, self.step, self.stop - other)
+    
+    def __rsub__(self, other):
+        if not _is_scalar(other):
+            return other - self._matrix()
+        return colon(other - self.start, -self.step, other - self.stop)
+    
+    def __neg__(self):
+        return colon(-self.start, -self.step, -self.stop)
+    
+    def __mul__(self, other):
+        if not _is_scalar(other):
+            return self._matrix() * other
+        return colon(self.start * other, self.step * other, self.stop * other)
+    
+    __rmul__ = __mul__
+    
+    def __truediv__(self, other):
+        if not _is_scalar(other):
+            return self._matrix() / other
+        return colon(self.start / other, self.step / other, self.stop / other)
+    
+    def _matrix_op(name):
+        # Other operators work on the elements like for matrices
+        def _op(self, other):
+            return getattr(self._matrix(), name)(other)
+        return _op
+    
+    __rtruediv__ = _matrix_op('__rtruediv__')
+    __pow__ = _matrix_op('__pow__')
+    __rpow__ = _matrix_op('__rpow__')
+    __mod__ = _matrix_op('__mod__')
+    __and__ = _matrix_op('__and__')
+    __or__ = _matrix_op('__or__')
+    __eq__ = _matrix_op('__eq__')
+    __ne__ = _matrix_op('__ne__')
+    __lt__ = _matrix_op('__lt__')
+    __le__ = _matrix_op('__le__')
+    __gt__ = _matrix_op('__gt__')
+    __ge__ = _matrix_op('__ge__')
+    del _matrix_op
+    
+    __hash__ = None
+    
+    def __str__(self):
+        return str(self.__array__())
+    
+    def __repr__(self):
+        return 'colon({0!r}, {1!r}, {2!r})'.format(self.start, self.step, self.stop)
+
+def _to_index(index):
+    """
+    Translate ranges and ``end`` expressions in an index to NumPy indices.
+    Indices are doubles in MATLAB, integral floats become integers.
+    """
+    if isinstance(index, colon):
+        return index._to_slice()
+    elif isinstance(index, tuple):
+        return tuple(_to_index(i) for i in index)
+    elif isinstance(index, _end) and index.offset < 0:
+        return index.offset
+    elif isinstance(index, (float, numpy.floating)):
+        if index != int(index):
+            raise IndexError('subscript indices must be integers')
+        return int(index)
+    elif isinstance(index, (matrix, numpy.ndarray)) and numpy.asarray(_operand(index)).dtype.kind == 'f':
+        data = numpy.asarray(_operand(index))
+        integers = data.astype(numpy.intp)
+        if not numpy.array_equal(integers, data):
+            raise IndexError('subscript indices must be integers')
+        return integers
+    return index
+
+def _struct_index(index, n, base):
+    """
+    Element number (0-based) of a struct array of length ``n`` for the
+    ``base``-based scalar ``index``. ``end`` is the last element, so a
+    subscript ``end+1`` appends. ``(1, i)`` addresses a row.
+    """
+    if isinstance(index, tuple):
+        if len(index) == 1:
+            index = index[0]
+        elif len(index) == 2 and not isinstance(index[0], _end) and index[0] == base:
+            index = index[1]
+        elif len(index) == 2 and not isinstance(index[1], _end) and index[1] == base:
+            index = index[0]
+        else:
+            raise IndexError('struct arrays are one-dimensional')
+    if isinstance(index, _end):
+        return n - base + index.offset
+    index = int(index) - base
+    if index < 0:
+        raise IndexError('index must be positive')
+    return index
+
+class _handle(object):
+    """
+    Number of containers using the same storage. Storage with more than one
+    user is copied before it is written (copy-on-write).
+    """
+    __slots__ = ('refs',)
+    
+    def __init__(self, refs=1):
+        self.refs = refs
+
+_cow_counts = {'shares': 0, 'copies': 0}
+
+def cow_stats(reset=False):
+    """
+    Return how often containers were shared by assignment and how often a
+    shared container actually had to be copied.
+    """
+    stats = dict(_cow_counts)
+    if reset:
+        _cow_counts.update(shares=0, copies=0)
+    return stats
+
+class _cow(object):
+    """
+    Base of the containers with value semantics. ``_share`` returns a new
+    container using the same storage, ``_detach`` copies the storage if it is
+    still shared. Each write to a container detaches it first.
+    """
+    __slots__ = ()
+    
+    def _share(self):
+        other = self.__class__.__new__(self.__class__)
+        other._take(self)
+        self._handle.refs += 1
+        _cow_counts['shares'] += 1
+        return other
+    
+    def _detach(self):
+        if self._handle.refs > 1:
+            self._handle.refs -= 1
+            self._copy()
+            self._handle = _handle()
+            _cow_counts['copies'] += 1
+        return self
+    
+    def _release(self):
+        handle = getattr(self, '_handle', None)
+        if handle is not None:
+            handle.refs -= 1
+    
+    def __del__(self):
+        self._release()
+
+def share(value):
+    """
+    Assign ``value`` to another variable. Containers are not copied but share
+    their storage until one of them is written. Plain NumPy arrays and ranges
+    are wrapped into a ``matrix`` that copies on its first write.
+    """
+    if isinstance(value, _cow):
+        return value._share()
+    elif isinstance(value, numpy.ndarray) and value.ndim > 0:
+        return matrix._wrap(value, shared=True)
+    elif isinstance(value, colon):
+        return value._matrix()
+    return value
+
+def detach(value):
+    """
+    Make sure the container ``value`` does not share its storage. Used for the
+    intermediate containers of nested assignments like ``s.a(2) = x``.
+    """
+    if isinstance(value, _cow):
+        value._detach()
+    return value
+
+def _operand(value):
+    return value._data if isinstance(value, matrix) else value
+
+# Python operators for the NumPy functions of the matrix operators. Sparse
+# operands implement these themselves, NumPy would treat them as objects.
+_sparse_ops = {
+    numpy.add: operator.add, numpy.subtract: operator.sub,
+    numpy.multiply: operator.mul, numpy.true_divide: operator.truediv,
+    numpy.equal: operator.eq, numpy.not_equal: operator.ne,
+    numpy.less: operator.lt, numpy.less_equal: operator.le,
+    numpy.greater: operator.gt, numpy.greater_equal: operator.ge,
+}
+_dense_types = (numpy.ndarray, numpy.generic) + _scalar_types
+
+def _sparse_binary_op(op, a, b):
+    try:
+        result = _sparse_ops[op](a, b)
+    except (KeyError, TypeError, NotImplementedError):
+        # Not supported by the sparse type (e.g. full ./ sparse), use full matrices
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            result = op(*[x.toarray() if _is_sparse(x) else x for x in (a, b)])
+    return matrix._wrap(result) if isinstance(result, numpy.ndarray) else result
+
+def _sparse_op(name, op, reflected=False):
+    def _op(self, other):
+        other = _operand(other)
+        method = getattr(super(_sparse_operators, self), name, None)
+        try:
+            result = NotImplemented if method is None else method(other)
+        except (TypeError, NotImplementedError):
+            result = NotImplemented
+        if result is NotImplemented:
+            if _is_sparse(other):
+                return NotImplemented
+            # Not supported by the sparse type (e.g. sparse + scalar), use a full matrix
+            with numpy.errstate(divide='ignore', invalid='ignore'):
+                result = op(other, self.toarray()) if reflected else op(self.toarray(), other)
+        if isinstance(result, numpy.ndarray):
+            return matrix._wrap(result)
+        return _sparse(result) if _is_sparse(result) else result
+    return _op
+
+class _sparse_operators(object):
+    """
+    Operators of the sparse matrices of the runtime, mixed into SciPy's
+    ``csc_array`` by ``_sparse``. Mixing sparse and full operands gives a
+    full ``matrix`` (except for ``.*`` and ``./``, which stay sparse like in
+    MATLAB), whichever side the full operand is on.
+    """
+    __slots__ = ()
+
+    __add__ = _sparse_op('__add__', numpy.add)
+    __radd__ = _sparse_op('__radd__', numpy.add, True)
+    __sub__ = _sparse_op('__sub__', numpy.subtract)
+    __rsub__ = _sparse_op('__rsub__', numpy.subtract, True)
+    __mul__ = _sparse_op('__mul__', numpy.multiply)
+    __rmul__ = _sparse_op('__rmul__', numpy.multiply, True)
+    __truediv__ = _sparse_op('__truediv__', numpy.true_divide)
+    __rtruediv__ = _sparse_op('__rtruediv__', numpy.true_divide, True)
+    __pow__ = _sparse_op('__pow__', numpy.power)
+    __rpow__ = _sparse_op('__rpow__', numpy.power, True)
+    __eq__ = _sparse_op('__eq__', numpy.equal)
+    __ne__ = _sparse_op('__ne__', numpy.not_equal)
+    __lt__ = _sparse_op('__lt__', numpy.less)
+    __le__ = _sparse_op('__le__', numpy.less_equal)
+    __gt__ = _sparse_op('__gt__', numpy.greater)
+    __ge__ = _sparse_op('__ge__', numpy.greater_equal)
+
+_sparse_type = None
+
+def _sparse(value):
+    """
+    Convert the SciPy sparse matrix ``value`` to a sparse matrix of the
+    runtime. CSC arrays are not copied.
+    """
+    global _sparse_type
+    if _sparse_type is None:
+        from scipy import sparse
+        _sparse_type = type('sparse', (_sparse_operators, sparse.csc_array), {'__module__': __name__})
+    if type(value) is _sparse_type:
+        return value
+    return _sparse_type(value)
+
+def _binary_op(op, reflected=False):
+    if reflected:
+        def _op(self, other):
+            other = _operand(other)
+            if not isinstance(other, _dense_types) and _is_sparse(other):
+                return _sparse_binary_op(op, other, self._data)
+            return matrix._wrap(op(other, self._data))
+    else:
+        def _op(self, other):
+            other = _operand(other)
+            if not isinstance(other, _dense_types) and _is_sparse(other):
+                return _sparse_binary_op(op, self._data, other)
+            return matrix._wrap(op(self._data, other))
+    return _op
+
+def _inplace_op(op):
+    def _op(self, other):
+        other = _operand(other)
+        data = self._data
+        if self._handle.refs == 1 \
+        and numpy.result_type(data, other if _is_scalar(other) else numpy.asarray(other)) == data.dtype:
+            try:
+                op(data, other, out=data)
+                return self
+            except ValueError:
+                pass
+        self._data = op(data, other)
+        return self
+    return _op
+
+class matrix(_cow):
+    """
+    Wrapper around a NumPy array. The data lives in the first ``len(self)``
+    rows of a larger buffer, so that appending with ``x(end+1) = v`` only
+    copies the data when the buffer is full (amortized O(1)). ``_data`` is a
+    view of the used part of the buffer.
+    
+    Matrices have value semantics, the buffer is shared by ``share`` and
+    copied before writes (see ``_cow``). Read-only buffers count as shared.
+    """
+    
     def __init__(self, data):
         if len(data) >= 1 \
         and isinstance(data[0], matrix):
             data = numpy.concatenate((data[0], data[1:]))
         self._data = numpy.array(data)
     
+    @classmethod
+    def _wrap(cls, data, shared=False):
+        """
+        Wrap the array ``data`` without copying it. If ``shared`` is set, the
+        array is still used elsewhere and will be copied on the first write.
+        If ``shared`` is a container, ``data`` is a view of its storage: both
+        use the same handle, so the first write to either of them copies.
+        """
+        self = cls.__new__(cls)
+        self._data = data
+        if isinstance(shared, _cow):
+            self._handle = shared._handle
+            shared._handle.refs += 1
+        elif shared:
+            self._handle.refs += 1
+        return self
+    
+    @property
+    def _data(self):
+        return self._buf[:self._len]
+    
+    @_data.setter
+    def _data(self, data):
+        self._release()
+        self._buf = data
+        self._len = len(data)
+        self._handle = _handle(1 if data.flags.writeable else 2)
+    
+    def _take(self, other):
+        self.__dict__.update(other.__dict__)
+    
+    def _copy(self):
+        self._buf = self._data.copy()
+    
+    # Python scalars that can be stored without checking for type promotion
+    _fast_kinds = {float: 'fc', int: 'ifc'}
+    
+    def _append(self, value):
+        if self._handle.refs > 1:
+            self._detach()
+        n = self._len
+        buf = self._buf
+        if n < len(buf) and buf.dtype.kind in self._fast_kinds.get(type(value), ''):
+            buf[n] = value
+            self._len = n + 1
+            return
+        
+        value = numpy.asarray(value)
+        dtype = numpy.result_type(buf, value)
+        if n >= len(buf) or dtype != buf.dtype:
+            # Grow by 1.5, the spare rows are never visible through _data
+            grown = numpy.empty((n + (n >> 1) + 16,) + buf.shape[1:], dtype)
+            grown[:n] = buf[:n]
+            self._buf = buf = grown
+        buf[n] = value
+        self._len = n + 1
+    
     def __getitem__(self, index):
         # FIXME why is that
         if isinstance(index, tuple) \
@@ -123,9 +1924,14 @@ class matrix(object):
         if isinstance(index, _end):
             if index.offset >= 0:
                 raise IndexError('end+{0}'.format(index.offset))
-            return self._data[index.offset]
+            result = self._data[index.offset]
         else:
-            return self._data[index]
+            result = self._data[_to_index(index)]
+        if isinstance(result, numpy.ndarray) and result.ndim > 0 \
+        and numpy.may_share_memory(result, self._buf):
+            # Slices are views, they share the storage like a copy would
+            return matrix._wrap(result, self)
+        return result
 
     def __setitem__(self, index, value):
         # TODO why is that
@@ -135,16 +1941,66 @@ class matrix(object):
         
         if isinstance(index, _end):
             if index.offset == 0:
-                self._data = numpy.concatenate((self._data, [value]))
-            elif index.offset < 0:
-                self._data[index.offset] = value
-            else:
+                self._append(value)
+                return
+            elif index.offset >= 0:
                 raise IndexError('end+{0}'.format(index.offset))
+            index = index.offset
         else:
-            self._data[index] = value
+            index = _to_index(index)
+        
+        if self._handle.refs > 1:
+            self._detach()
+        self._data[index] = _operand(value)
+    
+    def __getattr__(self, name):
+        # Everything else behaves like the NumPy array
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self._data, name)
+    
+    def __array__(self, dtype=None, copy=None):
+        if dtype is None:
+            return self._data
+        return self._data.astype(dtype, copy=False)
     
     def __len__(self):
-        return len(self._data)
+        return self._len
+    
+    def __bool__(self):
+        # Like MATLAB: true if not empty and all elements are non-zero
+        return self._len > 0 and bool(numpy.all(self._data))
+    
+    __add__ = _binary_op(numpy.add)
+    __radd__ = _binary_op(numpy.add, True)
+    __sub__ = _binary_op(numpy.subtract)
+    __rsub__ = _binary_op(numpy.subtract, True)
+    __mul__ = _binary_op(numpy.multiply)
+    __rmul__ = _binary_op(numpy.multiply, True)
+    __truediv__ = _binary_op(numpy.true_divide)
+    __rtruediv__ = _binary_op(numpy.true_divide, True)
+    __pow__ = _binary_op(numpy.power)
+    __rpow__ = _binary_op(numpy.power, True)
+    __mod__ = _binary_op(numpy.mod)
+    __and__ = _binary_op(numpy.logical_and)
+    __or__ = _binary_op(numpy.logical_or)
+    __eq__ = _binary_op(numpy.equal)
+    __ne__ = _binary_op(numpy.not_equal)
+    __lt__ = _binary_op(numpy.less)
+    __le__ = _binary_op(numpy.less_equal)
+    __gt__ = _binary_op(numpy.greater)
+    __ge__ = _binary_op(numpy.greater_equal)
+    
+    __iadd__ = _inplace_op(numpy.add)
+    __isub__ = _inplace_op(numpy.subtract)
+    __imul__ = _inplace_op(numpy.multiply)
+    __itruediv__ = _inplace_op(numpy.true_divide)
+    __ipow__ = _inplace_op(numpy.power)
+    
+    def __neg__(self):
+        return matrix._wrap(-self._data)
+    
+    __hash__ = None
     
     def __str__(self):
         return str(self._data)
@@ -152,37 +2008,602 @@ class matrix(object):
     def __repr__(self):
         return repr(self._data)
 
-class struct(dict):
+class _ctransposed(matrix):
+    """
+    Conjugate transpose of the complex matrix ``base``. The conjugate is
+    computed on first access to the data.
+    """
+    
+    def __init__(self, base, owner=None):
+        self.base = base
+        self._buf = None
+        self._len = base.shape[-1]
+        if owner is None:
+            self._handle = _handle()
+        else:
+            # base is the storage of owner, see matrix._wrap
+            self._handle = owner._handle
+            owner._handle.refs += 1
+    
+    @property
+    def _data(self):
+        if self._buf is None:
+            self._buf = self.base.conj().T
+        return self._buf[:self._len]
+    
+    @_data.setter
+    def _data(self, data):
+        matrix._data.fset(self, data)
+    
+    def _append(self, value):
+        self._data
+        matrix._append(self, value)
+
+class struct(_cow):
+    """
+    MATLAB structure. Fields are accessed as attributes or by name.
+    """
+    __slots__ = ('_fields', '_handle')
+    
+    def __new__(cls, *args):
+        # struct('a', {1, 2, 3}) creates a struct array
+        if cls is struct and any(isinstance(value, vector) and len(value) != 1 for value in args[1::2]):
+            cls = structarray
+        return object.__new__(cls)
+    
     def __init__(self, *args):
         names = args[::2]
-        values = args[1::2]
-        super(struct, self).__init__(zip(names, values))
+        values = [value[0] if isinstance(value, vector) else value for value in args[1::2]]
+        self._fields = dict(zip(names, values))
+        self._handle = _handle()
+    
+    @classmethod
+    def _from_fields(cls, fields):
+        """
+        Struct holding the (name, value) pairs ``fields`` as they are.
+        """
+        self = object.__new__(struct)
+        self._fields = dict(fields)
+        self._handle = _handle()
+        return self
+    
+    def _to_array(self):
+        """
+        Turn this struct into a struct array with one element.
+        """
+        self._detach()
+        fields = self._fields
+        self.__class__ = structarray
+        columns = _columns(1)
+        for name, value in fields.items():
+            columns[name], mask = _new_column([value], 1)
+            if mask is not None:
+                columns.empty[name] = mask
+        self._fields = columns
+        return self
+    
+    def _take(self, other):
+        self._fields = other._fields
+        self._handle = other._handle
+    
+    def _copy(self):
+        self._fields = dict((name, share(value)) for name, value in self._fields.items())
     
     def __getattr__(self, name):
-        if name in self:
-            return self[name]
+        if not name.startswith('_') \
+        and name in self._fields:
+            return self._fields[name]
         else:
             raise AttributeError(name)
     
     def __setattr__(self, name, value):
-        self[name] = value
+        if name.startswith('_'):
+            object.__setattr__(self, name, value)
+        else:
+            self[name] = value
+    
+    def __getitem__(self, name):
+        if isinstance(name, str):
+            return self._fields[name]
+        # Target of s(i).x = v, s(1) is the struct itself
+        if _struct_index(name, 1, 0) == 0:
+            return self
+        return self._to_array()[name]
+    
+    def __setitem__(self, name, value):
+        if not isinstance(name, str):
+            self._to_array()[name] = value
+            return
+        if self._handle.refs > 1:
+            self._detach()
+        self._fields[name] = value
+    
+    def __call__(self, *index):
+        index = index[0] if len(index) == 1 else index
+        if _struct_index(index, 1, 1) != 0:
+            raise IndexError('index exceeds struct dimensions')
+        return self._share()
+    
+    def __delitem__(self, name):
+        self._detach()
+        del self._fields[name]
+    
+    def __contains__(self, name):
+        return name in self._fields
+    
+    def __iter__(self):
+        return iter(self._fields)
+    
+    def __len__(self):
+        return len(self._fields)
+    
+    def __eq__(self, other):
+        if isinstance(other, struct):
+            other = other._fields
+        return self._fields == other
+    
+    __hash__ = None
+    
+    def keys(self):
+        return self._fields.keys()
+    
+    def values(self):
+        return self._fields.values()
+    
+    def items(self):
+        return self._fields.items()
+    
+    def get(self, name, default=None):
+        return self._fields.get(name, default)
+    
+    def update(self, *args, **kwargs):
+        self._detach()
+        self._fields.update(*args, **kwargs)
+    
+    clone = _cow._share
+    
+    def __repr__(self):
+        return repr(self._fields)
+
+class _columns(dict):
+    """
+    Storage of a struct array: field name -> column buffer. All buffers have
+    ``cap`` rows of which the first ``n`` are used. ``empty`` holds masks of
+    the rows of numeric columns that contain ``[]``, ``exported`` the number
+    of rows of each column that are referenced by column views.
+    """
+    __slots__ = ('n', 'cap', 'empty', 'exported')
+    
+    def __init__(self, n=0):
+        dict.__init__(self)
+        self.n = self.cap = n
+        self.empty = {}
+        self.exported = {}
+
+# Column types that are read as Python scalars
+_python_dtypes = (numpy.dtype(float), numpy.dtype(int), numpy.dtype(bool), numpy.dtype(complex))
+_plain_scalar_types = frozenset(_scalar_types)
+
+def _numeric_scalar(value):
+    return isinstance(value, (int, float, complex, numpy.number, numpy.bool_))
+
+def _is_empty(value):
+    return value is None \
+        or (isinstance(value, (matrix, numpy.ndarray)) and numpy.size(_operand(value)) == 0)
+
+def _empty_matrix():
+    return matrix._wrap(numpy.zeros(0))
+
+def _new_column(items, cap):
+    """
+    Buffer and empty mask (or ``None``) of a column holding ``items``.
+    """
+    n = len(items)
+    if set(map(type, items)) <= _plain_scalar_types:
+        data = numpy.array(items)
+        buf = numpy.zeros(cap, data.dtype if n else float)
+        buf[:n] = data
+        return buf, None
+    
+    empty = [_is_empty(item) for item in items]
+    if all(e or _numeric_scalar(item) for item, e in zip(items, empty)):
+        data = numpy.array([
+            0 if e else bool(item) if isinstance(item, _logical) else item
+            for item, e in zip(items, empty)
+        ] or numpy.zeros(0))
+        buf = numpy.zeros(cap, data.dtype)
+        buf[:n] = data
+        if not any(empty):
+            return buf, None
+        mask = numpy.zeros(cap, bool)
+        mask[:n] = empty
+        return buf, mask
+    
+    buf = numpy.empty(cap, object)
+    for i, item in enumerate(items):
+        if not empty[i]:
+            buf[i] = item
+    return buf, None
+
+class _element(object):
+    """
+    Element ``index`` of a struct array as target of ``s(i).x = v``. Field
+    reads and writes go to the columns of the array.
+    """
+    __slots__ = ('_array', '_index')
+    
+    def __init__(self, array, index):
+        object.__setattr__(self, '_array', array)
+        object.__setattr__(self, '_index', index)
+    
+    def __getattr__(self, name):
+        return self._array._get(self._index, name)
+    
+    def __setattr__(self, name, value):
+        self._array._set(self._index, name, value)
+    
+    __getitem__ = __getattr__
+    __setitem__ = __setattr__
+
+class _row(struct):
+    """
+    Element ``s(i)`` of a struct array. Reading a field (``s(i).x``) only
+    reads that column, the struct of all fields is built when the element is
+    used as a whole. The row holds a share of the array, so it keeps the
+    values of the time it was taken.
+    """
+    __slots__ = ('_array', '_index')
+    
+    def __init__(self, array, index):
+        self._array = array._share()
+        self._index = index
+    
+    def __getattr__(self, name):
+        if name == '_fields' or name == '_handle':
+            array, self._array = self._array, None
+            self._fields = dict((key, share(array._get(self._index, key))) for key in array._fields)
+            self._handle = _handle()
+            return getattr(self, name)
+        if self._array is not None and not name.startswith('_'):
+            return self._array._get(self._index, name)
+        return struct.__getattr__(self, name)
+    
+    def _share(self):
+        # A plain struct, rows cannot grow into struct arrays
+        return struct._from_fields((name, share(value)) for name, value in self._fields.items())
+    
+    def _release(self):
+        if self._array is None:
+            struct._release(self)
+
+class structarray(struct):
+    """
+    MATLAB struct array stored by columns: numeric scalar fields of all
+    elements are kept in one NumPy array per field, other fields in object
+    arrays. ``s.x`` is the column of ``x`` (a read-only view unless some
+    elements hold ``[]``), ``s(i)`` the i-th element as struct (see ``_row``)
+    and ``s[i]`` the target of ``s(i).x = v``. A struct grows into a struct array when
+    ``s(2)`` is assigned.
+    """
+    __slots__ = ()
+    
+    def __init__(self, *args):
+        # struct('a', {1, 2, 3}, 'b', 0): cells hold the values of the
+        # elements, other values are the same for all elements
+        names = args[::2]
+        values = args[1::2]
+        n = None
+        for value in values:
+            if isinstance(value, vector) and len(value) != 1:
+                if n is not None and len(value) != n:
+                    raise ValueError('cell arguments of struct must have the same size')
+                n = len(value)
+        n = 1 if n is None else n
+        
+        columns = _columns(n)
+        for name, value in zip(names, values):
+            if isinstance(value, vector) and len(value) != 1:
+                items = list(value)
+            else:
+                value = value[0] if isinstance(value, vector) else value
+                if _numeric_scalar(value):
+                    columns[name] = numpy.full(n, bool(value) if isinstance(value, _logical) else value)
+                    continue
+                items = [share(value) for _ in range(n)]
+            columns[name], mask = _new_column(items, n)
+            if mask is not None:
+                columns.empty[name] = mask
+        self._fields = columns
+        self._handle = _handle()
+    
+    @classmethod
+    def _from_columns(cls, columns):
+        self = object.__new__(cls)
+        self._fields = columns
+        self._handle = _handle()
+        return self
+    
+    def _copy(self):
+        old = self._fields
+        n = old.n
+        columns = _columns(n)
+        for name, buf in old.items():
+            if buf.dtype.kind == 'O':
+                column = numpy.empty(n, object)
+                for i in range(n):
+                    column[i] = share(buf[i])
+            else:
+                column = buf[:n].copy()
+            columns[name] = column
+        for name, mask in old.empty.items():
+            columns.empty[name] = mask[:n].copy()
+        self._fields = columns
+    
+    def _mask(self, name):
+        columns = self._fields
+        mask = columns.empty.get(name)
+        if mask is None:
+            mask = columns.empty[name] = numpy.zeros(columns.cap, bool)
+        return mask
+    
+    def _resize(self, n):
+        """
+        Grow to ``n`` elements, the new elements hold ``[]`` in all fields.
+        """
+        columns = self._fields
+        if n > columns.cap:
+            # Grow by 1.5 like matrix appends
+            cap = max(n, columns.cap + (columns.cap >> 1) + 16)
+            for name, buf in list(columns.items()):
+                grown = numpy.zeros(cap, buf.dtype) if buf.dtype.kind != 'O' else numpy.empty(cap, object)
+                grown[:columns.n] = buf[:columns.n]
+                columns[name] = grown
+            for name, mask in list(columns.empty.items()):
+                grown = numpy.zeros(cap, bool)
+                grown[:columns.n] = mask[:columns.n]
+                columns.empty[name] = grown
+            columns.exported.clear()
+            columns.cap = cap
+        for name, buf in columns.items():
+            if buf.dtype.kind == 'O':
+                buf[columns.n:n] = None
+            else:
+                self._mask(name)[columns.n:n] = True
+        columns.n = n
+    
+    def _add_field(self, name):
+        columns = self._fields
+        buf = columns[name] = numpy.zeros(columns.cap)
+        self._mask(name)[:columns.n] = True
+        return buf
+    
+    def _to_objects(self, name):
+        columns = self._fields
+        buf = columns[name]
+        objects = numpy.empty(columns.cap, object)
+        objects[:columns.n] = buf[:columns.n].tolist()
+        mask = columns.empty.pop(name, None)
+        if mask is not None:
+            objects[:columns.n][mask[:columns.n]] = None
+        columns[name] = objects
+        columns.exported.pop(name, None)
+        return objects
+    
+    def _get(self, i, name):
+        columns = self._fields
+        if not 0 <= i < columns.n:
+            raise IndexError('index exceeds struct array dimensions')
+        try:
+            buf = columns[name]
+        except KeyError:
+            raise AttributeError(name)
+        value = buf[i]
+        if buf.dtype.kind == 'O':
+            return _empty_matrix() if value is None else value
+        mask = columns.empty.get(name)
+        if mask is not None and mask[i]:
+            return _empty_matrix()
+        return value.item() if buf.dtype in _python_dtypes else value
+    
+    def _set(self, i, name, value):
+        if self._handle.refs > 1:
+            self._detach()
+        columns = self._fields
+        if i >= columns.n:
+            self._resize(i + 1)
+        buf = columns.get(name)
+        if buf is None:
+            buf = self._add_field(name)
+        if i < columns.exported.get(name, 0):
+            # A column view still uses the buffer
+            buf = columns[name] = buf.copy()
+            del columns.exported[name]
+        
+        if buf.dtype.kind != 'O':
+            if _is_empty(value):
+                self._mask(name)[i] = True
+                return
+            if _numeric_scalar(value):
+                if isinstance(value, _logical):
+                    value = bool(value)
+                dtype = numpy.result_type(buf, value)
+                if dtype != buf.dtype:
+                    buf = columns[name] = buf.astype(dtype)
+                    columns.exported.pop(name, None)
+                buf[i] = value
+                mask = columns.empty.get(name)
+                if mask is not None:
+                    mask[i] = False
+                return
+            buf = self._to_objects(name)
+        buf[i] = None if _is_empty(value) else value
+    
+    def _select(self, index):
+        columns = self._fields
+        n = columns.n
+        if isinstance(index, slice):
+            rows = numpy.arange(n)[index]
+        elif isinstance(index, colon):
+            rows = numpy.arange(n)[_to_index(index - 1)]
+        else:
+            index = numpy.ravel(numpy.asarray(_operand(index)))
+            rows = numpy.arange(n)[index if index.dtype == bool else index.astype(int) - 1]
+        
+        selected = _columns(len(rows))
+        for name, buf in columns.items():
+            column = buf[:n][rows]
+            if column.dtype.kind == 'O':
+                column = numpy.array([share(value) for value in column] or [], dtype=object)
+            selected[name] = column
+        for name, mask in columns.empty.items():
+            selected.empty[name] = mask[:n][rows]
+        return structarray._from_columns(selected)
+    
+    def _column(self, name):
+        columns = self._fields
+        try:
+            buf = columns[name]
+        except KeyError:
+            raise AttributeError(name)
+        n = columns.n
+        if buf.dtype.kind == 'O':
+            return vector(_empty_matrix() if value is None else share(value) for value in buf[:n])
+        mask = columns.empty.get(name)
+        if mask is not None and mask[:n].any():
+            # Like [s.x], elements holding [] are skipped
+            return matrix._wrap(buf[:n][~mask[:n]])
+        view = buf[:n]
+        view.flags.writeable = False
+        columns.exported[name] = n
+        return matrix._wrap(view)
+    
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return self._column(name)
+    
+    def __getitem__(self, index):
+        if isinstance(index, str):
+            return self._column(index)
+        elif isinstance(index, slice):
+            return self._select(index)
+        return _element(self, _struct_index(index, self._fields.n, 0))
+    
+    def __setitem__(self, index, value):
+        if isinstance(index, str):
+            if self._fields.n != 1:
+                raise ValueError('field assignment to a struct array needs an index')
+            self._set(0, index, value)
+            return
+        
+        i = _struct_index(index, self._fields.n, 0)
+        if isinstance(value, structarray):
+            if len(value) != 1:
+                raise ValueError('cannot assign {0} elements to one'.format(len(value)))
+            value = value(1)
+        if not isinstance(value, struct):
+            raise TypeError('only structs can be assigned to struct array elements')
+        for name in list(self._fields):
+            if name not in value:
+                self._set(i, name, None)
+        for name, field in value.items():
+            self._set(i, name, share(field))
+    
+    def __call__(self, *index):
+        index = index[0] if len(index) == 1 else index
+        if isinstance(index, (colon, matrix, numpy.ndarray, list)):
+            return self._select(index)
+        i = _struct_index(index, self._fields.n, 1)
+        if i >= self._fields.n:
+            raise IndexError('index exceeds struct array dimensions')
+        return _row(self, i)
+    
+    def __len__(self):
+        return self._fields.n
+    
+    def __eq__(self, other):
+        if not isinstance(other, structarray) \
+        or len(self) != len(other) \
+        or set(self.keys()) != set(other.keys()):
+            return False
+        return all(self(i + 1) == other(i + 1) for i in range(len(self)))
+    
+    __hash__ = None
+    
+    def values(self):
+        return [self._column(name) for name in self._fields]
+    
+    def items(self):
+        return [(name, self._column(name)) for name in self._fields]
+    
+    def get(self, name, default=None):
+        return self._column(name) if name in self._fields else default
+    
+    def update(self, *args, **kwargs):
+        raise TypeError('struct arrays cannot be updated field-wise')
+    
+    def __repr__(self):
+        return '<1x{0} struct array with fields {1}>'.format(len(self), ', '.join(self._fields))
 
-class vector(list):
+class vector(_cow):
+    """
+    Cell array (a list with MATLAB indexing).
+    """
+    __slots__ = ('_items', '_handle')
+    
+    def __init__(self, items=()):
+        self._items = list(items)
+        self._handle = _handle()
+    
+    def _take(self, other):
+        self._items = other._items
+        self._handle = other._handle
+    
+    def _copy(self):
+        self._items = [share(value) for value in self._items]
+    
     def __getitem__(self, index):
         if isinstance(index, _end):
             if index.offset >= 0:
                 raise IndexError('end+{0}'.format(index.offset))
-            return self[index.offset]
+            return self._items[index.offset]
+        elif isinstance(index, slice):
+            return vector(self._items[index])
         else:
-            return super(vector, self).__getitem__(index)
+            result = self._items[_to_index(index)]
+            return vector(result) if isinstance(result, list) else result
     
     def __setitem__(self, index, value):
+        if self._handle.refs > 1:
+            self._detach()
         if isinstance(index, _end):
             if index.offset == 0:
-                self.append(value)
+                self._items.append(value)
             elif index.offset < 0:
-                self[index.offset] = value
+                self._items[index.offset] = value
             else:
                 raise IndexError('end+{0}'.format(index.offset))
         else:
-            super(vector, self).__setitem__(index, value)
+            self._items[_to_index(index)] = value
+    
+    def append(self, value):
+        self[end] = value
+    
+    def __contains__(self, value):
+        return value in self._items
+    
+    def __iter__(self):
+        return iter(self._items)
+    
+    def __len__(self):
+        return len(self._items)
+    
+    def __eq__(self, other):
+        if isinstance(other, vector):
+            other = other._items
+        return self._items == other
+    
+    __hash__ = None
+    
+    def __repr__(self):
+        return repr(self._items)
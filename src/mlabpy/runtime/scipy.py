@@ -1,16 +1,469 @@
 '''
 MlapPy SciPy bindings.
 
+SciPy is only imported when one of the bindings is actually used.
+
+Interpolants built by ``interp1``, ``interp2`` and ``interpn`` are kept in a
+small LRU cache keyed by the identity of the grid and value arrays, so that
+repeated lookups in the same table skip the setup.
+
 Copyright (C) 2015, led02 <mlabpy@led-inc.eu>
 '''
+import bisect
+import collections
+import threading
+
 import numpy
-from scipy import interpolate, sparse as sparsemat
 
-sparse = sparsemat.csr_matrix
+from mlabpy import conf
+from mlabpy.runtime import LazyModule
+from mlabpy.runtime.core import _is_sparse, _operand, _sparse, matrix, share
+
+interpolate = LazyModule('scipy.interpolate')
+sparsemat = LazyModule('scipy.sparse')
+
+def _indices(values):
+    return numpy.ravel(numpy.asarray(_operand(values)))
+
+def sparse(*args):
+    """
+    MATLAB ``sparse``: ``sparse(A)`` converts ``A``, ``sparse(m, n)`` is an
+    all-zero matrix and ``sparse(i, j, v[, m, n[, nzmax]])`` assembles a
+    matrix from 1-based triplets. Scalar ``i``, ``j`` or ``v`` are repeated,
+    duplicate entries are summed. The triplets are converted in one pass
+    through the COO format, the result is a ``csc_array`` (compressed
+    columns, like MATLAB).
+    """
+    if len(args) == 1:
+        value = args[0]
+        if _is_sparse(value):
+            return _sparse(sparsemat.csc_array(value))
+        return _sparse(sparsemat.csc_array(numpy.atleast_2d(numpy.asarray(_operand(value)))))
+    elif len(args) == 2:
+        return _sparse(sparsemat.csc_array((int(args[0]), int(args[1]))))
+
+    i, j, v = (_indices(arg) for arg in args[:3])
+    i, j, v = numpy.broadcast_arrays(i, j, v)
+    if len(args) >= 5:
+        shape = int(args[3]), int(args[4])
+    else:
+        shape = (int(i.max()) if i.size else 0), (int(j.max()) if j.size else 0)
+    if v.dtype.kind not in 'bc':
+        v = v.astype(float, copy=False)
+    rows = i.astype(numpy.intp) - 1
+    cols = j.astype(numpy.intp) - 1
+    if rows.size and (rows.min() < 0 or cols.min() < 0):
+        raise IndexError('sparse indices must be positive')
+    # tocsc sums duplicate entries
+    return _sparse(sparsemat.coo_array((v, (rows, cols)), shape=shape).tocsc())
+
+def speye(*args):
+    """
+    Sparse identity: ``speye(n)``, ``speye(m, n)`` or ``speye([m, n])``.
+    """
+    if len(args) == 1:
+        dims = _indices(args[0])
+        m, n = (int(dims[0]), int(dims[-1]))
+    else:
+        m, n = int(args[0]), int(args[1])
+    k = numpy.arange(min(m, n))
+    return _sparse(sparsemat.csc_array((numpy.ones(len(k)), (k, k)), shape=(m, n)))
+
+def spdiags(B, d, m, n):
+    """
+    ``spdiags(B, d, m, n)`` puts the columns of ``B`` on the diagonals
+    ``d`` of a sparse ``m``-by-``n`` matrix. Like MATLAB, the element of a
+    column is chosen by the column index of its position if ``m >= n`` and
+    by the row index otherwise.
+    """
+    B = numpy.asarray(_operand(B))
+    if B.ndim < 2:
+        B = B.reshape(-1, 1)
+    m, n = int(m), int(n)
+    rows, cols, values = [], [], []
+    for k, diag in enumerate(_indices(d).astype(int)):
+        i = numpy.arange(max(0, -diag), min(m, n - diag))
+        rows.append(i)
+        cols.append(i + diag)
+        values.append(B[i + diag if m >= n else i, k])
+    if not rows:
+        return _sparse(sparsemat.csc_array((m, n)))
+    return _sparse(sparsemat.coo_array(
+        (numpy.concatenate(values), (numpy.concatenate(rows), numpy.concatenate(cols))),
+        shape=(m, n),
+    ).tocsc())
+
+# Interpolation
+
+_interpolants = collections.OrderedDict()
+_interpolants_lock = threading.Lock()
+
+def _identity(value):
+    # Matrices are keyed by their buffer. The cache holds a share of the
+    # matrix, so any later write copies the buffer and changes the key. A
+    # lazy conjugate transpose only has a buffer once its data is read.
+    if isinstance(value, matrix):
+        data = value._data
+        return id(value._buf), len(data)
+    return id(value), None
+
+def _interpolant(build, options, *operands):
+    """
+    Return ``build(options, *arrays)`` for the ``operands``, reusing the
+    interpolant of an earlier call with the same operands and options.
+    Plain NumPy arrays are keyed by identity only, they must not be written
+    in place while they are used as tables.
+    """
+    key = (build, options) + tuple(_identity(value) for value in operands)
+    with _interpolants_lock:
+        entry = _interpolants.get(key)
+        if entry is not None:
+            _interpolants.move_to_end(key)
+            return entry[0]
+
+    interpolant = build(options, *[
+        None if value is None else numpy.asarray(_operand(value))
+        for value in operands
+    ])
+    if conf.INTERP_CACHE_SIZE > 0:
+        with _interpolants_lock:
+            _interpolants[key] = interpolant, [share(value) for value in operands]
+            while len(_interpolants) > conf.INTERP_CACHE_SIZE:
+                _interpolants.popitem(last=False)
+    return interpolant
+
+def _split_options(args):
+    # Positional operands, then the method name and the extrapolation value
+    for count, arg in enumerate(args):
+        if isinstance(arg, str):
+            break
+    else:
+        return list(args), None, None
+    options = list(args[count:])
+    method = options.pop(0).lower().lstrip('*')
+    if method == 'extrap':
+        method, options = None, ['extrap']
+    extrap = options[0] if options else None
+    if isinstance(extrap, str):
+        if extrap != 'extrap':
+            raise ValueError("unknown extrapolation '{0}'".format(extrap))
+    elif extrap is not None:
+        extrap = float(numpy.asarray(_operand(extrap)))
+        if extrap != extrap:
+            extrap = None
+    return list(args[:count]), method, extrap
+
+def _as_float(values):
+    return values.astype(numpy.result_type(values, float), copy=False)
+
+def _result(values, scalar):
+    if scalar and values.size == 1:
+        return values.item()
+    return matrix._wrap(values)
+
+class _Interp1(object):
+    """
+    One-dimensional interpolant of the columns of ``v`` over the sample
+    points ``x``. The piecewise methods are evaluated with ``searchsorted``,
+    the splines by SciPy.
+    """
+
+    def __init__(self, options, x, v):
+        method, self.extrap = options
+        if v.ndim == 2 and 1 in v.shape:
+            v = v.ravel()
+        n = len(v)
+        x = numpy.arange(1.0, n + 1) if x is None else _as_float(x.ravel())
+        if len(x) != n:
+            raise ValueError('sample points and values must have the same length')
+        if n < 2:
+            raise ValueError('interpolation needs at least two sample points')
+        if numpy.any(x[1:] <= x[:-1]):
+            order = numpy.argsort(x, kind='stable')
+            x, v = x[order], v[order]
+            if numpy.any(x[1:] == x[:-1]):
+                raise ValueError('sample points must be distinct')
+        self.method = method
+        self.x = x
+        self.v = v = _as_float(v)
+        self.lists = None
+
+        if method == 'linear':
+            dx = numpy.diff(x).reshape((-1,) + (1,) * (v.ndim - 1))
+            self.slopes = numpy.diff(v, axis=0) / dx
+        elif method == 'nearest':
+            self.middle = (x[1:] + x[:-1]) / 2
+        elif method in ('pchip', 'cubic'):
+            self.spline = interpolate.PchipInterpolator(x, v)
+        elif method == 'spline':
+            self.spline = interpolate.CubicSpline(x, v)
+        elif method == 'makima':
+            self.spline = interpolate.Akima1DInterpolator(x, v, method='makima', extrapolate=True)
+        elif method not in ('previous', 'next'):
+            raise ValueError("unknown interpolation method '{0}'".format(method))
+
+    def _scalar(self, xq):
+        # Lookups of single points in loops avoid the NumPy overhead
+        if self.lists is None:
+            self.lists = self.x.tolist(), self.v.tolist(), self.slopes.tolist()
+        x, v, slopes = self.lists
+        if not x[0] <= xq <= x[-1]:
+            if self.extrap != 'extrap':
+                return float('nan') if self.extrap is None else self.extrap
+        k = min(max(bisect.bisect_right(x, xq) - 1, 0), len(x) - 2)
+        return v[k] + (xq - x[k]) * slopes[k]
+
+    def __call__(self, xq):
+        if self.method == 'linear' and self.v.ndim == 1 and isinstance(xq, (int, float)):
+            return self._scalar(xq)
+
+        scalar = numpy.ndim(xq) == 0
+        xq = _as_float(numpy.asarray(_operand(xq)))
+        x, v, method = self.x, self.v, self.method
+        if v.ndim > 1 and xq.ndim == 2 and 1 in xq.shape:
+            xq = xq.ravel()
+        if method == 'linear':
+            k = numpy.clip(numpy.searchsorted(x, xq, 'right') - 1, 0, len(x) - 2)
+            dx = (xq - x[k]).reshape(xq.shape + (1,) * (v.ndim - 1))
+            values = v[k] + dx * self.slopes[k]
+        elif method == 'nearest':
+            values = v[numpy.searchsorted(self.middle, xq, 'right')]
+        elif method == 'previous':
+            values = v[numpy.clip(numpy.searchsorted(x, xq, 'right') - 1, 0, len(x) - 1)]
+        elif method == 'next':
+            values = v[numpy.clip(numpy.searchsorted(x, xq, 'left'), 0, len(x) - 1)]
+        else:
+            values = self.spline(xq)
+
+        extrap = self.extrap
+        if extrap is None and method in ('pchip', 'cubic', 'spline', 'makima'):
+            # MATLAB extrapolates the splines by default
+            extrap = 'extrap'
+        if extrap == 'extrap':
+            if method in ('nearest', 'previous', 'next'):
+                outside = numpy.isnan(xq)
+                if outside.any():
+                    values[outside] = numpy.nan
+        else:
+            outside = ~((xq >= x[0]) & (xq <= x[-1]))
+            if outside.any():
+                values[outside] = numpy.nan if extrap is None else extrap
+        return _result(values, scalar)
+
+def interp1(*args):
+    """
+    MATLAB ``interp1(x, v, xq[, method[, extrapolation]])`` or
+    ``interp1(v, xq, ...)``. The columns of a matrix ``v`` are interpolated
+    at once. Methods are ``'linear'`` (default), ``'nearest'``,
+    ``'previous'``, ``'next'``, ``'pchip'``/``'cubic'``, ``'spline'`` and
+    ``'makima'``. Points outside of ``x`` are NaN (or the given value), with
+    ``'extrap'`` they are extrapolated.
+    """
+    operands, method, extrap = _split_options(args)
+    if len(operands) == 2:
+        x, v, xq = None, operands[0], operands[1]
+    elif len(operands) == 3:
+        x, v, xq = operands
+    else:
+        raise TypeError('interp1 needs sample values and query points')
+    return _interpolant(_Interp1, (method or 'linear', extrap), x, v)(xq)
+
+# MATLAB names of the methods of RegularGridInterpolator
+_grid_methods = {
+    'linear': 'linear', 'nearest': 'nearest',
+    'cubic': 'cubic', 'spline': 'cubic', 'pchip': 'pchip',
+}
+
+def _grid_vector(grid, axis):
+    # Grid vectors are used as they are, full grids as produced by meshgrid
+    # or ndgrid vary along ``axis``
+    if grid.ndim > 1 and grid.size > max(grid.shape):
+        index = [0] * grid.ndim
+        index[axis] = slice(None)
+        return grid[tuple(index)]
+    return grid.ravel()
+
+class _InterpN(object):
+    """
+    Interpolant of ``v`` on the rectangular grid with the axes ``grids``
+    (default: ``1:size(v, k)``). Linear and nearest interpolation look up
+    the cells of all points with ``searchsorted`` and gather the corner
+    values from the flat table, the cubic methods use SciPy's
+    ``RegularGridInterpolator``.
+    """
+
+    def __init__(self, options, v, *grids):
+        method, self.extrap = options
+        if len(grids) == 1 and v.ndim == 2 and 1 in v.shape:
+            v = v.ravel()
+        if method not in _grid_methods:
+            raise ValueError("unknown interpolation method '{0}'".format(method))
+        if len(grids) != v.ndim:
+            raise ValueError('expected {0} grid vectors, got {1}'.format(v.ndim, len(grids)))
+        self.axes = [
+            numpy.arange(1.0, size + 1) if grid is None else _as_float(_grid_vector(grid, axis))
+            for axis, (size, grid) in enumerate(zip(v.shape, grids))
+        ]
+        if any(len(axis) < 2 for axis in self.axes):
+            raise ValueError('interpolation needs at least two sample points in each dimension')
+        if any(len(axis) != size for axis, size in zip(self.axes, v.shape)):
+            raise ValueError('grid vectors do not match the size of the table')
+        self.method = method
+        v = _as_float(v)
+
+        if method == 'linear':
+            self.steps = [numpy.diff(axis) for axis in self.axes]
+        elif method == 'nearest':
+            self.middles = [(axis[1:] + axis[:-1]) / 2 for axis in self.axes]
+        else:
+            extrap = self.extrap
+            self.interpolator = interpolate.RegularGridInterpolator(
+                self.axes, v, method=_grid_methods[method], bounds_error=False,
+                fill_value=None if extrap == 'extrap' else numpy.nan if extrap is None else extrap,
+            )
+            return
+        self.lists = None
+        self.flat = numpy.ascontiguousarray(v).ravel()
+        self.strides = [stride // v.itemsize for stride in numpy.ascontiguousarray(v).strides]
+
+    def refine(self, k):
+        # Grid vectors with 2^k - 1 points inserted between the samples
+        return [
+            numpy.linspace(axis[0], axis[-1], (len(axis) - 1) * 2 ** int(k) + 1)
+            for axis in self.axes
+        ]
+
+    def _cells(self, queries):
+        # Lower corner and relative position in the cell along each axis
+        for axis, steps, query in zip(self.axes, self.steps, queries):
+            k = numpy.clip(numpy.searchsorted(axis, query, 'right') - 1, 0, len(axis) - 2)
+            yield k, (query - axis[k]) / steps[k]
+
+    def _point_cells(self, point):
+        # Single points in loops avoid the NumPy overhead
+        if self.lists is None:
+            self.lists = [axis.tolist() for axis in self.axes]
+        for axis, query in zip(self.lists, point):
+            k = min(max(bisect.bisect_right(axis, query) - 1, 0), len(axis) - 2)
+            yield k, (query - axis[k]) / (axis[k + 1] - axis[k])
+
+    def _linear(self, cells):
+        offset = 0
+        weights = []
+        for (k, t), stride in zip(cells, self.strides):
+            weights.append((t, stride))
+            offset = offset + k * stride
+        values = 0
+        # Sum over the 2^n corners of the cells
+        for corner in range(1 << len(weights)):
+            weight, index = 1, offset
+            for bit, (t, stride) in enumerate(weights):
+                if corner >> bit & 1:
+                    weight = weight * t
+                    index = index + stride
+                else:
+                    weight = weight * (1 - t)
+            values = values + weight * self.flat[index]
+        return values
+
+    def _nearest(self, queries):
+        index = 0
+        for middle, stride, query in zip(self.middles, self.strides, queries):
+            index = index + numpy.searchsorted(middle, query, 'right') * stride
+        return self.flat[index]
+
+    def __call__(self, queries, ndgrid=False):
+        if self.method == 'linear' and all(type(query) in (int, float) for query in queries):
+            for axis, query in zip(self.axes, queries):
+                if not axis[0] <= query <= axis[-1] and self.extrap != 'extrap':
+                    return float('nan') if self.extrap is None else self.extrap
+            return float(self._linear(self._point_cells(queries)))
+
+        queries = [_as_float(numpy.asarray(_operand(query))) for query in queries]
+        scalar = all(query.ndim == 0 for query in queries)
+        if ndgrid:
+            # Grid vectors span a full grid
+            n = len(queries)
+            queries = [
+                query.reshape((1,) * k + (-1,) + (1,) * (n - k - 1))
+                for k, query in enumerate(queries)
+            ]
+        queries = numpy.broadcast_arrays(*queries)
+        if self.method not in ('linear', 'nearest'):
+            return _result(self.interpolator(numpy.stack(queries, axis=-1)), scalar)
+
+        if self.method == 'linear':
+            values = numpy.asarray(self._linear(self._cells(queries)))
+        else:
+            values = self._nearest(queries)
+        if self.extrap == 'extrap':
+            outside = False
+            for query in queries:
+                outside = outside | numpy.isnan(query)
+        else:
+            inside = True
+            for axis, query in zip(self.axes, queries):
+                inside = inside & (query >= axis[0]) & (query <= axis[-1])
+            outside = ~inside
+        if numpy.any(outside):
+            values = numpy.where(outside, numpy.nan if self.extrap in (None, 'extrap') else self.extrap, values)
+        return _result(values, scalar)
+
+def interp2(*args):
+    """
+    MATLAB ``interp2(X, Y, V, Xq, Yq[, method[, extrapval]])``,
+    ``interp2(V, Xq, Yq, ...)`` and ``interp2(V[, k], ...)``. ``X`` and
+    ``Y`` are grid vectors or full grids from ``meshgrid``, ``V(i, j)`` is
+    the value at ``(X(j), Y(i))``. A row vector ``Xq`` and a column vector
+    ``Yq`` span a grid. ``interp2(V, k)`` refines ``V`` by inserting
+    ``2^k - 1`` points between the samples. Methods are ``'linear'``
+    (default), ``'nearest'``, ``'cubic'`` and ``'spline'``.
+    """
+    operands, method, extrap = _split_options(args)
+    options = method or 'linear', extrap
+    if len(operands) <= 2:
+        interpolant = _interpolant(_InterpN, options, operands[0], None, None)
+        yq, xq = interpolant.refine(operands[1] if len(operands) == 2 else 1)
+        return interpolant((yq, xq), ndgrid=True)
+    elif len(operands) == 3:
+        v, xq, yq = operands
+        interpolant = _interpolant(_InterpN, options, v, None, None)
+    elif len(operands) == 5:
+        x, y, v, xq, yq = operands
+        interpolant = _interpolant(_InterpN, options, v, y, x)
+    else:
+        raise TypeError('interp2 needs a table and query points')
+    return interpolant((yq, xq))
+
+def _table_ndim(value):
+    # Vectors are one-dimensional tables
+    shape = numpy.shape(_operand(value))
+    return 1 if len(shape) == 2 and 1 in shape else len(shape)
 
-def interp2(Z, k, kind):
-    Z_shape = Z.shape
-    X = numpy.array(range(Z_shape[0]))
-    Y = numpy.array(range(Z_shape[1]))
-    return interpolate.interp2d(X, Y, Z)
-        
\ No newline at end of file
+def interpn(*args):
+    """
+    MATLAB ``interpn(X1, ..., Xn, V, Xq1, ..., Xqn[, method[, extrapval]])``,
+    ``interpn(V, Xq1, ..., Xqn, ...)`` and ``interpn(V[, k], ...)``. The
+    grids are vectors or full grids from ``ndgrid``. Query vectors of
+    different lengths span a grid. See ``interp2`` for the methods and the
+    refinement by ``k``.
+    """
+    operands, method, extrap = _split_options(args)
+    options = method or 'linear', extrap
+    count = len(operands)
+    if count >= 3 and count % 2 == 1 and _table_ndim(operands[count // 2]) == count // 2:
+        n = count // 2
+        interpolant = _interpolant(_InterpN, options, operands[n], *operands[:n])
+        queries = operands[n + 1:]
+    elif count >= 1:
+        n = _table_ndim(operands[0])
+        interpolant = _interpolant(_InterpN, options, operands[0], *[None] * n)
+        if count == 1 or (count == 2 and n > 1):
+            return interpolant(interpolant.refine(operands[1] if count == 2 else 1), ndgrid=True)
+        elif count != n + 1:
+            raise TypeError('interpn needs {0} query arrays'.format(n))
+        queries = operands[1:]
+    else:
+        raise TypeError('interpn needs a table')
+    shapes = set(numpy.shape(_operand(query)) for query in queries)
+    return interpolant(queries, ndgrid=n > 1 and len(shapes) > 1 and all(len(shape) == 1 for shape in shapes))
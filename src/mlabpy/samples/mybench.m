@@ -217,6 +217,7 @@ function res = mybench(varargin)
     if exist('out_1.png'), delete 'out_1.png'; end
     if exist('out_mtx'), delete 'out_mtx'; end
     if exist('out_mtx.mat'), delete 'out_mtx.mat'; end
+    if exist('out_mtx.mlabpy'), delete 'out_mtx.mlabpy'; end
     if exist('dlm.txt'), delete 'dlm.txt'; end
     
     clear IS_OCTAVE IS_IMAGE_PROCESSING;
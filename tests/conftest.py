@@ -0,0 +1,34 @@
+'''
+Fixtures for the MlabPy tests.
+
+Copyright (C) 2015, led02 <mlabpy@led-inc.eu>
+'''
+import itertools
+import textwrap
+
+import pytest
+
+from mlabpy import conf, loader
+
+_modules = itertools.count()
+
+@pytest.fixture(autouse=True)
+def cache_dirs(tmp_path, tmp_path_factory, monkeypatch):
+    """
+    Keep parse tables (shared by all tests) and compiled code (one directory
+    per test) out of the user's cache.
+    """
+    monkeypatch.setattr(conf, 'CACHE_DIR', str(tmp_path_factory.getbasetemp() / 'cache'))
+    monkeypatch.setattr(conf, 'LOADER_CACHE_DIR', str(tmp_path / 'code'))
+
+@pytest.fixture
+def mfile(tmp_path):
+    """
+    ``mfile(source)`` writes ``source`` to a new .m file and loads it.
+    """
+    def load(source, name=None):
+        name = name or 'mtest{0}'.format(next(_modules))
+        filepath = tmp_path / (name + '.m')
+        filepath.write_text(textwrap.dedent(source))
+        return loader.load_file(str(filepath), name)
+    return load
@@ -0,0 +1,63 @@
+'''
+Tests for size and the allocation functions.
+
+Copyright (C) 2015, led02 <mlabpy@led-inc.eu>
+'''
+import numpy
+import pytest
+
+from mlabpy.runtime.core import cell, eye, matrix, ones, size, struct, zeros
+
+
+@pytest.mark.parametrize('args, shape', [
+    ((3,), (3, 3)),
+    ((2, 3), (2, 3)),
+    ((1, 4), (4,)),
+    ((4, 1), (4, 1)),
+    ((2, 3, 1), (2, 3)),
+    ((2, 3, 4), (2, 3, 4)),
+    ((matrix._wrap(numpy.array([2.0, 5.0])),), (2, 5)),
+    ((0,), (0, 0)),
+])
+def test_zeros_shapes(args, shape):
+    result = zeros(*args)
+    assert isinstance(result, matrix)
+    assert result.shape == shape
+    assert not numpy.any(result)
+
+def test_scalars_and_classes():
+    assert zeros() == 0.0
+    assert zeros(1) == 0.0
+    assert ones(2, 'int8').dtype == numpy.int8
+    assert zeros(2, 'like', numpy.ones(1, numpy.float32)).dtype == numpy.float32
+    numpy.testing.assert_array_equal(eye(2, 3), [[1, 0, 0], [0, 1, 0]])
+    assert len(cell(1, 3)) == 3
+
+def test_size():
+    a = matrix._wrap(numpy.ones((3, 4)))
+    numpy.testing.assert_array_equal(size(a), [3, 4])
+    assert size(a, 1) == 3 and size(a, 2) == 4 and size(a, 3) == 1
+    numpy.testing.assert_array_equal(size(matrix._wrap(numpy.ones(5))), [1, 5])
+    numpy.testing.assert_array_equal(size(7), [1, 1])
+    numpy.testing.assert_array_equal(size('abc'), [1, 3])
+    numpy.testing.assert_array_equal(size(struct('a', 1, 'b', 2)), [1, 1])
+    numpy.testing.assert_array_equal(size(numpy.ones((2, 3, 4))), [2, 3, 4])
+
+@pytest.mark.parametrize('shape', [(3, 4), (5,), (5, 1), (2, 3, 4)])
+def test_zeros_of_size(shape):
+    a = matrix._wrap(numpy.ones(shape))
+    assert zeros(size(a)).shape == a.shape
+    dims = [size(a, dim) for dim in range(1, len(size(a)) + 1)]
+    assert ones(*dims).shape == a.shape
+
+def test_matlab_size(mfile):
+    m = mfile("""
+        function [b, n] = f()
+          a = ones(3, 4);
+          b = zeros(size(a));
+          n = size(a, 2);
+        end
+    """)
+    b, n = m.f()
+    assert b.shape == (3, 4)
+    assert n == 4
@@ -0,0 +1,65 @@
+'''
+Tests for growing matrices with x(end+1) = v.
+
+Copyright (C) 2015, led02 <mlabpy@led-inc.eu>
+'''
+import numpy
+
+from mlabpy.runtime.core import colon, end, matrix, share
+
+
+def test_growth_keeps_contents():
+    x = matrix._wrap(numpy.array([0.0]))
+    buffers = []
+    for k in range(1, 1000):
+        x[end] = k
+        assert len(x) == k + 1
+        if x._buf is not (buffers[-1] if buffers else None):
+            buffers.append(x._buf)
+    numpy.testing.assert_array_equal(x, numpy.arange(1000))
+    # Amortized: the buffer grows by half its size
+    assert len(buffers) < 20
+    assert len(x._buf) >= len(x)
+    assert x._data.shape == (1000,)
+
+def test_dtype_changes():
+    x = matrix._wrap(numpy.array([1, 2]))
+    x[end] = 3
+    assert x._data.dtype.kind == 'i'
+    x[end] = 2.5
+    x[end] = 1j
+    numpy.testing.assert_array_equal(x, [1, 2, 3, 2.5, 1j])
+
+def test_slices_survive_growth():
+    x = matrix._wrap(numpy.array([1.0, 2.0, 3.0]))
+    head = x[colon(1, 2) - 1]
+    copy = share(x)
+    for k in range(100):
+        x[end] = k
+    numpy.testing.assert_array_equal(head, [1, 2])
+    numpy.testing.assert_array_equal(copy, [1, 2, 3])
+    head[0] = 9
+    copy[1] = 9
+    numpy.testing.assert_array_equal(x[colon(1, 3) - 1], [1, 2, 3])
+    assert len(x) == 103
+
+    # A slice of the grown matrix does not see later appends or writes
+    tail = x[colon(101, 103) - 1]
+    x[end] = 100
+    x[0] = -1
+    numpy.testing.assert_array_equal(tail, [97, 98, 99])
+
+def test_growth_in_matlab_code(mfile):
+    m = mfile('''
+        function x = f()
+          x = [];
+          s = 0;
+          for k = 1:500
+            s = s + k;
+            x(end+1) = s;
+          end
+        end
+    ''')
+    x = m.f()
+    assert len(x) == 500
+    numpy.testing.assert_array_equal(x, numpy.cumsum(numpy.arange(1, 501)))
@@ -0,0 +1,70 @@
+'''
+Tests for matrix literals.
+
+Copyright (C) 2015, led02 <mlabpy@led-inc.eu>
+'''
+import numpy
+import pytest
+
+from mlabpy.runtime.core import blkcat, matrix, share, vector
+
+
+def block(*rows):
+    return matrix._wrap(numpy.array(rows, dtype=float))
+
+def test_scalars():
+    numpy.testing.assert_array_equal(blkcat([[1, 2, 3]]), [1, 2, 3])
+    numpy.testing.assert_array_equal(blkcat([[1, 2], [3, 4]]), [[1, 2], [3, 4]])
+    assert blkcat([[1, 2]])._data.ndim == 1
+
+def test_mixed_rows():
+    a = block([1, 2], [3, 4])
+    row = matrix._wrap(numpy.array([5.0, 6.0, 7.0]))
+    # [a, [8; 9]; row] with a scalar completing the row
+    result = blkcat([[a, block([8], [9])], [row]])
+    numpy.testing.assert_array_equal(result, [[1, 2, 8], [3, 4, 9], [5, 6, 7]])
+    result = blkcat([[0, row], [a, a]])
+    numpy.testing.assert_array_equal(result, [[0, 5, 6, 7], [1, 2, 1, 2], [3, 4, 3, 4]])
+    # A single row of scalars and vectors stays one-dimensional
+    numpy.testing.assert_array_equal(blkcat([[row, 8, row]]), [5, 6, 7, 8, 5, 6, 7])
+
+def test_types_are_promoted():
+    result = blkcat([[matrix._wrap(numpy.array([1, 2])), 2.5, 1j]])
+    assert result._data.dtype == numpy.complex128
+    numpy.testing.assert_array_equal(result, [1, 2, 2.5, 1j])
+
+def test_empty_blocks():
+    empty = blkcat([[]])
+    assert isinstance(empty, matrix) and empty._data.size == 0
+    a = block([1, 2])
+    numpy.testing.assert_array_equal(blkcat([[empty, a, empty]]), [[1, 2]])
+    numpy.testing.assert_array_equal(blkcat([[a], [empty], [a]]), [[1, 2], [1, 2]])
+    assert blkcat([[empty], [empty]])._data.size == 0
+
+def test_single_matrix_is_shared():
+    a = block([1, 2])
+    result = blkcat([[a]])
+    assert numpy.shares_memory(result._data, a._data)
+    result[0] = 9
+    numpy.testing.assert_array_equal(a, [[1, 2]])
+
+def test_strings():
+    assert blkcat([['ab', 'cd']]) == 'abcd'
+    assert list(blkcat([['ab'], ['cd']])) == list(vector(['ab', 'cd']))
+
+def test_dimension_mismatch():
+    a = block([1, 2], [3, 4])
+    with pytest.raises(ValueError, match='vertical dimensions mismatch in horizontal concatenation'):
+        blkcat([[a, block([5, 6])]])
+    with pytest.raises(ValueError, match='horizontal dimensions mismatch in vertical concatenation'):
+        blkcat([[a], [block([5, 6, 7])]])
+    with pytest.raises(ValueError, match='horizontal dimensions mismatch in vertical concatenation'):
+        blkcat([[1, 2], [3]])
+
+def test_literals_in_matlab_code(mfile):
+    m = mfile('''
+        function x = f(a)
+          x = [a, [5; 6]; 7, [], 8, 9];
+        end
+    ''')
+    numpy.testing.assert_array_equal(m.f(share(block([1, 2], [3, 4]))), [[1, 2, 5], [3, 4, 6], [7, 8, 9]])
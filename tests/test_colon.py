@@ -0,0 +1,75 @@
+'''
+Tests for ranges (``a:b`` and ``a:s:b``).
+
+Copyright (C) 2015, led02 <mlabpy@led-inc.eu>
+'''
+import numpy
+
+from mlabpy.runtime.core import _end, colon, matrix, share
+
+
+def test_elements():
+    assert list(colon(1, 4)) == [1, 2, 3, 4]
+    assert list(colon(5, -2, 1)) == [5, 3, 1]
+    assert len(colon(0, 0.1, 1)) == 11
+    assert len(colon(3, 1)) == 0
+    numpy.testing.assert_allclose(numpy.asarray(colon(0, 0.25, 1)), [0, 0.25, 0.5, 0.75, 1])
+
+def test_scalar_arithmetic_keeps_ranges():
+    x = colon(1, 2, 7) * 2 + 1
+    assert isinstance(x, colon)
+    assert list(x) == [3, 7, 11, 15]
+    assert list(10 - colon(1, 3)) == [9, 8, 7]
+
+def test_elementwise_operations():
+    x = colon(0, 0.25, 1)
+    numpy.testing.assert_allclose(x ** 2, [0, 0.0625, 0.25, 0.5625, 1])
+    numpy.testing.assert_array_equal(x < 0.5, [True, True, False, False, False])
+    numpy.testing.assert_allclose(x * x, numpy.asarray(x) ** 2)
+    numpy.testing.assert_allclose(x + numpy.ones(5), numpy.asarray(x) + 1)
+    numpy.testing.assert_allclose(2 ** colon(0, 3), [1, 2, 4, 8])
+    assert isinstance(x * x, matrix)
+    assert x.size == 5 and x.shape == (5,)
+
+def test_assigned_range_is_a_matrix():
+    x = share(colon(0, 0.25, 1))
+    assert isinstance(x, matrix)
+    x[1] = 5
+    x[_end(0)] = 7
+    numpy.testing.assert_allclose(x, [0, 5, 0.5, 0.75, 1, 7])
+    # The cached elements of the range are not changed
+    numpy.testing.assert_allclose(numpy.asarray(colon(0, 0.25, 1)), [0, 0.25, 0.5, 0.75, 1])
+
+def test_ranges_in_matlab_code(mfile):
+    m = mfile('''
+        function [x, s] = f()
+          x = 0:0.25:1;
+          x(2) = 5;
+          x(end+1) = 7;
+          s = 0;
+          for k = 1:4
+            s = s + k;
+          end
+        end
+    ''')
+    x, s = m.f()
+    numpy.testing.assert_allclose(x, [0, 5, 0.5, 0.75, 1, 7])
+    assert s == 10
+
+def test_ranges_are_double():
+    x = share(colon(1, 5))
+    assert x.dtype == numpy.float64
+    x[1] = 2.5
+    numpy.testing.assert_array_equal(x, [1, 2.5, 3, 4, 5])
+
+def test_writes_into_integer_ranges(mfile):
+    m = mfile('''
+        function x = f()
+          x = 1:5;
+          x(2) = 2.5;
+          idx = 3:4;
+          x(idx) = 0;
+          x(end+1) = 6.5;
+        end
+    ''')
+    numpy.testing.assert_array_equal(m.f(), [1, 2.5, 0, 0, 5, 6.5])
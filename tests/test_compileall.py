@@ -0,0 +1,44 @@
+'''
+Tests for the ahead-of-time compiler.
+
+Copyright (C) 2015, led02 <mlabpy@led-inc.eu>
+'''
+import os
+
+from mlabpy import cache, compileall, loader
+
+
+def _sources(tmp_path):
+    sub = tmp_path / 'src' / 'sub'
+    sub.mkdir(parents=True)
+    files = []
+    for dirname, name, value in [(tmp_path / 'src', 'one', 1), (sub, 'two', 2), (sub, 'three', 3)]:
+        filepath = dirname / (name + '.m')
+        filepath.write_text('function y = f()\n  y = {0};\nend\n'.format(value))
+        files.append(str(filepath))
+    return files
+
+def _fail_compile(self):
+    raise AssertionError('compiled again')
+
+def test_compile_tree_in_parallel(tmp_path, monkeypatch, capsys):
+    files = _sources(tmp_path)
+    (tmp_path / 'src' / 'broken.m').write_text('function y = f(\n')
+    assert compileall.main(['-j2', str(tmp_path / 'src')]) == 1
+    output = capsys.readouterr().out
+    assert '3 compiled, 1 failed.' in output
+    assert 'FAILED' in output and 'broken.m' in output
+    for filepath in files:
+        assert os.path.exists(cache.code_cache_path(filepath))
+
+    monkeypatch.setattr(loader.MatlabLoader, '_compile', _fail_compile)
+    assert [loader.load_file(filepath, 'aot{0}'.format(i)).f() for i, filepath in enumerate(files)] == [1, 2, 3]
+
+def test_compile_to_python(tmp_path, capsys):
+    files = _sources(tmp_path)
+    assert compileall.main(['-j1', '-q', '-p', files[0]]) == 0
+    assert '1 compiled, 0 failed.' in capsys.readouterr().out
+    namespace = {}
+    with open(os.path.splitext(files[0])[0] + '.py') as infile:
+        exec(compile(infile.read(), 'one.py', 'exec'), namespace)
+    assert namespace['f']() == 1
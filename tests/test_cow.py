@@ -0,0 +1,81 @@
+'''
+Tests for the value semantics of matrices, cell arrays and structs.
+
+Copyright (C) 2015, led02 <mlabpy@led-inc.eu>
+'''
+import numpy
+
+from mlabpy.runtime.core import colon, cow_stats, matrix, share, struct, vector
+
+
+def test_assignment_shares_until_written():
+    a = matrix._wrap(numpy.array([1, 2, 3]))
+    cow_stats(reset=True)
+    b = share(a)
+    assert numpy.shares_memory(numpy.asarray(a), numpy.asarray(b))
+    b[0] = 0
+    numpy.testing.assert_array_equal(a, [1, 2, 3])
+    numpy.testing.assert_array_equal(b, [0, 2, 3])
+    assert cow_stats() == {'shares': 1, 'copies': 1}
+
+def test_slice_has_value_semantics():
+    a = matrix._wrap(numpy.array([1, 2, 3, 4]))
+    b = share(a[colon(2, 3) - 1])
+    assert isinstance(b, matrix)
+    a[1] = 9
+    numpy.testing.assert_array_equal(b, [2, 3])
+    b[0] = 0
+    numpy.testing.assert_array_equal(a, [1, 9, 3, 4])
+    numpy.testing.assert_array_equal(b, [0, 3])
+
+def test_rows_have_value_semantics():
+    a = matrix._wrap(numpy.array([[1, 2], [3, 4]]))
+    row = a[0]
+    row[1] = 7
+    numpy.testing.assert_array_equal(a, [[1, 2], [3, 4]])
+
+def test_plain_arrays_are_copied_on_write():
+    data = numpy.array([1.0, 2.0])
+    b = share(data)
+    b[0] = 5.0
+    numpy.testing.assert_array_equal(data, [1.0, 2.0])
+
+def test_containers():
+    s = struct('x', matrix._wrap(numpy.array([1, 2, 3])))
+    t = share(s)
+    t.x = 5
+    numpy.testing.assert_array_equal(s.x, [1, 2, 3])
+    c = vector([1, 2])
+    d = share(c)
+    d[0] = 9
+    assert list(c) == [1, 2]
+
+def test_matlab_assignments(mfile):
+    m = mfile("""
+        function [a, b, c, d] = f()
+          a = [1 2 3];
+          b = a;
+          b(1) = 0;
+          c = a.';
+          c(2) = 7;
+          d = a * 2;
+          a(3) = 5;
+        end
+    """)
+    a, b, c, d = m.f()
+    numpy.testing.assert_array_equal(a, [1, 2, 5])
+    numpy.testing.assert_array_equal(b, [0, 2, 3])
+    numpy.testing.assert_array_equal(c, [[1], [7], [3]])
+    numpy.testing.assert_array_equal(d, [2, 4, 6])
+
+def test_arguments_are_values(mfile):
+    m = mfile("""
+        function a = f()
+          a = [1 2 3];
+          g(a);
+        end
+        function g(x)
+          x(2) = 100;
+        end
+    """)
+    numpy.testing.assert_array_equal(m.f(), [1, 2, 3])
@@ -0,0 +1,107 @@
+'''
+Tests for binary file I/O and memory-mapped files.
+
+Copyright (C) 2015, led02 <mlabpy@led-inc.eu>
+'''
+import numpy
+
+from mlabpy.runtime.core import fclose, feof, fopen, fread, fseek, ftell, fwrite, matrix, memmapfile
+
+
+def values(*items):
+    return matrix._wrap(numpy.array(items, dtype=float))
+
+def test_round_trip(tmp_path):
+    filename = str(tmp_path / 'data.bin')
+    fid = fopen(filename, 'w')
+    assert fwrite(fid, values(1, -2, 300, -32768), 'int16') == 4
+    fclose(fid)
+
+    fid = fopen(filename, 'r')
+    data = fread(fid, float('inf'), 'int16=>double')
+    assert data._data.dtype == numpy.float64
+    numpy.testing.assert_array_equal(data._data, [1, -2, 300, -32768])
+    assert feof(fid)
+    fclose(fid)
+
+    fid = fopen(filename, 'r')
+    data = fread(fid, values(2, float('inf')), '*int16')
+    assert data._data.dtype == numpy.int16
+    numpy.testing.assert_array_equal(data._data, [[1, 300], [-2, -32768]])
+    fclose(fid)
+
+def test_byte_order(tmp_path):
+    filename = str(tmp_path / 'data.bin')
+    fid = fopen(filename, 'w', 'ieee-be')
+    fwrite(fid, values(1), 'uint16')
+    fclose(fid)
+    with open(filename, 'rb') as infile:
+        assert infile.read() == b'\x00\x01'
+    fid = fopen(filename, 'r')
+    numpy.testing.assert_array_equal(fread(fid, 1, 'uint16', 0, 'b')._data, [1])
+    fclose(fid)
+
+def test_skip(tmp_path):
+    filename = str(tmp_path / 'data.bin')
+    fid = fopen(filename, 'w')
+    # Blocks of two int16 values, each preceded by 4 skipped bytes
+    assert fwrite(fid, values(1, 2, 3, 4, 5), '2*int16', 4) == 5
+    fclose(fid)
+    with open(filename, 'rb') as infile:
+        assert len(infile.read()) == 3 * 4 + 5 * 2
+
+    fid = fopen(filename, 'r')
+    assert fseek(fid, 4, 'bof') == 0
+    data = fread(fid, float('inf'), '2*int16=>double', 4)
+    numpy.testing.assert_array_equal(data._data, [1, 2, 3, 4, 5])
+    fclose(fid)
+
+    fid = fopen(filename, 'r')
+    fseek(fid, 4, 'bof')
+    numpy.testing.assert_array_equal(fread(fid, 3, '2*int16', 4)._data, [1, 2, 3])
+    fclose(fid)
+
+def test_positions(tmp_path):
+    filename = str(tmp_path / 'data.bin')
+    fid = fopen(filename, 'w+')
+    fwrite(fid, 'abcdef', 'char')
+    assert ftell(fid) == 6
+    assert fseek(fid, -2, 'eof') == 0
+    assert fread(fid, 2, 'char=>char') == 'ef'
+    assert fseek(fid, 1, 'nowhere') == -1
+    fclose(fid)
+
+def test_fopen_failure(tmp_path):
+    assert fopen(str(tmp_path / 'missing' / 'data.bin'), 'r') == -1
+    assert fopen(str(tmp_path / 'missing.bin'), 'r') == -1
+
+def test_memmapfile(tmp_path):
+    filename = str(tmp_path / 'data.bin')
+    numpy.arange(8, dtype='<f8').tofile(filename)
+
+    m = memmapfile(filename, 'Format', 'double', 'Offset', 16, 'Repeat', 4)
+    assert m._data is None
+    numpy.testing.assert_array_equal(m.Data._data, [2, 3, 4, 5])
+    assert isinstance(m.Data._data, numpy.memmap)
+
+    # Writes to a read-only map go to a copy
+    data = m.Data
+    data[0] = -1
+    numpy.testing.assert_array_equal(data._data, [-1, 3, 4, 5])
+    assert numpy.fromfile(filename, '<f8')[2] == 2
+
+    writable = memmapfile(filename, 'Format', 'double', 'Writable', True)
+    writable.Data[0] = 42
+    writable.Data._data.flush()
+    assert numpy.fromfile(filename, '<f8')[0] == 42
+
+def test_memmapfile_records(tmp_path):
+    filename = str(tmp_path / 'records.bin')
+    records = numpy.zeros(3, [('t', '<f8'), ('xy', '<i4', (2,))])
+    records['t'] = [0.5, 1.5, 2.5]
+    records['xy'] = [[1, 2], [3, 4], [5, 6]]
+    records.tofile(filename)
+
+    m = memmapfile(filename, 'Format', [['double', values(1, 1), 't'], ['int32', values(1, 2), 'xy']])
+    numpy.testing.assert_array_equal(m.Data.t._data, [0.5, 1.5, 2.5])
+    numpy.testing.assert_array_equal(m.Data.xy._data, [[1, 2], [3, 4], [5, 6]])
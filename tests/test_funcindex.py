@@ -0,0 +1,80 @@
+'''
+Tests for functions resolved through the search path.
+
+Copyright (C) 2015, led02 <mlabpy@led-inc.eu>
+'''
+import pytest
+
+from mlabpy import conf, funcindex
+from mlabpy.runtime import core
+
+
+def _function_dir(tmp_path, name, value):
+    dirname = tmp_path / name
+    dirname.mkdir()
+    (dirname / 'which_one.m').write_text('function y = which_one()\n  y = {0};\nend\n'.format(value))
+    return str(dirname)
+
+def test_path_changes_replace_resolved_functions(tmp_path, mfile, monkeypatch):
+    monkeypatch.setattr(conf, 'MATLAB_PATH', [])
+    first = _function_dir(tmp_path, 'first', 1)
+    second = _function_dir(tmp_path, 'second', 2)
+    m = mfile('''
+        function y = f()
+          y = which_one();
+        end
+    ''')
+
+    core.addpath(first)
+    assert m.f() == 1
+    core.rmpath(first)
+    core.addpath(second)
+    assert m.f() == 2
+    core.addpath(first)
+    assert m.f() == 1
+
+def test_rehash_forgets_resolved_functions(tmp_path, mfile, monkeypatch):
+    monkeypatch.setattr(conf, 'MATLAB_PATH', [])
+    first = _function_dir(tmp_path, 'first', 1)
+    m = mfile('''
+        function y = f()
+          y = which_one();
+        end
+    ''')
+    core.addpath(first)
+    assert m.f() == 1
+    resolved = m.which_one
+    assert resolved() == 1 and resolved.__module__ != m.__name__
+    funcindex.rehash()
+    assert m.which_one is not resolved
+    assert m.f() == 1
+    core.rmpath(first)
+
+def test_builtins_stay_plain_dicts(mfile):
+    m = mfile("""
+        function y = f()
+          y = abs(-1);
+        end
+    """)
+    assert type(m.f.__builtins__) is dict
+    assert m.f() == 1
+
+def test_unknown_names_raise_name_errors(mfile, monkeypatch):
+    monkeypatch.setattr(conf, 'MATLAB_PATH', [])
+    m = mfile("""
+        function y = f()
+          y = no_such_function(1);
+        end
+    """)
+    with pytest.raises(NameError):
+        m.f()
+
+def test_resolution_can_be_disabled(tmp_path, mfile, monkeypatch):
+    monkeypatch.setattr(conf, 'MATLAB_PATH', [_function_dir(tmp_path, 'first', 1)])
+    monkeypatch.setattr(conf, 'LOADER_RESOLVE_FUNCTIONS', False)
+    m = mfile("""
+        function y = f()
+          y = which_one();
+        end
+    """)
+    assert not hasattr(m, 'which_one')
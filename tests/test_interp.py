@@ -0,0 +1,74 @@
+'''
+Tests for the interpolation functions.
+
+Copyright (C) 2015, led02 <mlabpy@led-inc.eu>
+'''
+import numpy
+import pytest
+
+pytest.importorskip('scipy.interpolate')
+
+from mlabpy import conf
+from mlabpy.runtime import scipy as runtime
+from mlabpy.runtime.core import ctranspose, matrix, share
+from mlabpy.runtime.scipy import interp1, interp2, interpn
+
+
+def row(*values):
+    return matrix._wrap(numpy.array(values, dtype=float))
+
+@pytest.fixture(autouse=True)
+def interpolants():
+    runtime._interpolants.clear()
+    yield runtime._interpolants
+    runtime._interpolants.clear()
+
+def test_interp1():
+    x = row(1, 2, 3)
+    v = row(10, 20, 40)
+    numpy.testing.assert_allclose(interp1(x, v, row(1.5, 2.5, 3)), [15, 30, 40])
+    numpy.testing.assert_array_equal(numpy.isnan(interp1(x, v, row(0, 4))), [True, True])
+    numpy.testing.assert_allclose(interp1(x, v, row(4), 'linear', 'extrap'), [60])
+    numpy.testing.assert_allclose(interp1(x, v, row(1.4, 2.6), 'nearest'), [10, 40])
+    numpy.testing.assert_allclose(interp1(v, row(2.5)), [30])
+
+def test_interp2():
+    v = matrix._wrap(numpy.array([[1.0, 2.0], [3.0, 4.0]]))
+    numpy.testing.assert_allclose(interp2(v, row(1.5), row(1.5)), [2.5])
+    x = row(0, 10)
+    y = row(0, 1)
+    numpy.testing.assert_allclose(interp2(x, y, v, row(5), row(0)), [1.5])
+
+def test_interpn():
+    v = matrix._wrap(numpy.arange(8.0).reshape(2, 2, 2))
+    numpy.testing.assert_allclose(interpn(v, row(1.5), row(1.5), row(1.5)), [3.5])
+
+def test_cache_reuse_and_invalidation(interpolants):
+    x = row(1, 2, 3)
+    v = row(10, 20, 40)
+    interp1(x, v, row(2.5))
+    interp1(x, v, row(1.5))
+    assert len(interpolants) == 1
+    # Writing the table must not return stale values
+    v = share(v)
+    v[2] = 0
+    numpy.testing.assert_allclose(interp1(x, v, row(2.5)), [10])
+    assert len(interpolants) == 2
+
+def test_cache_size(interpolants, monkeypatch):
+    monkeypatch.setattr(conf, 'INTERP_CACHE_SIZE', 2)
+    x = row(1, 2)
+    for k in range(4):
+        interp1(x, row(k, k + 1), row(1.5))
+    assert len(interpolants) == 2
+    monkeypatch.setattr(conf, 'INTERP_CACHE_SIZE', 0)
+    interpolants.clear()
+    interp1(x, row(1, 2), row(1.5))
+    assert not interpolants
+
+def test_conjugate_transposes_are_distinct_tables():
+    x = row(1, 2, 3)
+    a = matrix._wrap(numpy.array([[1 + 1j, 2, 3]]))
+    b = matrix._wrap(numpy.array([[5 + 1j, 6, 7]]))
+    numpy.testing.assert_allclose(interp1(x, ctranspose(a), 1.5), 1.5 - 0.5j)
+    numpy.testing.assert_allclose(interp1(x, ctranspose(b), 1.5), 5.5 - 0.5j)
@@ -0,0 +1,67 @@
+'''
+Tests for the lexer.
+
+Copyright (C) 2015, led02 <mlabpy@led-inc.eu>
+'''
+import os
+
+import pytest
+
+from mlabpy import cache, lexer
+
+
+def tokens(text, lex=None):
+    lex = lex or lexer.new()
+    lex.input(text)
+    return [(tok.type, tok.value) for tok in lex]
+
+@pytest.mark.parametrize('text, value', [
+    ('0x1F', 31),
+    ('0X1f', 31),
+    ('42', 42),
+    ('3i', 3j),
+    ('2.5j', 2.5j),
+    ('1e-3', 0.001),
+    ('1E3', 1000.0),
+    ('.5', 0.5),
+    ('5.', 5.0),
+])
+def test_numbers(text, value):
+    assert tokens(text) == [('NUMBER', value)]
+    assert type(tokens(text)[0][1]) is type(value)
+
+def test_leading_dot_starts_a_matrix_element():
+    assert tokens('[1 .5]') == [
+        ('LBRACKET', '['), ('NUMBER', 1), ('COMMA', ' '), ('NUMBER', 0.5), ('RBRACKET', ']'),
+    ]
+    assert tokens('x.^.5') == [('IDENT', 'x'), ('DOTEXP', '.^'), ('NUMBER', 0.5)]
+
+@pytest.fixture
+def fresh_lexer(monkeypatch):
+    monkeypatch.setattr(lexer, '_lexer', None)
+
+def test_tables_are_cached(fresh_lexer, monkeypatch):
+    lexer.new()
+    tabfiles = os.listdir(cache.get_cache_dir('lexer'))
+    assert [name for name in tabfiles if name.startswith('mlab_lextab-')]
+
+    # A second process loads the table instead of generating it
+    monkeypatch.setattr(lexer, '_lexer', None)
+    loaded = []
+    read_lextab = lexer._read_lextab
+    monkeypatch.setattr(lexer, '_read_lextab', lambda path: loaded.append(read_lextab(path)) or loaded[-1])
+    assert tokens('x = 0x10;') == [('IDENT', 'x'), ('EQ', '='), ('NUMBER', 16), ('SEMI', ';')]
+    assert len(loaded) == 1 and loaded[0] is not None
+
+def test_lexers_are_independent(fresh_lexer):
+    lexer.new()
+    first = lexer.new()
+    first.input('[1, (2')
+    assert [tok.type for tok in first] == ['LBRACKET', 'NUMBER', 'COMMA', 'LPAREN', 'NUMBER']
+    assert (first.brackets, first.parens) == (1, 1)
+
+    second = lexer.new()
+    assert (second.brackets, second.parens, second.braces) == (0, 0, 0)
+    assert tokens('a end', second) == [('IDENT', 'a'), ('END_STMT', 'end')]
+    assert (first.brackets, first.parens) == (1, 1)
+    assert tokens('end', first) == [('END_EXPR', 'end')]
@@ -0,0 +1,86 @@
+'''
+Tests for the matrix operators.
+
+Copyright (C) 2015, led02 <mlabpy@led-inc.eu>
+'''
+import tracemalloc
+
+import numpy
+import pytest
+
+from mlabpy.runtime.core import _end, _is_hermitian, _is_triangular, blkcat, matrix, mldivide, mrdivide, mtimes
+
+A = numpy.array([[4.0, 1.0], [1.0, 3.0]])
+
+def test_product():
+    C = mtimes(A, numpy.array([[1.0], [2.0]]))
+    assert isinstance(C, matrix)
+    numpy.testing.assert_allclose(C, [[6.0], [7.0]])
+    assert mtimes(numpy.array([1.0, 2.0]), numpy.array([[3.0], [4.0]])) == 11.0
+    assert isinstance(mtimes(2, A), matrix)
+
+def test_product_can_grow():
+    C = mtimes(numpy.array([1.0, 2.0]), A)
+    C[_end(0)] = 9.0
+    numpy.testing.assert_allclose(C, [6.0, 7.0, 9.0])
+
+def test_inner_dimensions_must_agree():
+    with pytest.raises(ValueError):
+        mtimes(A, numpy.array([1.0, 2.0]))
+    with pytest.raises(ValueError):
+        mtimes(numpy.array([1.0, 2.0, 3.0]), A)
+    numpy.testing.assert_allclose(mtimes(A, numpy.array([[1.0], [2.0]])), [[6.0], [7.0]])
+    numpy.testing.assert_allclose(mtimes(numpy.array([[1.0], [2.0]]), numpy.array([3.0, 4.0])), [[3.0, 4.0], [6.0, 8.0]])
+
+def test_structured_solvers():
+    rng = numpy.random.RandomState(0)
+    b = rng.rand(5, 2)
+    full = rng.rand(5, 5) + 5 * numpy.eye(5)
+    for a in (numpy.triu(full), numpy.tril(full), full + full.T, full):
+        numpy.testing.assert_allclose(numpy.dot(a, mldivide(a, b)), b)
+    assert _is_triangular(numpy.triu(full), lower=False)
+    assert not _is_triangular(numpy.triu(full), lower=True)
+    assert _is_triangular(numpy.tril(full), lower=True)
+    assert _is_hermitian(full + full.T)
+    assert not _is_hermitian(full)
+    c = full + 1j * (numpy.triu(full, 1) - numpy.tril(full, -1))
+    assert _is_hermitian(c + c.conj().T)
+
+def test_structure_checks_do_not_copy():
+    a = numpy.random.RandomState(0).rand(800, 800)
+    a = a + a.T
+    tracemalloc.start()
+    try:
+        _is_triangular(a, lower=False)
+        _is_triangular(a, lower=True)
+        _is_hermitian(a)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    assert peak < a.nbytes // 4
+
+def test_solvers():
+    x = mldivide(A, numpy.array([[1.0], [2.0]]))
+    assert isinstance(x, matrix)
+    numpy.testing.assert_allclose(numpy.dot(A, x), [[1.0], [2.0]])
+    y = mrdivide(numpy.array([[1.0, 2.0]]), A)
+    assert isinstance(y, matrix)
+    numpy.testing.assert_allclose(numpy.dot(y, A), [[1.0, 2.0]])
+    assert mldivide(2, 6) == 3
+
+def test_assignment_operators(mfile):
+    m = mfile('''
+        function [P, E, Q] = f()
+          A = [1 2; 3 4];
+          P = A;
+          P *= A;
+          E = A;
+          E .*= A;
+          Q = [2 4];
+          Q /= 2;
+        end
+    ''')
+    P, E, Q = m.f()
+    numpy.testing.assert_allclose(P, [[7, 10], [15, 22]])
+    numpy.testing.assert_allclose(E, [[1, 4], [9, 16]])
+    numpy.testing.assert_allclose(Q, [1, 2])
@@ -0,0 +1,75 @@
+'''
+Tests for the loader and its code cache.
+
+Copyright (C) 2015, led02 <mlabpy@led-inc.eu>
+'''
+import os
+
+import pytest
+
+from mlabpy import cache, loader
+
+
+def _write(filepath, source):
+    filepath.write_text(source)
+    return str(filepath)
+
+def _fail_compile(self):
+    raise AssertionError('compiled again')
+
+def test_cached_code_is_reused(tmp_path, monkeypatch):
+    filepath = _write(tmp_path / 'cached.m', 'function y = f()\n  y = 1;\nend\n')
+    assert loader.load_file(filepath, 'cached').f() == 1
+    assert os.path.exists(cache.code_cache_path(filepath))
+
+    monkeypatch.setattr(loader.MatlabLoader, '_compile', _fail_compile)
+    assert loader.load_file(filepath, 'cached').f() == 1
+
+def test_changed_source_is_compiled(tmp_path):
+    filepath = _write(tmp_path / 'changed.m', 'function y = f()\n  y = 1;\nend\n')
+    assert loader.load_file(filepath, 'changed').f() == 1
+    _write(tmp_path / 'changed.m', 'function y = f()\n  y = 22;\nend\n')
+    assert loader.load_file(filepath, 'changed').f() == 22
+
+def test_changed_code_generator_is_compiled(tmp_path, monkeypatch):
+    filepath = _write(tmp_path / 'codegen.m', 'function y = f()\n  y = 1;\nend\n')
+    loader.load_file(filepath, 'codegen')
+    monkeypatch.setattr(loader, '_codegen_key', 'another parser')
+    monkeypatch.setattr(loader.MatlabLoader, '_compile', _fail_compile)
+    with pytest.raises(AssertionError):
+        loader.load_file(filepath, 'codegen')
+
+def test_codegen_key_covers_parser():
+    key = loader.codegen_key()
+    assert len(key) == 40
+    assert 'parser.py' in loader._CODEGEN_MODULES
+
+def test_lazy_functions_compile_in_threads(mfile, monkeypatch):
+    import threading
+    monkeypatch.setattr(loader.conf, 'LOADER_LAZY_FUNCTIONS', True)
+    count = 16
+    m = mfile(''.join(
+        'function y = f{0}(a)\n  b = [a, {0}];\n  y = sum(b) + {0};\nend\n'.format(k)
+        for k in range(count)
+    ))
+    barrier = threading.Barrier(count)
+    results = {}
+
+    def call(k):
+        barrier.wait()
+        results[k] = getattr(m, 'f{0}'.format(k))(0)
+
+    threads = [threading.Thread(target=call, args=(k,)) for k in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == dict((k, 2 * k) for k in range(count))
+
+def test_lazy_function_not_in_source():
+    namespace = {}
+    stub = namespace['f'] = loader.lazy_function(namespace, 'f', 'lazy.m', 3, 'function y = g()\n  y = 1;\nend\n')
+    with pytest.raises(ImportError) as info:
+        stub()
+    assert 'lazy.m, line 3' in str(info.value)
+    assert "'f'" in str(info.value)
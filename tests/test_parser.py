@@ -0,0 +1,49 @@
+'''
+Tests for the parse table cache.
+
+Copyright (C) 2015, led02 <mlabpy@led-inc.eu>
+'''
+import os
+
+from mlabpy import cache, parser
+
+
+def test_tables_are_cached(tmp_path, monkeypatch):
+    monkeypatch.setattr(parser.conf, 'CACHE_DIR', str(tmp_path))
+    monkeypatch.setattr(parser, '_parsers', {})
+    parser.new()
+    tabfile = os.path.join(cache.get_cache_dir('parser'),
+                           'mlab_top-{0}.pickle'.format(parser._grammar_key('top')))
+    assert os.path.exists(tabfile)
+
+    # A second process loads the tables instead of generating them
+    monkeypatch.setattr(parser, '_parsers', {})
+    built = []
+    build = parser._build
+    monkeypatch.setattr(parser, '_build', lambda start, picklefile=None, optimize=0:
+                        built.append(optimize) or build(start, picklefile, optimize))
+    assert parser.new().parse('x = 1;\n', lexer=parser.lexer.new())
+    assert built == [1]
+
+def test_broken_tables_are_regenerated(tmp_path, monkeypatch):
+    monkeypatch.setattr(parser.conf, 'CACHE_DIR', str(tmp_path))
+    monkeypatch.setattr(parser, '_parsers', {})
+    tabfile = os.path.join(cache.get_cache_dir('parser'),
+                           'mlab_top-{0}.pickle'.format(parser._grammar_key('top')))
+    with open(tabfile, 'wb') as outfile:
+        outfile.write(b'garbage')
+    assert parser.new().parse('x = 1;\n', lexer=parser.lexer.new())
+    with open(tabfile, 'rb') as infile:
+        assert infile.read() != b'garbage'
+
+def test_grammar_key_depends_on_start():
+    assert parser._grammar_key('top') != parser._grammar_key('expr')
+    assert parser._grammar_key('top') == parser._grammar_key('top')
+
+def test_mfile_runs(mfile):
+    m = mfile('''
+        function y = f(a)
+          y = a + 1;
+        end
+    ''')
+    assert m.f(1) == 2
@@ -0,0 +1,32 @@
+'''
+Tests for the prime number functions.
+
+Copyright (C) 2015, led02 <mlabpy@led-inc.eu>
+'''
+import numpy
+
+from mlabpy.runtime.core import factor, isprime, matrix, primes
+
+
+def test_primes():
+    result = primes(30)
+    assert isinstance(result, matrix)
+    numpy.testing.assert_array_equal(result, [2, 3, 5, 7, 11, 13, 17, 19, 23, 29])
+    assert len(primes(1)) == 0
+
+def test_factor():
+    for n, expected in [(2, [2]), (12, [2, 2, 3]), (97, [97]), (2 * 3 * 1000003, [2, 3, 1000003])]:
+        result = factor(n)
+        assert isinstance(result, matrix)
+        numpy.testing.assert_array_equal(result, expected)
+
+def test_factor_has_value_semantics():
+    result = factor(12)
+    result[0] = 5
+    numpy.testing.assert_array_equal(factor(12), [2, 2, 3])
+
+def test_isprime():
+    result = isprime(numpy.array([0, 1, 2, 3, 4, 5.5, 7, 1000003]))
+    assert isinstance(result, matrix)
+    numpy.testing.assert_array_equal(result, [False, False, True, True, False, False, True, True])
+    assert isprime(13) is True
@@ -0,0 +1,54 @@
+'''
+Tests for sprintf and fprintf.
+
+Copyright (C) 2015, led02 <mlabpy@led-inc.eu>
+'''
+import numpy
+
+from mlabpy.runtime.core import fclose, fopen, fprintf, matrix, nan, sprintf
+
+
+def test_matrices_cycle_the_format():
+    a = matrix._wrap(numpy.array([[1.0, 2.0], [3.0, 4.0]]))
+    # Column-major, the format is applied once per pair
+    assert sprintf('%d,%d;', a) == '1,3;2,4;'
+    assert sprintf('%d:%.1f ', matrix._wrap(numpy.array([1.0, 0.5])), 2, 0.25) == '1:0.5 2:0.2 '
+    assert sprintf('%d;', matrix._wrap(numpy.array([1.0, 2.5]))) == '1;2.500000e+00;'
+    assert sprintf('no conversion\n', a) == 'no conversion\n'
+
+def test_text_and_numbers():
+    assert sprintf('%s', 65) == 'A'
+    assert sprintf('%s', 2.5) == '2.5'
+    assert sprintf('%s=%d\n', 'x', 3) == 'x=3\n'
+    assert sprintf('%d', 'ab') == 'ab'
+    assert sprintf('%c%c', 72, 105) == 'Hi'
+    assert sprintf('%d %5.1f|', nan, -float('inf')) == 'NaN  -Inf|'
+
+def test_escapes():
+    assert sprintf('a\\tb\\n') == 'a\tb\n'
+    assert sprintf('\\x41\\101') == 'AA'
+    assert sprintf('100%%') == '100%'
+    assert sprintf('\\\\') == '\\'
+
+def test_fprintf_to_file(tmp_path):
+    filename = str(tmp_path / 'out.txt')
+    fid = fopen(filename, 'w')
+    assert fprintf(fid, '%d\n', matrix._wrap(numpy.array([1.0, 2.0, 3.0]))) == 6
+    assert fprintf(fid, 'café\n') == 6
+    fclose(fid)
+    with open(filename, 'rb') as infile:
+        assert infile.read() == b'1\n2\n3\ncaf\xc3\xa9\n'
+
+    fid = fopen(filename, 'at')
+    assert fprintf(fid, 'café\n') == 5
+    fclose(fid)
+    with open(filename, 'rb') as infile:
+        assert infile.read().endswith(b'caf\xc3\xa9\ncaf\xc3\xa9\n')
+
+def test_fprintf_to_stdout(capsys):
+    assert fprintf('%d-%d\n', 1, 2) == 4
+    assert fprintf(1, 'x\n') == 2
+    fprintf(2, 'error\n')
+    captured = capsys.readouterr()
+    assert captured.out == '1-2\nx\n'
+    assert captured.err == 'error\n'
@@ -0,0 +1,77 @@
+'''
+Tests for the random number generators.
+
+Copyright (C) 2015, led02 <mlabpy@led-inc.eu>
+'''
+import threading
+
+import numpy
+import pytest
+
+from mlabpy.runtime.core import rand, randn, rng, zeros
+
+
+@pytest.fixture(autouse=True)
+def default_stream():
+    settings = rng()
+    yield
+    rng(settings)
+
+def test_seed_is_reproducible():
+    rng(42)
+    first = rand(3, 4)
+    rng(42)
+    numpy.testing.assert_array_equal(rand(3, 4), first)
+    rng(43)
+    assert not numpy.array_equal(rand(3, 4), first)
+
+def test_generators():
+    for kind in ('pcg64', 'twister', 'philox', 'sfc64'):
+        rng(7, kind)
+        first = randn(5)
+        rng(7, kind)
+        numpy.testing.assert_array_equal(randn(5), first)
+        assert rng().Type == kind
+
+def test_settings_restore_the_state():
+    rng(1)
+    rand(10)
+    settings = rng()
+    expected = rand(2, 2)
+    rng(settings)
+    numpy.testing.assert_array_equal(rand(2, 2), expected)
+
+def test_shapes_and_classes():
+    rng('default')
+    assert isinstance(rand(), float)
+    assert rand(2, 3).shape == (2, 3)
+    assert rand(1, 3).shape == (3,)
+    assert rand(2, 'single').dtype == numpy.float32
+    with pytest.raises(ValueError):
+        rand(2, 'int32')
+    with pytest.raises(ValueError):
+        rng(-1)
+
+def test_out():
+    out = zeros(3, 3)
+    rng(5)
+    result = rand('out', out)
+    assert result is out
+    rng(5)
+    numpy.testing.assert_array_equal(out, rand(3, 3))
+
+def draw_in_thread():
+    results = []
+    thread = threading.Thread(target=lambda: results.append(rand(4)))
+    thread.start()
+    thread.join()
+    return results[0]
+
+def test_threads_are_independent_and_reproducible():
+    rng(3)
+    main = rand(4)
+    other = draw_in_thread()
+    assert not numpy.array_equal(main, other)
+    rng(3)
+    numpy.testing.assert_array_equal(rand(4), main)
+    numpy.testing.assert_array_equal(draw_in_thread(), other)
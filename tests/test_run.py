@@ -0,0 +1,43 @@
+'''
+Tests for the command line tool.
+
+Copyright (C) 2015, led02 <mlabpy@led-inc.eu>
+'''
+import json
+import os
+import subprocess
+import sys
+
+import mlabpy
+
+
+def test_startup_does_not_load_the_parser():
+    env = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.dirname(mlabpy.__file__)))
+    script = 'import sys, mlabpy.run; print(sorted(m for m in sys.modules if m.startswith(("ply", "mlabpy.parser", "mlabpy.lexer"))))'
+    output = subprocess.check_output([sys.executable, '-c', script], env=env)
+    assert output.strip() == b'[]'
+
+def run_profiled(tmp_path, *options):
+    script = tmp_path / 'profiled.m'
+    script.write_text('x = 1;\nfunction y = main()\n  y = 2;\nend\n')
+    env = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.dirname(mlabpy.__file__)),
+               MLABPY_CACHE_DIR=str(tmp_path / 'cache'))
+    result = subprocess.run(
+        [sys.executable, '-W', 'ignore', '-m', 'mlabpy.run', '--profile-format', 'json'] + list(options) + [str(script)],
+        env=env, cwd=str(tmp_path), stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+    assert result.stdout.strip() == b'2'
+    return json.loads(result.stderr.decode())
+
+def test_profile_phases(tmp_path):
+    records = run_profiled(tmp_path, '--profile-phases')
+    names = set(record['phase'] for record in records)
+    assert {'load', 'parse', 'compile', 'exec', 'main'} <= names
+    for record in records:
+        assert set(record) == {'phase', 'file', 'depth', 'start', 'wall', 'peak'}
+        assert record['wall'] >= 0
+        # Memory is only traced on request
+        assert record['peak'] is None
+
+def test_profile_phases_memory(tmp_path):
+    records = run_profiled(tmp_path, '--profile-memory')
+    assert all(record['peak'] is not None for record in records)
@@ -0,0 +1,37 @@
+'''
+Tests for binding the runtime into matlab modules.
+
+Copyright (C) 2015, led02 <mlabpy@led-inc.eu>
+'''
+import os
+import subprocess
+import sys
+
+import pytest
+
+import mlabpy
+from mlabpy import runtime
+
+
+def test_modules_with_manifest_are_imported_on_first_use():
+    env = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.dirname(mlabpy.__file__)))
+    script = '\n'.join([
+        'import sys',
+        'from mlabpy import runtime',
+        'namespace = {}',
+        'runtime.bind(namespace, "mlabpy.runtime.scipy")',
+        'print("mlabpy.runtime.scipy" in sys.modules, "scipy.interpolate" in sys.modules)',
+        'print(namespace["interp1"]([1.0, 2.0], [10.0, 20.0], 1.5))',
+        'print("mlabpy.runtime.scipy" in sys.modules, namespace["interp1"] is sys.modules["mlabpy.runtime.scipy"].interp1)',
+    ])
+    output = subprocess.check_output([sys.executable, '-W', 'ignore', '-c', script], env=env)
+    assert output.decode().split() == ['False', 'False', '15.0', 'True', 'True']
+
+def test_stale_manifest_names_raise_import_errors(monkeypatch):
+    monkeypatch.setitem(runtime.manifests, 'json', ('loads', 'no_such_function'))
+    namespace = {}
+    runtime.bind(namespace, 'json')
+    assert namespace['loads']('[1]') == [1]
+    with pytest.raises(ImportError, match="'no_such_function' from 'json'"):
+        namespace['no_such_function']('[1]')
+    assert isinstance(namespace['no_such_function'], runtime.LazyBinding)
@@ -0,0 +1,61 @@
+'''
+Tests for save and load.
+
+Copyright (C) 2015, led02 <mlabpy@led-inc.eu>
+'''
+import numpy
+import pytest
+
+from mlabpy import conf, matfile
+from mlabpy.runtime.core import load, matrix, save, struct
+
+
+@pytest.fixture(autouse=True)
+def workdir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+def check(loaded, a, s):
+    numpy.testing.assert_array_equal(loaded.a, a)
+    assert loaded.s.name == s.name
+    numpy.testing.assert_array_equal(loaded.s.x, s.x)
+
+def test_native_round_trip(workdir):
+    a = matrix._wrap(numpy.arange(12.0).reshape(3, 4))
+    s = struct('name', 'x', 'x', matrix._wrap(numpy.array([1, 2])))
+    save('out', 'a', 's')
+    assert matfile.is_native(str(workdir / 'out.mlabpy'))
+    assert not (workdir / 'out.mat').exists()
+    check(load('out'), a, s)
+
+def test_compressed_round_trip(workdir):
+    a = matrix._wrap(numpy.arange(12.0).reshape(3, 4).T)
+    s = struct('name', 'x', 'x', matrix._wrap(numpy.array([1, 2])))
+    save('out', 'a', 's', '-compress')
+    check(load('out.mlabpy'), a, s)
+
+def test_mat_extension_writes_matlab_files(workdir):
+    pytest.importorskip('scipy.io')
+    a = matrix._wrap(numpy.arange(6.0).reshape(2, 3))
+    save('out.mat', 'a')
+    assert not matfile.is_native(str(workdir / 'out.mat'))
+    numpy.testing.assert_array_equal(load('out.mat').a, a)
+    numpy.testing.assert_array_equal(load('out').a, a)
+
+def test_save_format(workdir, monkeypatch):
+    pytest.importorskip('scipy.io')
+    monkeypatch.setattr(conf, 'SAVE_FORMAT', 'mat')
+    a = matrix._wrap(numpy.array([1.0, 2.0]))
+    save('out', 'a')
+    assert (workdir / 'out.mat').exists()
+    save('native', 'a', '-mlabpy')
+    assert matfile.is_native(str(workdir / 'native.mlabpy'))
+
+def test_append(workdir):
+    a = matrix._wrap(numpy.array([1.0, 2.0]))
+    b = matrix._wrap(numpy.array([3.0]))
+    save('out', 'a')
+    save('out', 'b', '-append')
+    loaded = load('out')
+    numpy.testing.assert_array_equal(loaded.a, a)
+    numpy.testing.assert_array_equal(loaded.b, b)
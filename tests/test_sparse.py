@@ -0,0 +1,55 @@
+'''
+Tests for sparse matrices.
+
+Copyright (C) 2015, led02 <mlabpy@led-inc.eu>
+'''
+import numpy
+import pytest
+
+pytest.importorskip('scipy.sparse')
+
+from mlabpy.runtime.core import full, issparse, matrix, mtimes, nnz, transpose
+from mlabpy.runtime.scipy import sparse
+
+
+def test_triplets_are_summed():
+    i = matrix._wrap(numpy.array([1.0, 2.0, 1.0, 3.0]))
+    j = matrix._wrap(numpy.array([1.0, 2.0, 1.0, 3.0]))
+    v = matrix._wrap(numpy.array([1.0, 2.0, 5.0, 3.0]))
+    s = sparse(i, j, v)
+    assert s.shape == (3, 3)
+    assert s.format == 'csc'
+    numpy.testing.assert_array_equal(full(s), numpy.diag([6.0, 2.0, 3.0]))
+
+def test_scalar_triplets_and_shape():
+    i = matrix._wrap(numpy.array([1.0, 2.0, 2.0]))
+    s = sparse(i, 4, 1, 3, 5)
+    assert s.shape == (3, 5)
+    expected = numpy.zeros((3, 5))
+    expected[0, 3] = 1
+    expected[1, 3] = 2
+    numpy.testing.assert_array_equal(full(s), expected)
+    assert nnz(s) == 2
+
+def test_conversion_and_products():
+    a = matrix._wrap(numpy.array([[0.0, 2.0], [3.0, 0.0]]))
+    s = sparse(a)
+    assert nnz(s) == 2
+    numpy.testing.assert_array_equal(full(sparse(2, 3)), numpy.zeros((2, 3)))
+    numpy.testing.assert_array_equal(mtimes(s, numpy.array([1.0, 1.0])), [2.0, 3.0])
+
+def test_mixed_operands_give_full_matrices():
+    s = sparse(matrix._wrap(numpy.eye(2)))
+    dense = numpy.array([[1.0, 2.0], [3.0, 4.0]])
+    for result in (s + dense, dense + s, s - matrix._wrap(dense), s + 1, 1 - s, transpose(s) + dense):
+        assert isinstance(result, matrix)
+    numpy.testing.assert_array_equal((s + dense)._data, [[2.0, 2.0], [3.0, 5.0]])
+    numpy.testing.assert_array_equal((1 - s)._data, [[0.0, 1.0], [1.0, 0.0]])
+
+def test_elementwise_products_stay_sparse():
+    s = sparse(matrix._wrap(numpy.eye(2)))
+    dense = numpy.array([[1.0, 2.0], [3.0, 4.0]])
+    for result in (s * dense, s * 2, s / dense, s + s, transpose(s)):
+        assert issparse(result)
+        assert result.format == 'csc'
+    numpy.testing.assert_array_equal(full(s * dense), [[1.0, 0.0], [0.0, 4.0]])
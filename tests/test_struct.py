@@ -0,0 +1,78 @@
+'''
+Tests for structs and struct arrays.
+
+Copyright (C) 2015, led02 <mlabpy@led-inc.eu>
+'''
+import numpy
+import pytest
+
+from mlabpy.runtime.core import cow_stats, load, matrix, save, share, struct, structarray, vector
+
+
+def make_array():
+    return struct('x', vector([1, 2, 3]), 'name', vector(['a', 'b', 'c']))
+
+def test_struct_function_creates_arrays():
+    s = make_array()
+    assert isinstance(s, structarray)
+    assert len(s) == 3
+    numpy.testing.assert_array_equal(s.x, [1, 2, 3])
+    assert list(s.name) == ['a', 'b', 'c']
+
+def test_field_reads_use_the_column():
+    s = make_array()
+    cow_stats(reset=True)
+    assert s(2).x == 2
+    assert s(3).name == 'c'
+    # Only the array is shared, not the fields of the element
+    assert cow_stats()['shares'] == 2
+
+def test_elements_are_values():
+    s = make_array()
+    t = share(s(2))
+    assert type(t) is struct
+    assert t == struct('x', 2, 'name', 'b')
+    s[1].x = 7
+    assert t.x == 2
+    row = s(1)
+    s[0].x = 9
+    assert row.x == 1
+    assert s(1).x == 9
+    with pytest.raises(IndexError):
+        s(4)
+
+def test_append_and_missing_fields(mfile):
+    m = mfile("""
+        function [s, x] = f()
+          s = struct('a', 1);
+          s(end+1).a = 2;
+          s(end+1).b = 'text';
+          x = [s.a];
+        end
+    """)
+    s, x = m.f()
+    assert isinstance(s, structarray) and len(s) == 3
+    # [s.a] skips the element that holds []
+    numpy.testing.assert_array_equal(x, [1, 2])
+    assert numpy.size(s(3).a) == 0
+    assert numpy.size(s(1).b) == 0 and numpy.size(s(2).b) == 0
+    assert s(3).b == 'text'
+
+def test_element_assignment_fills_missing_fields():
+    s = make_array()
+    s[3] = struct('x', 4)
+    assert len(s) == 4
+    numpy.testing.assert_array_equal(s.x, [1, 2, 3, 4])
+    assert numpy.size(s(4).name) == 0
+
+def test_save_and_load(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    s = make_array()
+    s[1].data = matrix._wrap(numpy.arange(3.0))
+    save('out', 's')
+    loaded = load('out').s
+    assert isinstance(loaded, structarray) and len(loaded) == 3
+    numpy.testing.assert_array_equal(loaded.x, [1, 2, 3])
+    assert list(loaded.name) == ['a', 'b', 'c']
+    numpy.testing.assert_array_equal(loaded(2).data, [0, 1, 2])
+    assert numpy.size(loaded(1).data) == 0
@@ -0,0 +1,93 @@
+'''
+Tests for tic, toc and the named timers.
+
+Copyright (C) 2015, led02 <mlabpy@led-inc.eu>
+'''
+import io
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+import mlabpy
+from mlabpy.runtime import core
+from mlabpy.runtime.core import tic, timers, toc
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    # A clock in nanoseconds that only moves when told to
+    now = [10 ** 9]
+    monkeypatch.setattr(core, '_now_ns', lambda: now[0])
+    monkeypatch.setattr(core, '_timers', {})
+    return now
+
+def test_clock_counts_nanoseconds():
+    assert core._now_ns is time.perf_counter_ns
+    handle = tic()
+    assert isinstance(handle, int)
+    assert 0 <= toc(handle) < 60
+
+def test_handles_and_last_tic(clock):
+    handle = tic()
+    clock[0] += 1500
+    last = tic()
+    clock[0] += 500
+    assert toc(handle) == 2e-6
+    assert toc() == 5e-7
+    assert toc(last) == 5e-7
+
+def test_named_timers(clock):
+    for duration in (3, 1, 2):
+        tic('solve')
+        clock[0] += duration * 10 ** 9
+        assert toc('solve') == duration
+    tic('setup')
+    clock[0] += 10 ** 8
+    toc('setup')
+    assert timers() == {'solve': (3, 6.0, 1.0, 3.0), 'setup': (1, 0.1, 0.1, 0.1)}
+
+    # Each toc stops the timer
+    with pytest.raises(RuntimeError, match="timer 'solve' was not started"):
+        toc('solve')
+
+def test_toc_without_tic():
+    errors = []
+    def run():
+        try:
+            toc()
+        except RuntimeError as error:
+            errors.append(str(error))
+    # The last tic is kept per thread
+    tic()
+    thread = threading.Thread(target=run)
+    thread.start()
+    thread.join()
+    assert errors == ['toc called before tic']
+
+def test_report(clock, monkeypatch):
+    outfile = io.StringIO()
+    core._report_timers(outfile)
+    assert outfile.getvalue() == ''
+
+    tic('step')
+    clock[0] += 2 * 10 ** 9
+    toc('step')
+    monkeypatch.setattr(core.conf, 'TIMERS_REPORT', True)
+    core._report_timers(outfile)
+    header, line = outfile.getvalue().splitlines()
+    assert header.split()[:3] == ['Timer', 'Count', 'Total']
+    assert line.split() == ['step', '1', '2.000000', '2.000000', '2.000000', '2.000000']
+
+def test_report_at_exit():
+    env = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.dirname(mlabpy.__file__)))
+    script = 'from mlabpy import conf; from mlabpy.runtime.core import tic, toc; ' \
+             'conf.TIMERS_REPORT = True; tic("step"); toc("step")'
+    result = subprocess.run([sys.executable, '-W', 'ignore', '-c', script], env=env,
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+    lines = result.stderr.decode().splitlines()
+    assert lines[0].startswith('Timer')
+    assert lines[1].split()[:2] == ['step', '1']
@@ -0,0 +1,55 @@
+'''
+Tests for the transpose operators.
+
+Copyright (C) 2015, led02 <mlabpy@led-inc.eu>
+'''
+import numpy
+
+from mlabpy.runtime.core import ctranspose, matrix, mtimes, transpose
+
+
+def test_transpose_is_a_view_with_value_semantics():
+    A = matrix._wrap(numpy.array([[1, 2], [3, 4]]))
+    B = transpose(A)
+    assert isinstance(B, matrix)
+    assert numpy.shares_memory(numpy.asarray(A), numpy.asarray(B))
+    B[0, 0] = 99
+    numpy.testing.assert_array_equal(A, [[1, 2], [3, 4]])
+    numpy.testing.assert_array_equal(B, [[99, 3], [2, 4]])
+
+def test_writing_the_source_keeps_the_transpose():
+    A = matrix._wrap(numpy.array([[1, 2], [3, 4]]))
+    B = transpose(A)
+    A[0, 1] = 99
+    numpy.testing.assert_array_equal(B, [[1, 3], [2, 4]])
+    numpy.testing.assert_array_equal(A, [[1, 99], [3, 4]])
+
+def test_row_vector_becomes_a_column():
+    x = matrix._wrap(numpy.array([1.0, 2.0, 3.0]))
+    y = transpose(x)
+    assert y.shape == (3, 1)
+    y[0, 0] = 5.0
+    numpy.testing.assert_array_equal(x, [1.0, 2.0, 3.0])
+
+def test_conjugate_transpose():
+    A = matrix._wrap(numpy.array([[1 + 1j, 2], [3, 4 - 2j]]))
+    B = ctranspose(A)
+    A[0, 0] = 0
+    numpy.testing.assert_array_equal(B, [[1 - 1j, 3], [2, 4 + 2j]])
+    numpy.testing.assert_allclose(mtimes(ctranspose(A), A), numpy.dot(numpy.asarray(A).conj().T, A))
+    R = matrix._wrap(numpy.array([[1.0, 2.0]]))
+    C = ctranspose(R)
+    C[0, 0] = 7.0
+    numpy.testing.assert_array_equal(R, [[1.0, 2.0]])
+
+def test_transpose_in_matlab_code(mfile):
+    m = mfile("""
+        function [A, B] = f()
+          A = [1 2; 3 4];
+          B = A';
+          B(1, 1) = 99;
+        end
+    """)
+    A, B = m.f()
+    numpy.testing.assert_array_equal(A, [[1, 2], [3, 4]])
+    numpy.testing.assert_array_equal(B, [[99, 3], [2, 4]])